@@ -1,48 +1,86 @@
+import time
+START_TIME = time.perf_counter()  # Before the other imports, so they count towards startup
+import argparse
 import random
+import sys
+import threading
 import tkinter as tk
 from tkinter import messagebox
-from functools import partial
-from stable_baselines3 import DQN
+from battleship_engine import Board, HIT, SUNK, ship_mask, iter_cells
+from battleship_config import DEFAULT_CONFIG, add_config_arguments, config_from_args
+from placement import place_random_fleet
+from board_canvas import BoardCanvas, WATER, SHIP, PREVIEW, HIT_MARK, MISS_MARK
+from battleship_ai import make_targeter, load_model, check_model
+from journal import JournalWriter, JOURNAL_DIR, FINISHED, ABANDONED
 
-# Load the trained model
-model = DQN.load("battleship_dqn")
-
-# Use the model to predict the AI's moves
-def get_ai_move(observation):
-    action, _states = model.predict(observation)
-    return divmod(action, 8)  # Convert action to (row, col)
+STARTUP_BUDGET = 1.0  # Seconds from launch to a drawn window (checked by --check-startup and test_startup.py)
+# Difficulty shown in the menu -> battleship_ai strategy
+DIFFICULTIES = {"easy": "easy", "medium": "medium", "hard": "hard", "rl": "dqn"}
+# Player numbers in the journal
+PLAYER = 0
+COMPUTER = 1
 
 class BattleshipGame:
-    def __init__(self):
+    def __init__(self, config=DEFAULT_CONFIG, seed=None, journal=None, window=True):
         # Constants
-        self.LENGTH_OF_SHIPS = [2, 3, 3, 4, 5]
-        self.BOARD_SIZE = 8
-        self.LETTERS = 'ABCDEFGH'
+        self.config = config
+        self.LENGTH_OF_SHIPS = config.ship_lengths
+        self.BOARD_SIZE = config.board_size
+        self.LETTERS = config.letters
         
         # Game state
         self.placing_ship = True
         self.current_ship_index = 0
         self.current_orientation = "H"  # Default horizontal placement
+        self.preview = []  # Cells highlighted by the placement preview
         self.player_turn = True
-        self.difficulty = "medium"  # easy, medium, hard
+        self.difficulty = "medium"  # easy, medium, hard, rl
+        self.model_thread = None  # Loads the DQN in the background once "rl" is chosen
+        self.model_error = None
+        self.rng = random.Random(seed)  # Computer fleet and shots: the same seed replays the same game
+        self.journal = journal  # JournalWriter recording every placement and shot, or None
+        self.game_id = None  # Journal id of the game in progress
         
         # Initialize boards
         self.reset_boards()
         
-        # UI Setup
-        self.root = tk.Tk()
-        self.root.title("Battleship")
-        self.setup_ui()
-        
         # Place computer ships
         self.place_ships(self.computer_board)
+        self.start_journal_game()
+        
+        # UI Setup (window=False builds the game without a display, e.g. in tests)
+        self.root = None
+        if window:
+            self.root = tk.Tk()
+            self.root.title("Battleship")
+            self.setup_ui()
+        
+    def start_journal_game(self):
+        """Open the game in the journal with the computer's fleet"""
+        if self.journal is not None:
+            self.game_id = self.journal.start_game(self.BOARD_SIZE, len(self.LENGTH_OF_SHIPS))
+            self.journal.place_fleet(self.game_id, COMPUTER, self.computer_board)
+    
+    def end_journal_game(self, winner, reason=FINISHED):
+        if self.journal is not None and self.game_id is not None:
+            self.journal.end_game(self.game_id, winner, reason)
+            self.game_id = None
+    
+    def close(self):
+        """Record an unfinished game as abandoned and flush the journal"""
+        if self.journal is not None:
+            self.end_journal_game(None, ABANDONED)
+            self.journal.close()
         
     def reset_boards(self):
         """Initialize all game boards"""
-        self.player_board = [[" " for _ in range(self.BOARD_SIZE)] for _ in range(self.BOARD_SIZE)]
-        self.computer_board = [[" " for _ in range(self.BOARD_SIZE)] for _ in range(self.BOARD_SIZE)]
-        self.player_guess_board = [[" " for _ in range(self.BOARD_SIZE)] for _ in range(self.BOARD_SIZE)]
-        self.computer_guess_board = [[" " for _ in range(self.BOARD_SIZE)] for _ in range(self.BOARD_SIZE)]
+        # Each board holds a fleet and the shots fired at it
+        self.player_board = Board(self.BOARD_SIZE)
+        self.computer_board = Board(self.BOARD_SIZE)
+        # One targeter per difficulty, all kept up to date so the level can change mid-game
+        # (the rl targeter only needs the model once it picks a move)
+        self.targeters = {level: make_targeter(strategy, self.BOARD_SIZE, self.LENGTH_OF_SHIPS, self.rng)
+                          for level, strategy in DIFFICULTIES.items()}
     
     def setup_ui(self):
         """Create the game interface"""
@@ -64,18 +102,18 @@ class BattleshipGame:
         difficulty_frame.pack(side=tk.LEFT, padx=10)
         tk.Label(difficulty_frame, text="Difficulty:").pack()
         self.difficulty_var = tk.StringVar(value=self.difficulty)
-        tk.OptionMenu(difficulty_frame, self.difficulty_var, "easy", "medium", "hard", 
+        tk.OptionMenu(difficulty_frame, self.difficulty_var, *DIFFICULTIES,
                      command=self.set_difficulty).pack()
         
         # Player board frame
         player_frame = tk.Frame(main_frame, bd=2, relief="groove")
         player_frame.grid(row=1, column=0, padx=20, pady=10)
-        tk.Label(player_frame, text="Your Fleet", font=('Arial', 12, 'bold')).grid(row=0, column=0, columnspan=9)  # BOARD_SIZE (8) + 1
+        tk.Label(player_frame, text="Your Fleet", font=('Arial', 12, 'bold')).grid(row=0, column=0)
         
         # Computer board frame
         computer_frame = tk.Frame(main_frame, bd=2, relief="groove")
         computer_frame.grid(row=1, column=1, padx=20, pady=10)
-        tk.Label(computer_frame, text="Enemy Waters", font=('Arial', 12, 'bold')).grid(row=0, column=0, columnspan=self.BOARD_SIZE + 1)
+        tk.Label(computer_frame, text="Enemy Waters", font=('Arial', 12, 'bold')).grid(row=0, column=0)
         
         # Create boards
         self.player_cells = self.create_board(player_frame, self.handle_player_placement, is_player=True)
@@ -90,53 +128,28 @@ class BattleshipGame:
         self.set_computer_board_state(False)
     
     def create_board(self, parent, click_handler, is_player=False):
-        """Create a game board UI"""
-        board = []
-        # Add column labels (letters)
-        for c in range(self.BOARD_SIZE):
-            tk.Label(parent, text=self.LETTERS[c], font=('Arial', 10)).grid(row=1, column=c+1)
-        
-        for r in range(self.BOARD_SIZE):
-            row_cells = []
-            # Add row label (number)
-            tk.Label(parent, text=str(r+1), font=('Arial', 10)).grid(row=r+2, column=0)
-            
-            for c in range(self.BOARD_SIZE):
-                cell = tk.Button(parent, text=" ", width=3, height=1, 
-                                bg="lightblue", relief="raised", font=('Arial', 10))
-                cell.grid(row=r+2, column=c+1)
-                cell.config(command=partial(click_handler, r, c))
-                
-                if is_player:
-                    # Add hover effects for player board during placement
-                    cell.bind("<Enter>", lambda e, r=r, c=c: self.on_cell_hover(r, c))
-                    cell.bind("<Leave>", lambda e: self.on_cell_leave())
-                
-                row_cells.append(cell)
-            board.append(row_cells)
+        """Create a game board UI (one canvas per board)"""
+        board = BoardCanvas(parent, self.BOARD_SIZE, self.LETTERS, click_handler,
+                            # Add hover effects for player board during placement
+                            on_hover=self.on_cell_hover if is_player else None,
+                            on_leave=self.on_cell_leave if is_player else None)
+        board.grid(row=1, column=0)
         return board
     
     def on_cell_hover(self, row, col):
         """Highlight potential ship placement on hover"""
         if self.placing_ship and self.current_ship_index < len(self.LENGTH_OF_SHIPS):
             ship_length = self.LENGTH_OF_SHIPS[self.current_ship_index]
-            if self.check_ship_fit(ship_length, row, col, self.current_orientation):
-                if self.current_orientation == "H":
-                    for c in range(col, min(col + ship_length, self.BOARD_SIZE)):
-                        self.player_cells[row][c].config(bg="lightgreen")
-                else:
-                    for r in range(row, min(row + ship_length, self.BOARD_SIZE)):
-                        self.player_cells[r][col].config(bg="lightgreen")
+            mask = ship_mask(self.BOARD_SIZE, ship_length, row, col, self.current_orientation)
+            for r, c in iter_cells(mask, self.BOARD_SIZE):
+                self.player_cells.set(r, c, PREVIEW)
+                self.preview.append((r, c))
     
     def on_cell_leave(self):
-        """Clear hover highlights"""
-        if self.placing_ship:
-            for r in range(self.BOARD_SIZE):
-                for c in range(self.BOARD_SIZE):
-                    if self.player_board[r][c] == " ":
-                        self.player_cells[r][c].config(bg="lightblue")
-                    else:
-                        self.player_cells[r][c].config(bg="gray")
+        """Clear hover highlights (only the previewed cells are redrawn)"""
+        for r, c in self.preview:
+            self.player_cells.set(r, c, SHIP if self.player_board.has_ship(r, c) else WATER)
+        self.preview = []
     
     def toggle_orientation(self):
         """Switch between horizontal and vertical ship placement"""
@@ -146,45 +159,45 @@ class BattleshipGame:
     def set_difficulty(self, level):
         """Set computer difficulty level"""
         self.difficulty = level
+        if level == "rl":
+            self.warm_up_model()
+    
+    def warm_up_model(self):
+        """Start loading the DQN in a background thread so the window stays responsive"""
+        if self.model_thread is not None:
+            return
+        self.model_thread = threading.Thread(target=self.load_model_in_background, daemon=True)
+        self.model_thread.start()
+    
+    def load_model_in_background(self):
+        try:
+            check_model(load_model(), self.BOARD_SIZE)
+        except Exception as e:  # Missing model file, stable-baselines3 not installed, other board size...
+            self.model_error = e
+    
+    def model_ready(self):
+        """Whether the computer can play its RL move now; falls back to hard if the model failed to load"""
+        if self.model_thread is None:
+            self.warm_up_model()
+        if self.model_thread.is_alive():
+            return False
+        if self.model_error is not None:
+            messagebox.showerror("AI model", f"Could not load the trained model, switching to hard.\n{self.model_error}")
+            self.difficulty = "hard"
+            self.difficulty_var.set("hard")
+        return True
     
     def set_computer_board_state(self, active):
-        """Enable/disable computer board buttons"""
-        for r in range(self.BOARD_SIZE):
-            for c in range(self.BOARD_SIZE):
-                state = "normal" if active else "disabled"
-                self.computer_cells[r][c].config(state=state)
+        """Enable/disable clicks on the computer board"""
+        self.computer_cells.set_enabled(active)
     
     def check_ship_fit(self, ship_length, row, column, orientation):
         """Check if ship fits at given location"""
-        if orientation == "H":
-            return column + ship_length <= self.BOARD_SIZE
-        return row + ship_length <= self.BOARD_SIZE
-    
-    def ship_overlaps(self, board, row, column, orientation, ship_length):
-        """Check if ship overlaps with existing ships"""
-        if orientation == "H":
-            return any(board[row][c] == "X" for c in range(column, column + ship_length))
-        return any(board[r][column] == "X" for r in range(row, row + ship_length))
+        return ship_mask(self.BOARD_SIZE, ship_length, row, column, orientation) != 0
     
     def place_ships(self, board, is_player=False):
-        """Place ships randomly for computer"""
-        for ship_length in self.LENGTH_OF_SHIPS:
-            placed = False
-            while not placed:
-                orientation = random.choice(["H", "V"])
-                row = random.randint(0, self.BOARD_SIZE - 1)
-                column = random.randint(0, self.BOARD_SIZE - 1)
-                
-                if (self.check_ship_fit(ship_length, row, column, orientation) and 
-                    not self.ship_overlaps(board, row, column, orientation, ship_length)):
-                    
-                    if orientation == "H":
-                        for c in range(column, column + ship_length):
-                            board[row][c] = "X"
-                    else:
-                        for r in range(row, row + ship_length):
-                            board[r][column] = "X"
-                    placed = True
+        """Place ships randomly for computer (uniform over legal fleets, no retry loop)"""
+        place_random_fleet(board, self.LENGTH_OF_SHIPS, self.rng)
     
     def handle_player_placement(self, row, col):
         """Handle player's ship placement"""
@@ -193,18 +206,13 @@ class BattleshipGame:
             
         ship_length = self.LENGTH_OF_SHIPS[self.current_ship_index]
         
-        if (self.check_ship_fit(ship_length, row, col, self.current_orientation) and 
-            not self.ship_overlaps(self.player_board, row, col, self.current_orientation, ship_length)):
-            
-            # Place the ship
-            if self.current_orientation == "H":
-                for c in range(col, col + ship_length):
-                    self.player_board[row][c] = "X"
-                    self.player_cells[row][c].config(bg="gray")
-            else:
-                for r in range(row, row + ship_length):
-                    self.player_board[r][col] = "X"
-                    self.player_cells[r][col].config(bg="gray")
+        # Place the ship
+        mask = self.player_board.place_ship(ship_length, row, col, self.current_orientation)
+        if mask:
+            if self.journal is not None:
+                self.journal.place(self.game_id, PLAYER, row, col, ship_length, self.current_orientation)
+            for r, c in iter_cells(mask, self.BOARD_SIZE):
+                self.player_cells.set(r, c, SHIP)
             
             self.current_ship_index += 1
             
@@ -222,26 +230,28 @@ class BattleshipGame:
         if self.placing_ship or not self.player_turn:
             return
             
-        if self.player_guess_board[row][col] != " ":
+        if self.computer_board.is_fired(row, col):
             return
             
         # Record the attack
-        if self.computer_board[row][col] == "X":
-            self.player_guess_board[row][col] = "X"
-            self.computer_cells[row][col].config(bg="red", text="X")
+        result, ship = self.computer_board.fire(row, col)
+        if self.journal is not None:
+            self.journal.shot(self.game_id, PLAYER, row, col, result)
+        if result in (HIT, SUNK):
+            self.computer_cells.set(row, col, HIT_MARK)
             self.status_label.config(text="Hit!")
             
-            if self.is_ship_sunk(self.computer_board, self.player_guess_board, row, col):
-                self.status_label.config(text="Hit! You sunk a ship!")
+            if result == SUNK:
+                self.status_label.config(text=f"Hit! You sunk a ship of size {self.computer_board.ship_length(ship)}!")
         else:
-            self.player_guess_board[row][col] = "-"
-            self.computer_cells[row][col].config(bg="white", text="•")
+            self.computer_cells.set(row, col, MISS_MARK)
             self.status_label.config(text="Miss!")
         
         self.player_turn = False
         
         # Check for win
-        if self.count_hit_ships(self.player_guess_board, self.computer_board) == sum(self.LENGTH_OF_SHIPS):
+        if self.computer_board.all_sunk():
+            self.end_journal_game(PLAYER)
             messagebox.showinfo("Victory!", "Congratulations! You sunk all enemy ships!")
             self.ask_restart()
         else:
@@ -249,120 +259,40 @@ class BattleshipGame:
     
     def computer_turn(self):
         """Handle computer's attack with difficulty-based strategy"""
+        if self.difficulty == "rl" and not self.model_ready():
+            self.status_label.config(text="Loading the AI model...")
+            self.root.after(100, self.computer_turn)
+            return
         row, col = self.get_computer_target()
         
         # Record the attack
-        if self.player_board[row][col] == "X":
-            self.computer_guess_board[row][col] = "X"
-            self.player_cells[row][col].config(bg="red", text="X")
+        result, ship = self.player_board.fire(row, col)
+        if self.journal is not None:
+            self.journal.shot(self.game_id, COMPUTER, row, col, result)
+        sunk_cells = list(iter_cells(self.player_board.ship_masks[ship], self.BOARD_SIZE)) if result == SUNK else []
+        for targeter in self.targeters.values():
+            targeter.record(row, col, result, sunk_cells)
+        if result in (HIT, SUNK):
+            self.player_cells.set(row, col, HIT_MARK)
             self.status_label.config(text="Enemy hit your ship!")
             
-            if self.is_ship_sunk(self.player_board, self.computer_guess_board, row, col):
-                self.status_label.config(text="Enemy sunk your ship!")
+            if result == SUNK:
+                self.status_label.config(text=f"Enemy sunk your ship of size {self.player_board.ship_length(ship)}!")
         else:
-            self.computer_guess_board[row][col] = "-"
-            self.player_cells[row][col].config(bg="white", text="•")
+            self.player_cells.set(row, col, MISS_MARK)
             self.status_label.config(text="Enemy missed!")
         
         self.player_turn = True
         
         # Check for win
-        if self.count_hit_ships(self.computer_guess_board, self.player_board) == sum(self.LENGTH_OF_SHIPS):
+        if self.player_board.all_sunk():
+            self.end_journal_game(COMPUTER)
             messagebox.showinfo("Defeat", "All your ships have been sunk!")
             self.ask_restart()
     
     def get_computer_target(self):
         """Get computer's target based on difficulty"""
-        # First look for hits that haven't been fully explored
-        target = self.find_next_target()
-        
-        if target:
-            return target
-        
-        # If no target found, make random guess with difficulty adjustments
-        if self.difficulty == "easy":
-            return self.random_target()
-        elif self.difficulty == "medium":
-            return self.smart_random_target()
-        else:  # hard
-            return self.strategic_target()
-    
-    def find_next_target(self):
-        """Look for adjacent cells to existing hits"""
-        for r in range(self.BOARD_SIZE):
-            for c in range(self.BOARD_SIZE):
-                if self.computer_guess_board[r][c] == "X":
-                    # Check adjacent cells
-                    for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                        nr, nc = r + dr, c + dc
-                        if (0 <= nr < self.BOARD_SIZE and 0 <= nc < self.BOARD_SIZE and 
-                            self.computer_guess_board[nr][nc] == " "):
-                            return nr, nc
-        return None
-    
-    def random_target(self):
-        """Completely random targeting"""
-        row, col = random.randint(0, self.BOARD_SIZE - 1), random.randint(0, self.BOARD_SIZE - 1)
-        while self.computer_guess_board[row][col] != " ":
-            row, col = random.randint(0, self.BOARD_SIZE - 1), random.randint(0, self.BOARD_SIZE - 1)
-        return row, col
-    
-    def smart_random_target(self):
-        """Random but with checkerboard pattern (more efficient)"""
-        while True:
-            row = random.randint(0, self.BOARD_SIZE - 1)
-            col = random.randint(0, self.BOARD_SIZE - 1)
-            if (row + col) % 2 == 0 and self.computer_guess_board[row][col] == " ":
-                return row, col
-            elif self.computer_guess_board[row][col] == " ":
-                # Occasionally check other cells
-                if random.random() < 0.2:
-                    return row, col
-    
-    def strategic_target(self):
-        """More advanced targeting strategy"""
-        # First try checkerboard pattern
-        target = self.smart_random_target()
-        if target:
-            return target
-        
-        # If no checkerboard cells left, pick any remaining
-        return self.random_target()
-    
-    def is_ship_sunk(self, board, guess_board, row, col):
-        """Check if a hit belongs to a sunk ship"""
-        # Check horizontal
-        left = col
-        while left >= 0 and board[row][left] == "X":
-            left -= 1
-        left += 1
-        
-        right = col
-        while right < self.BOARD_SIZE and board[row][right] == "X":
-            right += 1
-        right -= 1
-        
-        horizontal_sunk = all(guess_board[row][c] == "X" for c in range(left, right + 1))
-        
-        # Check vertical
-        top = row
-        while top >= 0 and board[top][col] == "X":
-            top -= 1
-        top += 1
-        
-        bottom = row
-        while bottom < self.BOARD_SIZE and board[bottom][col] == "X":
-            bottom += 1
-        bottom -= 1
-        
-        vertical_sunk = all(guess_board[r][col] == "X" for r in range(top, bottom + 1))
-        
-        return horizontal_sunk or vertical_sunk
-    
-    def count_hit_ships(self, guess_board, opponent_board):
-        """Count successful hits on ships"""
-        return sum(1 for r in range(self.BOARD_SIZE) for c in range(self.BOARD_SIZE)
-                   if guess_board[r][c] == "X" and opponent_board[r][c] == "X")
+        return self.targeters[self.difficulty].next_target()
     
     def ask_restart(self):
         """Prompt to restart the game"""
@@ -378,23 +308,52 @@ class BattleshipGame:
             self.reset_boards()
             
             # Reset UI
-            for r in range(self.BOARD_SIZE):
-                for c in range(self.BOARD_SIZE):
-                    self.player_cells[r][c].config(text=" ", bg="lightblue")
-                    self.computer_cells[r][c].config(text=" ", bg="lightblue", state="disabled")
+            self.preview = []
+            self.player_cells.reset()
+            self.computer_cells.reset()
+            self.set_computer_board_state(False)
             
             # Place new computer ships
             self.place_ships(self.computer_board)
+            self.start_journal_game()
             
             # Update status
             self.status_label.config(text=f"Place your ships. Current ship: Size {self.LENGTH_OF_SHIPS[self.current_ship_index]}")
         else:
             self.root.quit()
 
+def check_startup():
+    """Draw the window once and fail if startup was over budget or pulled in the RL stack"""
+    game = BattleshipGame()
+    game.root.update()
+    elapsed = time.perf_counter() - START_TIME
+    heavy = [name for name in ("stable_baselines3", "torch") if name in sys.modules]
+    game.root.destroy()
+    print(f"Startup: {elapsed:.3f}s (budget {STARTUP_BUDGET}s)")
+    if heavy:
+        print(f"Imported at startup: {', '.join(heavy)}")
+    return elapsed <= STARTUP_BUDGET and not heavy
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single-player Battleship against the computer")
+    parser.add_argument("--check-startup", action="store_true",
+                        help=f"Measure time to the first drawn window against the {STARTUP_BUDGET}s budget and exit")
+    parser.add_argument("--seed", type=int, default=None, help="Replay the computer's fleet and shots")
+    parser.add_argument("--journal", default=JOURNAL_DIR, help="Directory of the game journals")
+    parser.add_argument("--no-journal", action="store_true", help="Do not record the games")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    config = config_from_args(args, parser)
     try:
-        game = BattleshipGame()
-        game.root.mainloop()
+        if args.check_startup:
+            sys.exit(0 if check_startup() else 1)
+        game = BattleshipGame(config, args.seed, None if args.no_journal else JournalWriter(args.journal))
+        try:
+            game.root.mainloop()
+        finally:
+            game.close()
     except tk.TclError as e:
         print("Error: Unable to initialize the GUI. Ensure you are running this script in a GUI-capable environment.")
-        print(f"Details: {e}")
\ No newline at end of file
+        print(f"Details: {e}")
+        if args.check_startup:
+            sys.exit(1)  # Nothing was measured: the check must not pass
\ No newline at end of file
@@ -1,90 +1,39 @@
+import queue
 import socket
 import threading
+import time
 import tkinter as tk
 from tkinter import messagebox
-from functools import partial
+from battleship_engine import Board, HIT, SUNK, REPEAT, ship_mask, ship_origin, iter_cells
+from battleship_config import GameConfig
+from board_canvas import BoardCanvas, WATER, SHIP, PREVIEW, HIT_MARK, MISS_MARK
+import protocol
+from protocol import (MOVE, RESULT, TURN, GAME_OVER, INFO, FLEET, CONFIG, RESUME, SESSION, WIN, LOSS, OPPONENT_LEFT,
+                      SESSION_EXPIRED)
 
-class BattleshipServer:
-    def __init__(self, host="127.0.0.1", port=12345):
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.bind((host, port))
-        self.server.listen(2)
-        print("Server started. Waiting for players...")
-        self.clients = []
-        self.boards = [None, None]  # Player boards
-        self.turn = 0  # Player 1 starts
-        self.LETTERS = 'ABCDEFGH'
-
-    def handle_client(self, client, player_id):
-        """Handle communication with a single client."""
-        try:
-            client.send(f"Welcome Player {player_id + 1}!".encode())
-            client.send("Waiting for the other player...".encode())
-            # Wait until both players are connected
-            while len(self.clients) < 2:
-                pass
-
-            if player_id == 0:
-                client.send("Your turn!".encode())
-            else:
-                client.send("Waiting for Player 1 to move...".encode())
-
-            while True:
-                try:
-                    message = client.recv(1024).decode()
-                    if message:
-                        print(f"Player {player_id + 1}: {message}")
-                        if message == "Game Over":
-                            # Notify the other player that they have won
-                            self.clients[1 - player_id].send("Game Over".encode())
-                            print(f"Player {1 - player_id + 1} has won the game!")
-                            break
-
-                        # Relay the move to the other player
-                        if self.turn == player_id:
-                            self.turn = 1 - player_id  # Switch turns
-                            self.clients[1 - player_id].send(message.encode())  # Send move to the other player
-                            self.clients[1 - player_id].send("Your turn!".encode())  # Notify the other player
-                            client.send("Waiting for the other player...".encode())  # Notify current player
-                        else:
-                            client.send("Not your turn!".encode())
-                except Exception as e:
-                    print(f"Error handling Player {player_id + 1}: {e}")
-                    break
-        except Exception as e:
-            print(f"Player {player_id + 1} disconnected: {e}")
-            if client in self.clients:
-                self.clients.remove(client)
-            # Notify the other player
-            if len(self.clients) == 1:
-                self.clients[0].send("The other player has disconnected. Game over.".encode())
-            client.close()
-
-    def start(self):
-        """Start the server and accept connections."""
-        while len(self.clients) < 2:
-            client, addr = self.server.accept()
-            print(f"Player {len(self.clients) + 1} connected from {addr}.")
-            self.clients.append(client)
-            client.send(f"You are Player {len(self.clients)}.".encode())
-            threading.Thread(target=self.handle_client, args=(client, len(self.clients) - 1)).start()
-        print("Both players connected. Starting the game!")
-        self.clients[1].send("Waiting for Player 1 to move...".encode())
-        self.clients[0].send("Your turn!".encode())
+EVENT_QUEUE_SIZE = 1024  # Server messages waiting for the UI; a full queue makes the socket thread wait
+POLL_INTERVAL = 20  # Milliseconds between two drains of the queue
+MAX_EVENTS_PER_POLL = 256  # Messages applied per drain, so a burst cannot freeze the window
+DISCONNECTED = None  # Event opcode queued once the connection is gone
+RECONNECTING = -1  # Event opcode queued when the connection drops during a game
+RECONNECT_ATTEMPTS = 10
+RECONNECT_DELAY = 1.0  # Seconds between two attempts
 
 class BattleshipGame:
     def __init__(self, host, port):
-        self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.client.connect((host, port))
+        self.address = (host, port)
+        self.session = None  # Token resuming the game in progress (socket thread only)
+        self.client = socket.create_connection(self.address)
+        self.config = self.handshake()  # Board size and fleet chosen by the server
         self.root = tk.Tk()
         self.root.title("Battleship")
-        self.BOARD_SIZE = 8
-        self.LETTERS = 'ABCDEFGH'
-        self.LENGTH_OF_SHIPS = [5, 4, 3, 3, 2]
-        self.player_board = [[" " for _ in range(self.BOARD_SIZE)] for _ in range(self.BOARD_SIZE)]
-        self.enemy_board = [[" " for _ in range(self.BOARD_SIZE)] for _ in range(self.BOARD_SIZE)]
+        self.BOARD_SIZE = self.config.board_size
+        self.LETTERS = self.config.letters
+        self.LENGTH_OF_SHIPS = self.config.ship_lengths
+        self.reset_boards()
         self.current_ship_index = 0
         self.current_orientation = "H"
+        self.preview = []  # Cells highlighted by the placement preview
         self.placing_ship = True
         self.player_turn = True
 
@@ -103,65 +52,52 @@ class BattleshipGame:
 
         player_frame = tk.Frame(main_frame, bd=2, relief="groove")
         player_frame.pack(side="left", padx=10, pady=10)
-        tk.Label(player_frame, text="Your Fleet", font=('Arial', 12, 'bold')).grid(row=0, column=0, columnspan=9)  # BOARD_SIZE (8) + 1
+        tk.Label(player_frame, text="Your Fleet", font=('Arial', 12, 'bold')).grid(row=0, column=0)
         self.player_cells = self.create_board(player_frame, self.handle_player_placement, is_player=True)
 
         enemy_frame = tk.Frame(main_frame, bd=2, relief="groove")
         enemy_frame.pack(side="left", padx=10, pady=10)
-        tk.Label(enemy_frame, text="Enemy Waters", font=('Arial', 12, 'bold')).grid(row=0, column=0, columnspan=self.BOARD_SIZE + 1)
+        tk.Label(enemy_frame, text="Enemy Waters", font=('Arial', 12, 'bold')).grid(row=0, column=0)
         self.enemy_cells = self.create_board(enemy_frame, self.handle_player_attack)
 
-        # Start a thread to listen to the server
-        threading.Thread(target=self.listen_to_server, daemon=True).start()
+        # Start a thread to listen to the server; it only decodes messages and queues them,
+        # every widget is updated from the Tk main loop
+        self.start_listening()
+        self.root.after(POLL_INTERVAL, self.process_events)
+
+    def start_listening(self):
+        """Queue the messages of the current connection from a new socket thread."""
+        self.events = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.listener = threading.Thread(target=self.listen_to_server, daemon=True)
+        self.listener.start()
+
+    def reset_boards(self):
+        """Initialize the player's board (fleet and the opponent's shots)"""
+        self.player_board = Board(self.BOARD_SIZE)
 
     def create_board(self, parent, click_handler, is_player=False):
-        """Create a game board UI"""
-        board = []
-        # Add column labels (letters)
-        for c in range(self.BOARD_SIZE):
-            tk.Label(parent, text=self.LETTERS[c], font=('Arial', 10)).grid(row=1, column=c+1)
-        
-        for r in range(self.BOARD_SIZE):
-            row_cells = []
-            # Add row label (number)
-            tk.Label(parent, text=str(r+1), font=('Arial', 10)).grid(row=r+2, column=0)
-            
-            for c in range(self.BOARD_SIZE):
-                cell = tk.Button(parent, text=" ", width=3, height=1, 
-                                bg="lightblue", relief="raised", font=('Arial', 10))
-                cell.grid(row=r+2, column=c+1)
-                cell.config(command=partial(click_handler, r, c))
-                
-                if is_player:
-                    # Add hover effects for player board during placement
-                    cell.bind("<Enter>", lambda e, r=r, c=c: self.on_cell_hover(r, c))
-                    cell.bind("<Leave>", lambda e: self.on_cell_leave())
-                
-                row_cells.append(cell)
-            board.append(row_cells)
+        """Create a game board UI (one canvas per board)"""
+        board = BoardCanvas(parent, self.BOARD_SIZE, self.LETTERS, click_handler,
+                            # Add hover effects for player board during placement
+                            on_hover=self.on_cell_hover if is_player else None,
+                            on_leave=self.on_cell_leave if is_player else None)
+        board.grid(row=1, column=0)
         return board
     
     def on_cell_hover(self, row, col):
         """Highlight potential ship placement on hover"""
         if self.placing_ship and self.current_ship_index < len(self.LENGTH_OF_SHIPS):
             ship_length = self.LENGTH_OF_SHIPS[self.current_ship_index]
-            if self.check_ship_fit(ship_length, row, col, self.current_orientation):
-                if self.current_orientation == "H":
-                    for c in range(col, min(col + ship_length, self.BOARD_SIZE)):
-                        self.player_cells[row][c].config(bg="lightgreen")
-                else:
-                    for r in range(row, min(row + ship_length, self.BOARD_SIZE)):
-                        self.player_cells[r][col].config(bg="lightgreen")
+            mask = ship_mask(self.BOARD_SIZE, ship_length, row, col, self.current_orientation)
+            for r, c in iter_cells(mask, self.BOARD_SIZE):
+                self.player_cells.set(r, c, PREVIEW)
+                self.preview.append((r, c))
     
     def on_cell_leave(self):
-        """Clear hover highlights"""
-        if self.placing_ship:
-            for r in range(self.BOARD_SIZE):
-                for c in range(self.BOARD_SIZE):
-                    if self.player_board[r][c] == " ":
-                        self.player_cells[r][c].config(bg="lightblue")
-                    else:
-                        self.player_cells[r][c].config(bg="gray")
+        """Clear hover highlights (only the previewed cells are redrawn)"""
+        for r, c in self.preview:
+            self.player_cells.set(r, c, SHIP if self.player_board.has_ship(r, c) else WATER)
+        self.preview = []
     
     def toggle_orientation(self):
         """Switch between horizontal and vertical ship placement"""
@@ -170,15 +106,7 @@ class BattleshipGame:
     
     def check_ship_fit(self, ship_length, row, column, orientation):
         """Check if ship fits at given location"""
-        if orientation == "H":
-            return column + ship_length <= self.BOARD_SIZE
-        return row + ship_length <= self.BOARD_SIZE
-    
-    def ship_overlaps(self, board, row, column, orientation, ship_length):
-        """Check if ship overlaps with existing ships"""
-        if orientation == "H":
-            return any(board[row][c] == "X" for c in range(column, column + ship_length))
-        return any(board[r][column] == "X" for r in range(row, row + ship_length))
+        return ship_mask(self.BOARD_SIZE, ship_length, row, column, orientation) != 0
     
     def handle_player_placement(self, row, col):
         """Handle player's ship placement"""
@@ -187,18 +115,11 @@ class BattleshipGame:
             
         ship_length = self.LENGTH_OF_SHIPS[self.current_ship_index]
         
-        if (self.check_ship_fit(ship_length, row, col, self.current_orientation) and 
-            not self.ship_overlaps(self.player_board, row, col, self.current_orientation, ship_length)):
-            
-            # Place the ship
-            if self.current_orientation == "H":
-                for c in range(col, col + ship_length):
-                    self.player_board[row][c] = "X"
-                    self.player_cells[row][c].config(bg="gray")
-            else:
-                for r in range(row, row + ship_length):
-                    self.player_board[r][col] = "X"
-                    self.player_cells[r][col].config(bg="gray")
+        # Place the ship
+        mask = self.player_board.place_ship(ship_length, row, col, self.current_orientation)
+        if mask:
+            for r, c in iter_cells(mask, self.BOARD_SIZE):
+                self.player_cells.set(r, c, SHIP)
             
             self.current_ship_index += 1
             
@@ -207,6 +128,7 @@ class BattleshipGame:
             else:
                 self.status_label.config(text="All ships placed! Attack the enemy waters!")
                 self.placing_ship = False
+                self.send_fleet()
     
     def handle_player_attack(self, row, col):
         """Send the player's move to the server."""
@@ -216,58 +138,195 @@ class BattleshipGame:
         self.player_turn = False
         self.status_label.config(text="Waiting for the other player...")
     
+    def handshake(self):
+        """Negotiate the framed protocol with the server and ask for a new game, or to resume
+        the current one; returns the game's GameConfig."""
+        self.client.sendall(protocol.hello())
+        reply = self.receive_exactly(2)
+        if reply[0] != protocol.HELLO or reply[1] != protocol.VERSION:
+            raise ConnectionError(f"Server does not support protocol version {protocol.VERSION}")
+        (length,) = protocol.HEADER.unpack(self.receive_exactly(protocol.HEADER.size))
+        opcode, args = protocol.decode(self.receive_exactly(length))
+        if opcode != CONFIG:
+            raise ConnectionError(f"Expected the game configuration, got opcode {opcode}")
+        self.client.sendall(protocol.encode(RESUME, self.session or b""))
+        return GameConfig(*args)
+    
+    def receive_exactly(self, count):
+        """Read count bytes from the server (before the listening thread starts)."""
+        data = b""
+        while len(data) < count:
+            chunk = self.client.recv(count - len(data))
+            if not chunk:
+                raise ConnectionError("Server closed the connection during the handshake")
+            data += chunk
+        return data
+    
+    def send_fleet(self):
+        """Send the placed ships to the server, which resolves every shot against them."""
+        ships = []
+        for mask in self.player_board.ship_masks:
+            row, col, length, orientation = ship_origin(mask, self.BOARD_SIZE)
+            ships.append((row, col, length, protocol.ORIENTATIONS.index(orientation)))
+        self.client.sendall(protocol.encode(FLEET, ships))
+    
     def send_move(self, row, col):
         """Send the player's move to the server."""
-        self.client.send(f"{row},{col}".encode())
+        try:
+            self.client.sendall(protocol.encode(MOVE, row, col))
+        except OSError:
+            pass  # Reconnecting: the resumed game gives the turn back
     
     def listen_to_server(self):
-        """Listen for messages from the server."""
+        """Listen for messages from the server (socket thread: never touches a widget)."""
+        while True:
+            self.receive_messages()
+            if self.session is None or not self.reconnect():
+                break
+        self.events.put((DISCONNECTED, ()))
+    
+    def receive_messages(self):
+        """Queue the server's messages until the connection drops."""
+        frames = protocol.FrameReader()
         while True:
             try:
-                message = self.client.recv(1024).decode()
-                if message.startswith("Your turn!"):
-                    self.player_turn = True
-                    self.status_label.config(text="Your turn! Attack the enemy waters.")
-                elif message.startswith("Waiting"):
-                    self.player_turn = False
-                    self.status_label.config(text="Waiting for the other player...")
-                elif "," in message:  # Opponent's move
-                    row, col = map(int, message.split(","))
-                    self.handle_opponent_move(row, col)
-                elif message.startswith("The other player has disconnected"):
-                    messagebox.showinfo("Game Over", "The other player has disconnected. Game over.")
-                    self.root.quit()
-                elif message.startswith("Game Over"):
-                    messagebox.showinfo("Game Over", "You have won the game!")
-                    self.ask_restart()
+                data = self.client.recv(4096)
+                if not data:
+                    return
+                for message in frames.feed(data):
+                    if message[0] == SESSION:
+                        self.session = message[1][0]
+                    elif message[0] == GAME_OVER:
+                        self.session = None  # Nothing left to resume
+                    self.events.put(message)
             except Exception as e:
                 print(f"Error in listen_to_server: {e}")
+                return
+    
+    def reconnect(self):
+        """Connect again and resume the game with the session token; False if every attempt fails."""
+        self.events.put((RECONNECTING, ()))
+        for _ in range(RECONNECT_ATTEMPTS):
+            time.sleep(RECONNECT_DELAY)
+            self.client.close()
+            try:
+                self.client = socket.create_connection(self.address)
+                if self.handshake() == self.config:
+                    return True
+            except OSError:
+                pass
+        return False
+    
+    def process_events(self):
+        """Apply the queued server messages in one batch, then check again after POLL_INTERVAL."""
+        for _ in range(MAX_EVENTS_PER_POLL):
+            try:
+                opcode, args = self.events.get_nowait()
+            except queue.Empty:
                 break
+            if opcode == DISCONNECTED:
+                self.status_label.config(text="Disconnected from the server.")
+                return  # Nothing more will arrive
+            if opcode == RECONNECTING:
+                self.status_label.config(text="Connection lost, reconnecting...")
+                continue
+            self.handle_server_message(opcode, args)
+        self.root.after(POLL_INTERVAL, self.process_events)
+
+    def new_game(self):
+        """Leave the finished game's connection and connect again for a new opponent; False on failure."""
+        # The server closes the room's connections after GAME_OVER: wait for the listener to let go
+        try:
+            self.client.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # Already closed by the server
+        self.listener.join()
+        self.client.close()
+        try:
+            self.client = socket.create_connection(self.address)
+            if self.handshake() != self.config:
+                return False  # Another board or fleet: the window cannot show it
+        except OSError:
+            return False
+        self.start_listening()  # Events of the old connection are dropped with its queue
+        return True
+    
+    def handle_server_message(self, opcode, args):
+        """Apply one message from the server."""
+        if opcode == TURN:
+            self.player_turn = bool(args[0])
+            if self.player_turn:
+                self.status_label.config(text="Your turn! Attack the enemy waters.")
+            else:
+                self.status_label.config(text="Waiting for the other player...")
+        elif opcode == MOVE:  # Opponent's move, after which it is our turn
+            self.handle_opponent_move(*args)
+            self.player_turn = True
+        elif opcode == RESULT:  # Outcome of our last shot, resolved by the server
+            row, col, result = args
+            if result == REPEAT:
+                self.player_turn = True
+                self.status_label.config(text="Already fired there! Attack again.")
+            elif result in (HIT, SUNK):
+                self.enemy_cells.set(row, col, HIT_MARK)
+            else:
+                self.enemy_cells.set(row, col, MISS_MARK)
+        elif opcode == protocol.SUNK:
+            self.status_label.config(text=f"You sunk a ship of size {args[2]}!")
+        elif opcode == FLEET:  # Resuming: our fleet, then every shot so far and the turn
+            self.restore_fleet(args[0])
+        elif opcode == GAME_OVER:
+            if args[0] == OPPONENT_LEFT:
+                messagebox.showinfo("Game Over", "The other player has disconnected. Game over.")
+                self.root.quit()
+            elif args[0] == SESSION_EXPIRED:
+                messagebox.showinfo("Game Over", "The game could not be resumed.")
+                self.root.quit()
+            elif args[0] == WIN:
+                messagebox.showinfo("Game Over", "You have won the game!")
+                self.ask_restart()
+            elif args[0] == LOSS:
+                messagebox.showinfo("Defeat", "All your ships have been sunk!")
+                self.ask_restart()
+        elif opcode == INFO:
+            self.status_label.config(text=args[0])
+    
+    def restore_fleet(self, ships):
+        """Redraw the game from scratch with the fleet the server kept for us."""
+        self.reset_boards()
+        self.player_cells.reset()
+        self.enemy_cells.reset()
+        for row, col, length, orientation in ships:
+            mask = self.player_board.place_ship(length, row, col, protocol.ORIENTATIONS[orientation])
+            for r, c in iter_cells(mask, self.BOARD_SIZE):
+                self.player_cells.set(r, c, SHIP)
+        self.current_ship_index = len(self.LENGTH_OF_SHIPS)
+        self.placing_ship = False
+        self.preview = []
+        self.status_label.config(text="Game resumed.")
     
     def handle_opponent_move(self, row, col):
-        """Process the opponent's move."""
-        if self.player_board[row][col] == "X":
-            self.player_board[row][col] = "H"  # Mark as hit
-            self.player_cells[row][col].config(bg="red", text="X")
-            self.status_label.config(text="Your ship was hit!")
+        """Show the opponent's move on our board (the server has already resolved it)."""
+        result, ship = self.player_board.fire(row, col)
+        if result == REPEAT:
+            return
+        if result in (HIT, SUNK):
+            self.player_cells.set(row, col, HIT_MARK)
+            self.status_label.config(text="Your ship was hit! Your turn.")
+            if result == SUNK:
+                self.status_label.config(text=f"Your ship of size {self.player_board.ship_length(ship)} was sunk! Your turn.")
         else:
-            self.player_board[row][col] = "M"  # Mark as miss
-            self.player_cells[row][col].config(bg="white", text="•")
-            self.status_label.config(text="Opponent missed!")
-
-        # Check if all ships are sunk
-        if self.count_hit_ships(self.player_board) == sum(self.LENGTH_OF_SHIPS):
-            self.client.send("Game Over".encode())  # Notify the server
-            messagebox.showinfo("Defeat", "All your ships have been sunk!")
-            self.ask_restart()
-    
-    def count_hit_ships(self, board):
-        """Count successful hits on ships"""
-        return sum(1 for r in range(self.BOARD_SIZE) for c in range(self.BOARD_SIZE) if board[r][c] == "H")
+            self.player_cells.set(row, col, MISS_MARK)
+            self.status_label.config(text="Opponent missed! Your turn.")
     
     def ask_restart(self):
-        """Prompt to restart the game"""
+        """Prompt to restart the game (on a new connection: the server has closed this one)"""
         if messagebox.askyesno("Game Over", "Would you like to play again?"):
+            if not self.new_game():
+                messagebox.showinfo("Game Over", "Could not start a new game on the server.")
+                self.root.quit()
+                return
+            
             # Reset game state
             self.placing_ship = True
             self.current_ship_index = 0
@@ -279,10 +338,9 @@ class BattleshipGame:
             self.reset_boards()
             
             # Reset UI
-            for r in range(self.BOARD_SIZE):
-                for c in range(self.BOARD_SIZE):
-                    self.player_cells[r][c].config(text=" ", bg="lightblue")
-                    self.enemy_cells[r][c].config(text=" ", bg="lightblue", state="normal")
+            self.preview = []
+            self.player_cells.reset()
+            self.enemy_cells.reset()
             
             # Update status
             self.status_label.config(text=f"Place your ships. Current ship: Size {self.LENGTH_OF_SHIPS[self.current_ship_index]}")
@@ -0,0 +1,368 @@
+import importlib
+import random
+import threading
+from collections import Counter
+from functools import lru_cache
+from battleship_engine import MISS, HIT, SUNK, cell_bit, iter_cells
+from placement import ship_masks
+
+HIT_WEIGHT = 50  # Extra weight for placements that cover a hit on a ship not yet sunk
+FIRED = 1 << 40  # Subtracted from a cell's score once it has been fired at
+NEXT_TO_HIT = 1  # Frontier priority of a cell beside a hit
+LINE_END = 2  # Frontier priority of a cell extending a line of two or more hits
+MODEL_LOCK = threading.Lock()  # A warm-up thread and the game may ask for the model at the same time
+
+
+@lru_cache(maxsize=None)
+def ship_placements(size, length):
+    """Every legal placement of a ship on an empty board.
+
+    Returns (cells, through, density): the flat cell indices of each placement
+    of placement.ship_masks, the placements covering each cell, and how many
+    placements cover each cell.
+    """
+    cells = [tuple(row * size + col for row, col in iter_cells(mask, size)) for mask in ship_masks(size, length)]
+    through = [[] for _ in range(size * size)]
+    for placement, covered in enumerate(cells):
+        for cell in covered:
+            through[cell].append(placement)
+    density = tuple(len(placements) for placements in through)
+    return cells, through, density
+
+
+class UnfiredCells:
+    """Cells not fired at yet, split by checkerboard parity, with O(1) removal and one-draw sampling."""
+
+    def __init__(self, size):
+        self.size = size
+        self.groups = ([], [])  # Cells with (row + col) even, then odd
+        self.position = [0] * (size * size)  # Index of each cell in its group, -1 once removed
+        for cell in range(size * size):
+            group = self.groups[sum(divmod(cell, size)) % 2]
+            self.position[cell] = len(group)
+            group.append(cell)
+
+    def __len__(self):
+        return len(self.groups[0]) + len(self.groups[1])
+
+    def remove(self, cell):
+        """Swap-remove a cell from its group (no-op if already removed)."""
+        index = self.position[cell]
+        if index < 0:
+            return
+        group = self.groups[sum(divmod(cell, self.size)) % 2]
+        last = group.pop()
+        if last != cell:
+            group[index] = last
+            self.position[last] = index
+        self.position[cell] = -1
+
+    def draw(self, rng):
+        """A random remaining cell."""
+        even, odd = self.groups
+        x = rng.random() * (len(even) + len(odd))
+        if x < len(even):
+            return even[int(x)]
+        return odd[min(int(x - len(even)), len(odd) - 1)]
+
+    def draw_even(self, rng):
+        """A random remaining even-parity cell, or odd-parity one once every even cell has been fired at."""
+        group = self.groups[0] or self.groups[1]
+        return group[min(int(rng.random() * len(group)), len(group) - 1)]
+
+
+class TargetFrontier:
+    """Unfired cells next to hits on ships still afloat, updated shot by shot.
+
+    A hit pushes its unfired neighbours; once hits line up, the cells at both
+    ends of the line get LINE_END priority. A sink drops the ship's hits and
+    rebuilds the frontier from the hits that are left, so neighbours of sunk
+    ships are never returned.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.fired = 0
+        self.open_hits = 0  # Hits on ships not sunk yet
+        self.cells = {}  # Cell index -> priority
+
+    def __bool__(self):
+        return bool(self.cells)
+
+    def best(self):
+        """Cell index with the highest priority (the oldest among equals), or None."""
+        if not self.cells:
+            return None
+        return max(self.cells, key=self.cells.__getitem__)
+
+    def record(self, row, col, result, sunk_cells=()):
+        cell = row * self.size + col
+        self.fired |= 1 << cell
+        self.cells.pop(cell, None)
+        if result in (HIT, SUNK):
+            self.open_hits |= 1 << cell
+            self._push(cell)
+        if result == SUNK:
+            for r, c in sunk_cells:
+                self.open_hits &= ~(1 << (r * self.size + c))
+            self.cells = {}
+            hits = self.open_hits
+            while hits:
+                low = hits & -hits
+                self._push(low.bit_length() - 1)
+                hits ^= low
+
+    def _push(self, cell):
+        """Add the unfired cells around a hit, scanning its row and its column."""
+        size = self.size
+        row, col = divmod(cell, size)
+        for step, position in ((1, col), (size, row)):
+            # Walk along the line of open hits through the cell, in both directions
+            low, high, low_position, high_position = cell, cell, position, position
+            while low_position > 0 and self.open_hits >> (low - step) & 1:
+                low, low_position = low - step, low_position - 1
+            while high_position < size - 1 and self.open_hits >> (high + step) & 1:
+                high, high_position = high + step, high_position + 1
+            priority = LINE_END if high > low else NEXT_TO_HIT
+            if low_position > 0:
+                self._add(low - step, priority)
+            if high_position < size - 1:
+                self._add(high + step, priority)
+
+    def _add(self, cell, priority):
+        if not self.fired >> cell & 1 and self.cells.get(cell, 0) < priority:
+            self.cells[cell] = priority
+
+
+class ProbabilityTargeter:
+    """Hunt/target solver firing at the cell covered by the most legal ship placements.
+
+    A placement is legal while it avoids every miss and sunk ship. Placements
+    that cover hits on ships still afloat get HIT_WEIGHT extra per hit, so the
+    same counts drive both hunting and finishing off a wounded ship. Counts are
+    updated incrementally from the placements through the cell that was shot.
+    """
+
+    def __init__(self, board_size, ship_lengths):
+        self.size = board_size
+        self.remaining = Counter(ship_lengths)  # Ships still afloat, by length
+        self.valid = {}
+        self.hit_count = {}  # Unsunk hits covered by each placement
+        self.density = {}  # Legal placements covering each cell
+        self.boost = {}  # Unsunk hits covered by the legal placements through each cell
+        for length in self.remaining:
+            cells, _, density = ship_placements(board_size, length)
+            self.valid[length] = bytearray(b"\x01") * len(cells)
+            self.hit_count[length] = [0] * len(cells)
+            self.density[length] = list(density)
+            self.boost[length] = [0] * (board_size * board_size)
+
+        self.frontier = TargetFrontier(board_size)
+        self.score = [0] * (board_size * board_size)
+        for length, count in self.remaining.items():
+            for cell, value in enumerate(self.density[length]):
+                self.score[cell] += count * value
+
+    def next_target(self):
+        """Return the (row, col) of the unfired cell with the highest score."""
+        frontier = self.frontier.cells
+        if frontier:
+            cell = max(frontier, key=lambda c: (frontier[c], self.score[c]))
+        else:
+            cell = self.score.index(max(self.score))  # First of the best, without a Python-level key
+        return divmod(cell, self.size)
+
+    def record(self, row, col, result, sunk_cells=()):
+        """Update the counts after a shot; sunk_cells lists the (row, col) of a ship that sank."""
+        self.frontier.record(row, col, result, sunk_cells)
+        cell = row * self.size + col
+        self.score[cell] -= FIRED
+        if result == MISS:
+            self._block(cell)
+        elif result in (HIT, SUNK):
+            self._add_hit(cell)
+        if result == SUNK:
+            sunk = [r * self.size + c for r, c in sunk_cells]
+            for sunk_cell in sunk:
+                self._block(sunk_cell)
+            self._remove_ship(len(sunk))
+
+    def _add_hit(self, cell):
+        for length, weight in self.remaining.items():
+            if not weight:
+                continue
+            cells, through, _ = ship_placements(self.size, length)
+            valid, hit_count, boost = self.valid[length], self.hit_count[length], self.boost[length]
+            gain = weight * HIT_WEIGHT
+            for placement in through[cell]:
+                if valid[placement]:
+                    hit_count[placement] += 1
+                    for covered in cells[placement]:
+                        boost[covered] += 1
+                        self.score[covered] += gain
+
+    def _block(self, cell):
+        """Invalidate every placement through a cell that can no longer hold a ship afloat."""
+        for length, weight in self.remaining.items():
+            if not weight:
+                continue
+            cells, through, _ = ship_placements(self.size, length)
+            valid, hit_count = self.valid[length], self.hit_count[length]
+            density, boost = self.density[length], self.boost[length]
+            for placement in through[cell]:
+                if not valid[placement]:
+                    continue
+                valid[placement] = 0
+                hits = hit_count[placement]
+                loss = weight * (1 + HIT_WEIGHT * hits)
+                for covered in cells[placement]:
+                    density[covered] -= 1
+                    boost[covered] -= hits
+                    self.score[covered] -= loss
+
+    def _remove_ship(self, length):
+        """Drop one ship of the given length from the ships still afloat."""
+        if not self.remaining[length]:
+            return
+        self.remaining[length] -= 1
+        density, boost = self.density[length], self.boost[length]
+        for cell in range(len(self.score)):
+            self.score[cell] -= density[cell] + HIT_WEIGHT * boost[cell]
+
+
+class HuntTargeter:
+    """Fires next to unexplored hits, otherwise at a random cell (optionally on a checkerboard).
+
+    Every move takes a single draw from rng, so a seeded random.Random replays
+    the same game.
+    """
+
+    def __init__(self, board_size, ship_lengths, checkerboard=False, rng=random):
+        self.size = board_size
+        self.checkerboard = checkerboard
+        self.rng = rng
+        self.fired = 0
+        self.frontier = TargetFrontier(board_size)
+        self.unfired = UnfiredCells(board_size)
+
+    def next_target(self):
+        # First look for hits that haven't been fully explored
+        target = self.find_next_target()
+        if target:
+            return target
+        if self.checkerboard:
+            return self.smart_random_target()
+        return self.random_target()
+
+    def record(self, row, col, result, sunk_cells=()):
+        self.fired |= cell_bit(self.size, row, col)
+        self.frontier.record(row, col, result, sunk_cells)
+        self.unfired.remove(row * self.size + col)
+
+    def is_fired(self, row, col):
+        return bool(self.fired & cell_bit(self.size, row, col))
+
+    def find_next_target(self):
+        """Best cell of the frontier around unsunk hits, or None"""
+        cell = self.frontier.best()
+        return None if cell is None else divmod(cell, self.size)
+
+    def random_target(self):
+        """Completely random targeting"""
+        return divmod(self.unfired.draw(self.rng), self.size)
+
+    def smart_random_target(self):
+        """Random but with checkerboard pattern (more efficient)"""
+        # Every ship of two cells or more covers an even cell, so odd cells only
+        # come up once the checkerboard is exhausted (a ship of one cell may hide there)
+        return divmod(self.unfired.draw_even(self.rng), self.size)
+
+
+def load_model(path="battleship_dqn"):
+    """Load the trained DQN once per process (imports stable-baselines3 on first use)."""
+    with MODEL_LOCK:
+        return _load_model(path)
+
+
+@lru_cache(maxsize=None)
+def _load_model(path):
+    from stable_baselines3 import DQN
+    return DQN.load(path)
+
+
+def check_model(model, board_size):
+    """Raise ValueError unless the model was trained on boards of this size, seen as observation.py encodes them."""
+    if model.action_space.n != board_size * board_size:
+        side = int(model.action_space.n ** 0.5)
+        raise ValueError(f"The model plays {side}x{side} boards, not {board_size}x{board_size}")
+    from observation import observation_shape
+    if tuple(model.observation_space.shape) != observation_shape(board_size):
+        raise ValueError(f"The model was trained on {model.observation_space.shape} observations, not "
+                         f"{observation_shape(board_size)}: train it again with train_agent.py")
+
+
+class DQNTargeter:
+    """Plays the best unfired cell according to the trained DQN.
+
+    With an inference service (inference.py) the prediction is batched with
+    other games; otherwise the model is loaded in this process on the first move.
+    """
+
+    def __init__(self, board_size, ship_lengths, model_path="battleship_dqn", service=None):
+        self.size = board_size
+        self.service = service
+        self.model_path = model_path
+        self.model = None
+        self.observation = None  # The board as the model saw it in training (observation.py), built on first use
+
+    def _observation(self):
+        if self.observation is None:
+            from observation import new_observation
+            self.observation = new_observation(self.size)
+        return self.observation
+
+    def next_target(self):
+        from observation import legal_actions
+        observation = self._observation()
+        legal = legal_actions(observation)
+        if self.service is not None:
+            return divmod(self.service.predict(observation, legal), self.size)
+        from masked_dqn import masked_q_actions
+        if self.model is None:
+            self.model = load_model(self.model_path)
+            check_model(self.model, self.size)
+        return divmod(int(masked_q_actions(self.model, observation, legal)), self.size)
+
+    def record(self, row, col, result, sunk_cells=()):
+        from observation import record_shot
+        record_shot(self._observation(), row, col, result, sunk_cells)
+
+
+# Built-in strategies, by difficulty name: factory(board_size, ship_lengths, rng)
+STRATEGIES = {
+    "easy": lambda size, lengths, rng: HuntTargeter(size, lengths, rng=rng),
+    "medium": lambda size, lengths, rng: HuntTargeter(size, lengths, checkerboard=True, rng=rng),
+    "hard": lambda size, lengths, rng: ProbabilityTargeter(size, lengths),
+    "dqn": lambda size, lengths, rng: DQNTargeter(size, lengths),
+    # Through the inference service of another process (python inference.py)
+    "dqn-service": lambda size, lengths, rng: DQNTargeter(
+        size, lengths, service=importlib.import_module("inference").connect()),
+}
+
+
+def make_targeter(strategy, board_size, ship_lengths, rng=random):
+    """Create a targeter from a difficulty name, a "module:factory" path or a factory.
+
+    Any targeter provides next_target() -> (row, col) and
+    record(row, col, result, sunk_cells) after each shot.
+    """
+    if callable(strategy):
+        factory = strategy
+    elif strategy in STRATEGIES:
+        factory = STRATEGIES[strategy]
+    elif ":" in strategy:
+        module_name, attr = strategy.split(":", 1)
+        factory = getattr(importlib.import_module(module_name), attr)
+    else:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    return factory(board_size, ship_lengths, rng)
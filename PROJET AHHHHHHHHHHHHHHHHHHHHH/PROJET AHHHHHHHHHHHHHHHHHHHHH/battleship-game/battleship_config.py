@@ -0,0 +1,68 @@
+import string
+
+DEFAULT_BOARD_SIZE = 8
+DEFAULT_FLEET = (5, 4, 3, 3, 2)  # Carrier, battleship, cruiser, submarine, destroyer (placement order)
+MAX_BOARD_SIZE = 255  # Coordinates travel as single bytes in protocol.py
+
+
+def column_label(col):
+    """Spreadsheet-style column name: A..Z, then AA, AB..."""
+    label = ""
+    col += 1
+    while col:
+        col, letter = divmod(col - 1, 26)
+        label = string.ascii_uppercase[letter] + label
+    return label
+
+
+class GameConfig:
+    """Board size and fleet of a game, shared by the GUIs, the server, the AI and the environments."""
+
+    def __init__(self, board_size=DEFAULT_BOARD_SIZE, ship_lengths=DEFAULT_FLEET):
+        ship_lengths = tuple(ship_lengths)
+        if not 1 <= board_size <= MAX_BOARD_SIZE:
+            raise ValueError(f"Board size must be between 1 and {MAX_BOARD_SIZE}, not {board_size}")
+        if not ship_lengths or not all(1 <= length <= board_size for length in ship_lengths):
+            raise ValueError(f"Every ship must have between 1 and {board_size} cells: {ship_lengths}")
+        if sum(ship_lengths) > board_size * board_size:
+            raise ValueError(f"Fleet {ship_lengths} has more cells than a {board_size}x{board_size} board")
+        self.board_size = board_size
+        self.ship_lengths = ship_lengths
+        self.letters = tuple(column_label(col) for col in range(board_size))  # Column labels
+
+    @property
+    def cells(self):
+        return self.board_size * self.board_size
+
+    def cell_name(self, row, col):
+        """Name of a cell as shown to players, e.g. "B7"."""
+        return f"{self.letters[col]}{row + 1}"
+
+    def __eq__(self, other):
+        return isinstance(other, GameConfig) and (self.board_size, self.ship_lengths) == (
+            other.board_size, other.ship_lengths)
+
+    def __hash__(self):
+        return hash((self.board_size, self.ship_lengths))
+
+    def __repr__(self):
+        return f"GameConfig({self.board_size}, {self.ship_lengths})"
+
+
+DEFAULT_CONFIG = GameConfig()
+
+
+def add_config_arguments(parser):
+    """Add --board-size and --ships to a command-line parser."""
+    parser.add_argument("--board-size", type=int, default=DEFAULT_BOARD_SIZE)
+    parser.add_argument("--ships", type=int, nargs="+", default=list(DEFAULT_FLEET), help="Ship lengths")
+
+
+def config_from_args(args, parser=None):
+    """GameConfig of parsed --board-size / --ships arguments (reported through the parser if invalid)."""
+    try:
+        return GameConfig(args.board_size, args.ships)
+    except ValueError as e:
+        if parser is None:
+            raise
+        parser.error(str(e))
@@ -0,0 +1,196 @@
+from functools import lru_cache
+
+# Ship orientations
+HORIZONTAL = "H"
+VERTICAL = "V"
+
+# Shot results
+MISS = 0
+HIT = 1
+SUNK = 2
+REPEAT = 3  # The cell had already been fired at
+
+
+def cell_index(size, row, col):
+    """Bit position of a cell."""
+    return row * size + col
+
+
+def cell_bit(size, row, col):
+    """Single-bit mask of a cell."""
+    return 1 << (row * size + col)
+
+
+@lru_cache(maxsize=None)
+def full_mask(size):
+    """Mask with every cell of the board set."""
+    return (1 << (size * size)) - 1
+
+
+@lru_cache(maxsize=None)
+def _column_masks(size):
+    """Masks of the board without its first column and without its last column."""
+    first_column = sum(1 << (r * size) for r in range(size))
+    full = full_mask(size)
+    return full & ~first_column, full & ~(first_column << (size - 1))
+
+
+def ship_mask(size, length, row, col, orientation):
+    """Mask covered by a ship, or 0 if it does not fit on the board."""
+    if row < 0 or col < 0:
+        return 0
+    if orientation == HORIZONTAL:
+        if col + length > size or row >= size:
+            return 0
+        return ((1 << length) - 1) << (row * size + col)
+    if row + length > size or col >= size:
+        return 0
+    mask = 0
+    for r in range(row, row + length):
+        mask |= 1 << (r * size + col)
+    return mask
+
+
+def neighbours(mask, size):
+    """Cells orthogonally adjacent to any cell of the mask (excluding the mask itself)."""
+    not_first, not_last = _column_masks(size)
+    spread = ((mask << 1) & not_first) | ((mask >> 1) & not_last) | (mask << size) | (mask >> size)
+    return spread & full_mask(size) & ~mask
+
+
+def iter_cells(mask, size):
+    """Yield the (row, col) of every cell set in the mask, in row-major order."""
+    while mask:
+        low = mask & -mask
+        yield divmod(low.bit_length() - 1, size)
+        mask ^= low
+
+
+def ship_origin(mask, size):
+    """(row, col, length, orientation) of a ship from its mask."""
+    low = mask & -mask
+    row, col = divmod(low.bit_length() - 1, size)
+    length = count_cells(mask)
+    if length > 1 and not mask & (low << 1):
+        return row, col, length, VERTICAL
+    return row, col, length, HORIZONTAL
+
+
+def count_cells(mask):
+    """Number of cells set in the mask."""
+    return bin(mask).count("1")
+
+
+class Board:
+    """One player's fleet and the shots fired at it, stored as integer bitmasks.
+
+    Each cell also records the index of the ship on it, and each ship its
+    remaining hit points, so a hit, a sink and the end of the game are all
+    constant-time updates that know exactly which ship was hit.
+    """
+
+    def __init__(self, size=8):
+        self.size = size
+        self.reset()
+
+    def reset(self):
+        """Remove all ships and shots."""
+        self.ships = 0  # Cells occupied by any ship
+        self.hits = 0
+        self.misses = 0
+        self.ship_masks = []  # One mask per placed ship, in placement order
+        self.ship_hp = []  # Cells of each ship not hit yet
+        self.cell_ship = [None] * (self.size * self.size)  # Index of the ship on each cell
+        self.remaining = 0  # Ship cells not hit yet, over the whole fleet
+
+    @property
+    def fired(self):
+        """Cells that have been fired at."""
+        return self.hits | self.misses
+
+    @property
+    def sunk(self):
+        """Cells of ships that have been sunk."""
+        mask = 0
+        for ship, hp in zip(self.ship_masks, self.ship_hp):
+            if not hp:
+                mask |= ship
+        return mask
+
+    def has_ship(self, row, col):
+        return bool(self.ships & cell_bit(self.size, row, col))
+
+    def is_fired(self, row, col):
+        return bool(self.fired & cell_bit(self.size, row, col))
+
+    def unfired(self):
+        """One flag per cell in row-major order, True where no shot has landed (the legal moves)."""
+        fired = self.fired
+        return [not fired >> cell & 1 for cell in range(self.size * self.size)]
+
+    def is_hit(self, row, col):
+        return bool(self.hits & cell_bit(self.size, row, col))
+
+    def can_place(self, length, row, col, orientation):
+        """Check that a ship fits on the board and does not overlap another ship."""
+        mask = ship_mask(self.size, length, row, col, orientation)
+        return bool(mask) and not mask & self.ships
+
+    def place_ship(self, length, row, col, orientation):
+        """Place a ship and return its mask, or 0 if the placement is illegal."""
+        mask = ship_mask(self.size, length, row, col, orientation)
+        if not mask or mask & self.ships:
+            return 0
+        self._add_ship(mask)
+        return mask
+
+    def place_layout(self, ship_masks):
+        """Place a whole fleet of non-overlapping ship masks (e.g. from placement.py)."""
+        for mask in ship_masks:
+            self._add_ship(mask)
+
+    def _add_ship(self, mask):
+        index = len(self.ship_masks)
+        length = 0
+        remaining = mask
+        while remaining:
+            low = remaining & -remaining
+            self.cell_ship[low.bit_length() - 1] = index
+            remaining ^= low
+            length += 1
+        self.ships |= mask
+        self.ship_masks.append(mask)
+        self.ship_hp.append(length)
+        self.remaining += length
+
+    def ship_at(self, row, col):
+        """Index of the ship covering a cell, or None."""
+        return self.cell_ship[row * self.size + col]
+
+    def ship_length(self, index):
+        return count_cells(self.ship_masks[index])
+
+    def fire(self, row, col):
+        """Fire at a cell and return (result, index of the ship hit or None)."""
+        cell = row * self.size + col
+        bit = 1 << cell
+        if (self.hits | self.misses) & bit:
+            return REPEAT, None
+        index = self.cell_ship[cell]
+        if index is None:
+            self.misses |= bit
+            return MISS, None
+        self.hits |= bit
+        self.ship_hp[index] -= 1
+        self.remaining -= 1
+        if not self.ship_hp[index]:
+            return SUNK, index
+        return HIT, index
+
+    def all_sunk(self):
+        """True once every ship cell has been hit."""
+        return not self.remaining
+
+    def all_fired(self):
+        """True once every cell of the board has been fired at."""
+        return self.fired == full_mask(self.size)
@@ -1,45 +1,69 @@
 import gym
 from gym import spaces
 import numpy as np
+from battleship_engine import Board, MISS, SUNK, REPEAT, iter_cells
+from battleship_config import DEFAULT_CONFIG
+from placement import layout_pool
+from observation import observation_shape, new_observation, record_shot
+
+# Rewards
+HIT_REWARD = 1
+MISS_REWARD = 0
+REPEAT_REWARD = -1  # Penalty for firing at the same cell twice
 
 class BattleshipEnv(gym.Env):
-    def __init__(self):
+    def __init__(self, config=DEFAULT_CONFIG, seed=None):
         super(BattleshipEnv, self).__init__()
-        
+
         # Define the board size and action/observation spaces
-        self.board_size = 8
+        self.config = config
+        self.board_size = config.board_size
+        self.ship_lengths = config.ship_lengths
         self.action_space = spaces.Discrete(self.board_size * self.board_size)  # One action per cell
-        self.observation_space = spaces.Box(low=0, high=1, shape=(self.board_size, self.board_size), dtype=np.int32)
-        
+        # One-hot state of every cell as seen by the shooter (observation.py)
+        self.observation_space = spaces.Box(low=0, high=1, shape=observation_shape(self.board_size), dtype=np.int8)
+
+        # Fleets are picked from a pool of legal layouts built once per process
+        self.layouts = layout_pool(self.board_size, self.ship_lengths)
+        self.rng = np.random.default_rng(seed)
+
         # Initialize the game state
         self.reset()
 
     def reset(self):
-        """Reset the environment to the initial state."""
-        self.player_board = np.zeros((self.board_size, self.board_size), dtype=np.int32)
-        self.computer_board = np.zeros((self.board_size, self.board_size), dtype=np.int32)
+        """Start a new game against a random hidden fleet."""
+        self.board = Board(self.board_size)  # The hidden fleet and the shots fired at it
+        self.board.place_layout(self.layouts[self.rng.integers(len(self.layouts))])
+        self.observation = new_observation(self.board_size)
         self.done = False
-        return self.player_board
+        return self.observation.copy()
 
     def step(self, action):
-        """Take a step in the environment."""
-        row, col = divmod(action, self.board_size)
-        
-        # Example logic: Mark the cell as hit
-        if self.computer_board[row, col] == 0:
-            self.computer_board[row, col] = 1  # Mark as hit
-            reward = 1  # Reward for a hit
+        """Fire at one cell; the episode ends once the whole fleet is sunk."""
+        row, col = divmod(int(action), self.board_size)
+        info = {}
+
+        result, ship = self.board.fire(row, col)
+        sunk_cells = iter_cells(self.board.ship_masks[ship], self.board_size) if result == SUNK else ()
+        record_shot(self.observation, row, col, result, sunk_cells)
+        if result == REPEAT:
+            # The state does not change, so an invalid shot can never end the episode
+            reward = REPEAT_REWARD
         else:
-            reward = -1  # Penalty for hitting the same cell
-        
+            reward = MISS_REWARD if result == MISS else HIT_REWARD
+            if result == SUNK:
+                info["sunk"] = ship
+
         # Check if the game is over
-        self.done = np.all(self.computer_board == 1)
-        
-        return self.player_board, reward, self.done, {}
+        self.done = self.board.all_sunk()
+        info["action_mask"] = self.action_masks()
+        return self.observation.copy(), reward, self.done, info
+
+    def action_masks(self):
+        """Legal actions: True for every cell not fired at yet."""
+        return np.array(self.board.unfired(), dtype=bool)
 
     def render(self, mode="human"):
-        """Render the game board."""
-        print("Player Board:")
-        print(self.player_board)
-        print("Computer Board:")
-        print(self.computer_board)
\ No newline at end of file
+        """Render the shots: '.' unknown, 'o' miss, 'x' hit, '#' sunk."""
+        symbols = np.array([".", "o", "x", "#"])
+        print("\n".join(" ".join(row) for row in symbols[self.observation.argmax(axis=0)]))
@@ -0,0 +1,304 @@
+import multiprocessing
+from functools import lru_cache
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+from battleship_engine import iter_cells
+from battleship_config import DEFAULT_CONFIG
+from placement import layout_pool
+from observation import UNKNOWN, MISS, HIT, SUNK, observation_shape, encode_cells
+
+# stable-baselines3 >= 2.0 only accepts gymnasium spaces on a VecEnv
+try:
+    from gymnasium import spaces
+except ImportError:
+    from gym import spaces
+
+# Rewards
+HIT_REWARD = 1.0
+MISS_REWARD = 0.0
+REPEAT_REWARD = -1.0  # Penalty for firing at the same cell twice
+
+
+@lru_cache(maxsize=None)
+def layout_grids(board_size, ship_lengths):
+    """placement.layout_pool as a (layouts, H * W) array of ship ids (0 = water, i + 1 = ship i)."""
+    layouts = layout_pool(board_size, ship_lengths)
+    grids = np.zeros((len(layouts), board_size * board_size), dtype=np.int8)
+    for grid, layout in zip(grids, layouts):
+        for ship, mask in enumerate(layout):
+            for row, col in iter_cells(mask, board_size):
+                grid[row * board_size + col] = ship + 1
+    return grids
+
+
+class BattleshipVecEnv(VecEnv):
+    """Steps K Battleship boards at once, keeping every board in one (K, H * W) array.
+
+    Fleets are drawn from the same pool of legal layouts as BattleshipEnv, and
+    boards are observed the same way (observation.py): a reset copies one row
+    of the pool, and the observations are one-hot (K, 4, H, W) arrays.
+    """
+
+    def __init__(self, num_envs=8, config=DEFAULT_CONFIG, max_steps=None, seed=None):
+        self.config = config
+        self.board_size = board_size = config.board_size
+        self.ship_lengths = list(config.ship_lengths)
+        self.max_steps = max_steps or 2 * board_size * board_size
+        n_cells = board_size * board_size
+
+        action_space = spaces.Discrete(n_cells)
+        observation_space = spaces.Box(low=0, high=1, shape=observation_shape(board_size), dtype=np.int8)
+        self.render_mode = None
+        super(BattleshipVecEnv, self).__init__(num_envs, observation_space, action_space)
+
+        self.rng = np.random.default_rng(seed)
+        self.layouts = layout_grids(board_size, tuple(self.ship_lengths))
+
+        # Game state, flattened to (K, H * W) so an action indexes a cell directly
+        self.ships = np.zeros((num_envs, n_cells), dtype=np.int8)  # 0 = water, i + 1 = ship i
+        self.cells = np.zeros((num_envs, n_cells), dtype=np.int8)  # UNKNOWN / MISS / HIT / SUNK
+        self.ship_hp = np.zeros((num_envs, len(self.ship_lengths)), dtype=np.int32)
+        self.remaining = np.zeros(num_envs, dtype=np.int32)  # Ship cells not yet hit
+        self.steps = np.zeros(num_envs, dtype=np.int32)
+        self._actions = None
+
+        self._reset_boards(np.arange(num_envs))
+
+    def _place_fleets(self, boards):
+        """Give each of the given boards a random fleet of the layout pool."""
+        self.ships[boards] = self.layouts[self.rng.integers(len(self.layouts), size=boards.size)]
+
+    def _reset_boards(self, boards):
+        """Start a new game on the given boards, in place."""
+        if boards.size == 0:
+            return
+        self._place_fleets(boards)
+        self.cells[boards] = UNKNOWN
+        self.ship_hp[boards] = self.ship_lengths
+        self.remaining[boards] = sum(self.ship_lengths)
+        self.steps[boards] = 0
+
+    def action_masks(self):
+        """(K, H * W) legal actions of the current observations: cells not fired at yet."""
+        return self.cells == UNKNOWN
+
+    def _observations(self):
+        return encode_cells(self.cells, self.board_size)
+
+    def reset(self):
+        """Reset every board and return the batch of observations."""
+        self._reset_boards(np.arange(self.num_envs))
+        return self._observations()
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        """Resolve one shot on every board; finished boards are reset in place."""
+        boards = np.arange(self.num_envs)
+        actions = self._actions
+
+        ship = self.ships[boards, actions]
+        repeat = self.cells[boards, actions] != UNKNOWN
+        hit = (ship > 0) & ~repeat
+        miss = (ship == 0) & ~repeat
+
+        self.cells[boards[hit], actions[hit]] = HIT
+        self.cells[boards[miss], actions[miss]] = MISS
+        rewards = np.where(hit, HIT_REWARD, np.where(repeat, REPEAT_REWARD, MISS_REWARD)).astype(np.float32)
+
+        # Each ship id appears at most once per board, so fancy-index updates are safe
+        hit_boards = boards[hit]
+        hit_ships = ship[hit] - 1
+        self.ship_hp[hit_boards, hit_ships] -= 1
+        sunk = np.zeros(self.num_envs, dtype=bool)
+        sunk[hit_boards] = self.ship_hp[hit_boards, hit_ships] == 0
+        sunk_boards = np.flatnonzero(sunk)
+        if sunk_boards.size:
+            # The whole ship moves from the hit state to the sunk one
+            sunk_cells = self.ships[sunk_boards] == ship[sunk_boards][:, None]
+            self.cells[sunk_boards] = np.where(sunk_cells, SUNK, self.cells[sunk_boards])
+        self.remaining[hit_boards] -= 1
+        self.steps += 1
+
+        won = self.remaining == 0
+        truncated = (self.steps >= self.max_steps) & ~won
+        dones = won | truncated
+
+        obs = self._observations()
+        infos = [{} for _ in range(self.num_envs)]
+        for i in sunk_boards:
+            infos[i]["sunk"] = int(ship[i]) - 1  # Index of the ship that sank
+        finished = np.flatnonzero(dones)
+        for i in finished:
+            infos[i]["terminal_observation"] = obs[i].copy()
+            infos[i]["TimeLimit.truncated"] = bool(truncated[i])
+            infos[i]["episode_steps"] = int(self.steps[i])
+
+        self._reset_boards(finished)
+        obs[finished] = encode_cells(self.cells[finished], self.board_size)
+        masks = self.action_masks()
+        for i, info in enumerate(infos):
+            info["action_mask"] = masks[i]  # For the returned observation (a new board when done)
+        return obs, rewards, dones, infos
+
+    def close(self):
+        pass
+
+    def seed(self, seed=None):
+        """Reseed the shared random generator."""
+        self.rng = np.random.default_rng(seed)
+        return [seed] * self.num_envs
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        method = getattr(self, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+    def render(self, mode="human"):
+        """Render the first board: '.' unknown, 'o' miss, 'x' hit, '#' sunk."""
+        symbols = np.array([".", "o", "x", "#"])
+        print("Board 0:")
+        print("\n".join(" ".join(row) for row in symbols[self.cells[0].reshape(self.board_size, self.board_size)]))
+
+
+def _worker(remote, parent_remote, env_kwargs):
+    """Run one BattleshipVecEnv in a subprocess, answering commands from the pipe."""
+    parent_remote.close()
+    env = BattleshipVecEnv(**env_kwargs)
+    try:
+        while True:
+            command, data = remote.recv()
+            if command == "step":
+                env.step_async(data)
+                remote.send(env.step_wait())
+            elif command == "reset":
+                remote.send((env.reset(), env.action_masks()))
+            elif command == "seed":
+                remote.send(env.seed(data))
+            elif command == "get_attr":
+                remote.send(env.get_attr(*data))
+            elif command == "set_attr":
+                remote.send(env.set_attr(*data))
+            elif command == "env_method":
+                name, args, kwargs, indices = data
+                remote.send(env.env_method(name, *args, indices=indices, **kwargs))
+            elif command == "close":
+                break
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        remote.close()
+
+
+class SubprocBattleshipVecEnv(VecEnv):
+    """Spreads batches of boards over worker processes, each stepping its own BattleshipVecEnv.
+
+    Actions for all num_workers * envs_per_worker boards are split between the
+    workers and their results concatenated, so it is a drop-in replacement for
+    a single BattleshipVecEnv of the same total size.
+    """
+
+    def __init__(self, num_workers=4, envs_per_worker=8, seed=None, start_method=None, **env_kwargs):
+        if start_method is None:
+            # forkserver avoids forking a process that already runs torch threads
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(start_method)
+        self.envs_per_worker = envs_per_worker
+        self.remotes, self.processes = [], []
+        for worker in range(num_workers):
+            remote, work_remote = context.Pipe()
+            kwargs = dict(env_kwargs, num_envs=envs_per_worker, seed=None if seed is None else seed + worker)
+            process = context.Process(target=_worker, args=(work_remote, remote, kwargs), daemon=True)
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+        self.closed = False
+        self.masks = None  # Legal actions, sent back with every step
+
+        self.remotes[0].send(("get_attr", ("observation_space",)))
+        observation_space = self.remotes[0].recv()[0]
+        self.remotes[0].send(("get_attr", ("action_space",)))
+        action_space = self.remotes[0].recv()[0]
+        self.render_mode = None
+        super(SubprocBattleshipVecEnv, self).__init__(num_workers * envs_per_worker, observation_space, action_space)
+
+    def _split(self, indices):
+        """Map global board indices to (worker, local indices) pairs."""
+        by_worker = {}
+        for index in self._get_indices(indices):
+            worker, local = divmod(index, self.envs_per_worker)
+            by_worker.setdefault(worker, []).append(local)
+        return by_worker.items()
+
+    def reset(self):
+        for remote in self.remotes:
+            remote.send(("reset", None))
+        obs, masks = zip(*[remote.recv() for remote in self.remotes])
+        self.masks = np.concatenate(masks)
+        return np.concatenate(obs)
+
+    def action_masks(self):
+        """Legal actions of the current observations, kept from the last reset or step."""
+        return self.masks
+
+    def step_async(self, actions):
+        actions = np.asarray(actions).reshape(len(self.remotes), self.envs_per_worker)
+        for remote, worker_actions in zip(self.remotes, actions):
+            remote.send(("step", worker_actions))
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        obs, rewards, dones, infos = zip(*results)
+        infos = [i for info in infos for i in info]
+        self.masks = np.stack([info["action_mask"] for info in infos])
+        return np.concatenate(obs), np.concatenate(rewards), np.concatenate(dones), infos
+
+    def close(self):
+        if self.closed:
+            return
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def seed(self, seed=None):
+        for worker, remote in enumerate(self.remotes):
+            remote.send(("seed", None if seed is None else seed + worker))
+        return [s for remote in self.remotes for s in remote.recv()]
+
+    def get_attr(self, attr_name, indices=None):
+        values = []
+        for worker, local in self._split(indices):
+            self.remotes[worker].send(("get_attr", (attr_name, local)))
+            values += self.remotes[worker].recv()
+        return values
+
+    def set_attr(self, attr_name, value, indices=None):
+        for worker, local in self._split(indices):
+            self.remotes[worker].send(("set_attr", (attr_name, value, local)))
+            self.remotes[worker].recv()
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        values = []
+        for worker, local in self._split(indices):
+            self.remotes[worker].send(("env_method", (method_name, method_args, method_kwargs, local)))
+            values += self.remotes[worker].recv()
+        return values
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+    def render(self, mode="human"):
+        """Render the first board."""
+        self.env_method("render", indices=[0])
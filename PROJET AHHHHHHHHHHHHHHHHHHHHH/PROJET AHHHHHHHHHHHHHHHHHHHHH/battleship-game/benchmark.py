@@ -0,0 +1,333 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from battleship_engine import Board, SUNK, iter_cells
+from battleship_config import DEFAULT_CONFIG, DEFAULT_FLEET, GameConfig
+from placement import PlacementIndex, place_random_fleet, ship_masks
+from battleship_ai import make_targeter
+
+BOARD_SIZES = (8, 10, 20, 30, 50)
+STRATEGIES = ("easy", "medium", "hard")
+HIGHER_IS_BETTER = {"games/s", "moves/s"}  # Every other unit is a duration
+TOLERANCE = 0.2  # Relative slowdown flagged as a regression by --compare
+BATCH_TIME = 0.02  # Seconds a short operation is repeated for in one timed batch
+BATCHES = 5  # Batches per measurement of a short operation; the fastest one counts
+
+
+def time_repeated(function):
+    """Seconds per call of a short function: the best mean of BATCHES batches of BATCH_TIME each.
+
+    A single call under a millisecond is mostly timer, cache and scheduler noise.
+    """
+    best = None
+    for _ in range(BATCHES):
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            function()
+            calls += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= BATCH_TIME:
+                break
+        best = elapsed / calls if best is None else min(best, elapsed / calls)
+    return best
+
+
+def time_engine(config, games, seed=0):
+    """Microseconds per Board.fire and per sink/win check, firing at every cell of random fleets."""
+    rng = random.Random(seed)
+    size = config.board_size
+    cells = [divmod(cell, size) for cell in range(size * size)]
+    firing = checking = 0.0
+    for _ in range(games):
+        board = Board(size)
+        place_random_fleet(board, config.ship_lengths, rng)
+        rng.shuffle(cells)
+        start = time.perf_counter()
+        for row, col in cells:
+            board.fire(row, col)
+        firing += time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in cells:
+            board.sunk
+            board.all_sunk()
+        checking += time.perf_counter() - start
+    shots = games * len(cells)
+    return 1e6 * firing / shots, 1e6 * checking / shots
+
+
+def time_placement(config, count, seed=0):
+    """Seconds to build the placement index, and per random fleet afterwards."""
+
+    def build_index():
+        ship_masks.cache_clear()  # Time the enumeration of placements too, as in a new process
+        return PlacementIndex(config.board_size, config.ship_lengths)  # Not the cached one: time the build
+
+    build = time_repeated(build_index)
+    index = build_index()
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    for _ in range(count):
+        index.sample(rng)
+    return build, (time.perf_counter() - start) / count
+
+
+def time_moves(strategy, config, games, seed=0):
+    """Seconds to create a targeter, seconds per move (target, fire, record) and moves per game.
+
+    Each game is one targeter clearing a random fleet on a fresh board. Creating
+    a targeter is timed apart, with time_repeated().
+    """
+    rng = random.Random(seed)
+    size = config.board_size
+    playing, moves = 0.0, 0
+    for _ in range(games):
+        board = Board(size)
+        place_random_fleet(board, config.ship_lengths, rng)
+        targeter = make_targeter(strategy, size, config.ship_lengths, rng)
+
+        start = time.perf_counter()
+        while not board.all_sunk():
+            row, col = targeter.next_target()
+            result, ship = board.fire(row, col)
+            sunk_cells = list(iter_cells(board.ship_masks[ship], size)) if result == SUNK else []
+            targeter.record(row, col, result, sunk_cells)
+            moves += 1
+        playing += time.perf_counter() - start
+    setup = time_repeated(lambda: make_targeter(strategy, size, config.ship_lengths, random.Random(seed)))
+    return setup, playing / moves, moves / games
+
+
+def time_env(config, steps, seed=0):
+    """Microseconds per BattleshipEnv.step, playing random legal cells (None without gym)."""
+    try:
+        from battleship_env import BattleshipEnv
+    except ImportError:
+        return None
+    rng = random.Random(seed)
+    env = BattleshipEnv(config, seed=seed)
+    unfired = list(range(config.cells))
+    elapsed = 0.0
+    for _ in range(steps):
+        action = unfired.pop(rng.randrange(len(unfired)))
+        start = time.perf_counter()
+        _, _, done, _ = env.step(action)
+        elapsed += time.perf_counter() - start
+        if done:
+            env.reset()
+            unfired = list(range(config.cells))
+    return 1e6 * elapsed / steps
+
+
+def time_vec_env(config, steps, num_envs=64, seed=0):
+    """Microseconds per board-step of BattleshipVecEnv (None without stable-baselines3)."""
+    try:
+        import numpy as np
+        from battleship_vec_env import BattleshipVecEnv
+    except ImportError:
+        return None
+    env = BattleshipVecEnv(num_envs, config, seed=seed)
+    rng = np.random.default_rng(seed)
+    env.reset()
+    start = time.perf_counter()
+    for _ in range(max(1, steps // num_envs)):
+        masks = env.action_masks()
+        env.step_async(np.argmax(rng.random(masks.shape) * masks, axis=1))
+        env.step_wait()
+    return 1e6 * (time.perf_counter() - start) / (max(1, steps // num_envs) * num_envs)
+
+
+def games_per_second(strategy, config, games, seed=0):
+    """End-to-end simulated games/sec of a strategy against itself, in this process."""
+    from simulate import simulate
+    _, _, elapsed = simulate([strategy, strategy], games, config, workers=1, seed=seed)
+    return games / elapsed
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def server_round_trip(bots, games, seed=0):
+    """(p50 ms, p99 ms, moves/sec) of bot games played through a local server process."""
+    from loadtest import run_bots, percentile
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "server.py", "--port", str(port), "--no-journal", "--no-state"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        time.sleep(1)  # Let the server bind
+        start = time.perf_counter()
+        stats = asyncio.run(run_bots("127.0.0.1", port, bots, games, seed))
+        elapsed = time.perf_counter() - start
+    finally:
+        server.send_signal(signal.SIGINT)
+        server.wait()
+    return 1000 * percentile(stats.latencies, 0.5), 1000 * percentile(stats.latencies, 0.99), stats.moves / elapsed
+
+
+def time_recovery(rooms, config=DEFAULT_CONFIG, seed=0):
+    """Seconds for a restarted server to rebuild `rooms` games in progress: from the write-ahead
+    log alone, then from a snapshot, and to write that snapshot (compaction)."""
+    from room_store import RoomStore
+    rng = random.Random(seed)
+    size = config.board_size
+    with tempfile.TemporaryDirectory() as directory:
+        store = RoomStore(directory, flush_interval=60)
+        for room_id in range(1, rooms + 1):
+            boards = [Board(size), Board(size)]
+            for board in boards:
+                place_random_fleet(board, config.ship_lengths, rng)
+            store.start_room(room_id, rng.getrandbits(16), boards)
+            for shot in range(rng.randrange(size * size // 2)):  # Games at every stage
+                player = shot % 2
+                row, col = divmod(rng.randrange(size * size), size)
+                store.shot(room_id, player, row, col, boards[1 - player].fire(row, col)[0])
+        store.close()
+
+        start = time.perf_counter()
+        store = RoomStore(directory)  # Replays the log, then snapshots it
+        from_log = time.perf_counter() - start
+        store.close()
+        start = time.perf_counter()
+        store = RoomStore(directory)
+        from_snapshot = time.perf_counter() - start
+        assert len(store.recovered) == rooms
+        start = time.perf_counter()
+        store.compact((room.room_id, room.nonce, room.boards, room.turn, room.shots) for room in store.recovered)
+        compaction = time.perf_counter() - start
+        store.close()
+    return from_log, from_snapshot, compaction
+
+
+def run_suite(args):
+    """Run every benchmark; returns {name: {"value": ..., "unit": ...}}."""
+    results = {}
+
+    def record(name, value, unit):
+        if value is None:
+            print(f"  {name}: skipped (missing dependency)")
+            return
+        results[name] = {"value": value, "unit": unit}
+        print(f"  {name}: {value:,.2f} {unit}")
+
+    for size in args.sizes:
+        config = GameConfig(size, args.ships)
+        print(f"{size}x{size}, fleet {config.ship_lengths}")
+        build, sample = time_placement(config, 1000, args.seed)
+        record(f"placement.index/{size}", 1000 * build, "ms")
+        record(f"placement.sample/{size}", 1e6 * sample, "us")
+        fire, check = time_engine(config, args.games, args.seed)
+        record(f"engine.fire/{size}", fire, "us")
+        record(f"engine.sunk_check/{size}", check, "us")
+        for strategy in args.strategies:
+            setup, move, moves = time_moves(strategy, config, args.games, args.seed)
+            record(f"targeting.{strategy}/{size}", 1e6 * move, "us")
+            record(f"targeting.{strategy}.setup/{size}", 1000 * setup, "ms")
+            record(f"targeting.{strategy}.shots/{size}", moves, "shots")  # Fewer is a better AI
+        record(f"env.step/{size}", time_env(config, args.steps, args.seed), "us")
+        record(f"vec_env.step/{size}", time_vec_env(config, args.steps, seed=args.seed), "us")
+
+    print(f"Simulated games, {DEFAULT_CONFIG.board_size}x{DEFAULT_CONFIG.board_size}")
+    for strategy in args.strategies:
+        record(f"simulate.{strategy}", games_per_second(strategy, DEFAULT_CONFIG, args.sim_games, args.seed), "games/s")
+
+    if args.rooms:
+        print(f"Recovery of {args.rooms} rooms in progress")
+        from_log, from_snapshot, compaction = time_recovery(args.rooms, DEFAULT_CONFIG, args.seed)
+        record(f"recovery.log/{args.rooms}", from_log, "s")
+        record(f"recovery.snapshot/{args.rooms}", from_snapshot, "s")
+        record(f"recovery.compact/{args.rooms}", compaction, "s")
+
+    if args.bots:
+        print("Server round-trip")
+        p50, p99, rate = server_round_trip(args.bots, args.bot_games, args.seed)
+        record("server.rtt_p50", p50, "ms")
+        record("server.rtt_p99", p99, "ms")
+        record("server.moves", rate, "moves/s")
+    return results
+
+
+def best_of(results, other):
+    """Keep the better value of each result over two runs of the suite."""
+    for name, result in other.items():
+        if name not in results:
+            results[name] = result
+        elif (result["value"] > results[name]["value"]) == (result["unit"] in HIGHER_IS_BETTER):
+            results[name] = result
+    return results
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Print each result against the baseline; returns the names that got worse by more than tolerance."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]["value"], result["value"]
+        if not old or not new:
+            continue
+        # Above 1 means worse, whichever way the unit goes
+        ratio = old / new if result["unit"] in HIGHER_IS_BETTER else new / old
+        flag = "REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{name:32} {old:12,.2f} -> {new:12,.2f} {result['unit']:8} {100 * (ratio - 1):+7.1f}% {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks of the game rules, AI, environments and server")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(BOARD_SIZES))
+    parser.add_argument("--ships", type=int, nargs="+", default=list(DEFAULT_FLEET), help="Ship lengths")
+    parser.add_argument("--strategies", nargs="+", default=list(STRATEGIES))
+    parser.add_argument("--games", type=int, default=20, help="Games per strategy and board size")
+    parser.add_argument("--steps", type=int, default=5000, help="Environment steps per board size")
+    parser.add_argument("--sim-games", type=int, default=2000, help="Simulated games per difficulty")
+    parser.add_argument("--bots", type=int, default=20, help="Bots playing through the server (0 to skip)")
+    parser.add_argument("--bot-games", type=int, default=5, help="Games per bot")
+    parser.add_argument("--rooms", type=int, default=20000, help="Rooms restored by the recovery benchmark (0 to skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Run the suite this many times and keep the best results")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="Relative slowdown reported as a regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = run_suite(args)
+    for _ in range(args.repeat - 1):
+        results = best_of(results, run_suite(args))
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "args": vars(args),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"{len(regressions)} regression(s) beyond {100 * args.tolerance:.0f}%")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
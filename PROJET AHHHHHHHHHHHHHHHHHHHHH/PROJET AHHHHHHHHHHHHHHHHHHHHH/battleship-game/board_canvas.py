@@ -0,0 +1,130 @@
+import tkinter as tk
+
+CELL_SIZE = 30  # Pixels per cell on small boards
+MIN_CELL_SIZE = 10
+MAX_BOARD_PIXELS = 480  # Larger boards get smaller cells, down to MIN_CELL_SIZE
+LABEL_SIZE = 20  # Margin holding the row numbers and column letters
+
+# Looks of a cell: (fill colour, text)
+WATER = ("lightblue", "")
+SHIP = ("gray", "")
+PREVIEW = ("lightgreen", "")  # Where the ship being placed would go
+HIT_MARK = ("red", "X")
+MISS_MARK = ("white", "•")
+
+
+class BoardCanvas:
+    """A board drawn on one tk.Canvas, with a rectangle and a text item per cell.
+
+    set() only records the look wanted for a cell; the cells that changed are
+    redrawn together by one after_idle callback, so a burst of changes (a hover
+    preview, a reset) costs one update per idle cycle. Every cell item carries
+    the "cell" tag, which lets reset() repaint the whole board in one call.
+    """
+
+    def __init__(self, parent, size, letters, on_click, on_hover=None, on_leave=None):
+        self.size = size
+        self.cell_size = max(MIN_CELL_SIZE, min(CELL_SIZE, MAX_BOARD_PIXELS // size))
+        self.on_click = on_click
+        self.on_hover = on_hover
+        self.on_leave = on_leave
+        self.enabled = True
+        self.hover_cell = None
+        side = LABEL_SIZE + size * self.cell_size
+        self.canvas = tk.Canvas(parent, width=side, height=side, highlightthickness=0)
+
+        font = ('Arial', max(6, min(10, self.cell_size // 3)))
+        for i in range(size):
+            middle = LABEL_SIZE + (i + 0.5) * self.cell_size
+            self.canvas.create_text(middle, LABEL_SIZE / 2, text=letters[i], font=font)
+            self.canvas.create_text(LABEL_SIZE / 2, middle, text=str(i + 1), font=font)
+        self.rectangles = []
+        self.texts = []
+        for row in range(size):
+            for col in range(size):
+                x, y = LABEL_SIZE + col * self.cell_size, LABEL_SIZE + row * self.cell_size
+                self.rectangles.append(self.canvas.create_rectangle(
+                    x, y, x + self.cell_size, y + self.cell_size, fill=WATER[0], outline="gray30",
+                    tags=("cell", "cell-fill")))
+                self.texts.append(self.canvas.create_text(
+                    x + self.cell_size / 2, y + self.cell_size / 2, text=WATER[1], font=font,
+                    tags=("cell", "cell-text")))
+        self.looks = [WATER] * (size * size)  # Look wanted for each cell
+        self.drawn = [WATER] * (size * size)  # Look currently on the canvas
+        self.dirty = set()
+        self.flush_id = None
+
+        self.canvas.bind("<Button-1>", self._click)
+        self.canvas.bind("<Motion>", self._motion)
+        self.canvas.bind("<Leave>", self._leave)
+
+    def grid(self, **kwargs):
+        self.canvas.grid(**kwargs)
+
+    def pack(self, **kwargs):
+        self.canvas.pack(**kwargs)
+
+    def get(self, row, col):
+        return self.looks[row * self.size + col]
+
+    def set(self, row, col, look):
+        """Give a cell a new look, drawn at the next idle cycle."""
+        cell = row * self.size + col
+        if self.looks[cell] != look:
+            self.looks[cell] = look
+            self.dirty.add(cell)
+            if self.flush_id is None:
+                self.flush_id = self.canvas.after_idle(self.flush)
+
+    def reset(self, look=WATER):
+        """Give every cell the same look with one call per item type."""
+        self.canvas.itemconfig("cell-fill", fill=look[0])
+        self.canvas.itemconfig("cell-text", text=look[1])
+        self.looks = [look] * (self.size * self.size)
+        self.drawn = [look] * (self.size * self.size)
+        self.dirty.clear()
+
+    def flush(self):
+        """Redraw the cells whose look changed since the last flush."""
+        self.flush_id = None
+        for cell in self.dirty:
+            look = self.looks[cell]
+            if look != self.drawn[cell]:
+                self.canvas.itemconfig(self.rectangles[cell], fill=look[0])
+                self.canvas.itemconfig(self.texts[cell], text=look[1])
+                self.drawn[cell] = look
+        self.dirty.clear()
+
+    def set_enabled(self, enabled):
+        """Clicks are ignored while disabled."""
+        self.enabled = enabled
+        self.canvas.config(cursor="hand2" if enabled else "")
+
+    def cell_at(self, x, y):
+        """(row, col) under a canvas position, or None outside the grid."""
+        col = (x - LABEL_SIZE) // self.cell_size
+        row = (y - LABEL_SIZE) // self.cell_size
+        if x < LABEL_SIZE or y < LABEL_SIZE or row >= self.size or col >= self.size:
+            return None
+        return int(row), int(col)
+
+    def _click(self, event):
+        cell = self.cell_at(event.x, event.y)
+        if self.enabled and cell is not None:
+            self.on_click(*cell)
+
+    def _motion(self, event):
+        cell = self.cell_at(event.x, event.y)
+        if cell == self.hover_cell:
+            return
+        if self.hover_cell is not None and self.on_leave is not None:
+            self.on_leave()
+        self.hover_cell = cell
+        if cell is not None and self.on_hover is not None:
+            self.on_hover(*cell)
+
+    def _leave(self, event):
+        if self.hover_cell is not None:
+            self.hover_cell = None
+            if self.on_leave is not None:
+                self.on_leave()
@@ -0,0 +1,193 @@
+import argparse
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from multiprocessing.connection import Listener, Client
+import numpy as np
+from battleship_ai import check_model, load_model
+from battleship_config import DEFAULT_BOARD_SIZE, add_config_arguments, config_from_args
+from masked_dqn import masked_q_actions
+
+MAX_BATCH = 64  # Observations per forward pass
+MAX_DELAY = 0.002  # Seconds the first request of a batch waits for more to arrive
+CACHE_SIZE = 4096  # Board states whose move is remembered
+ADDRESS = ("127.0.0.1", 12346)
+AUTHKEY = b"battleship"
+
+
+class InferenceService:
+    """Answers DQN move requests from many games with one forward pass per micro-batch.
+
+    Requests queue up until MAX_BATCH of them are pending or the oldest has
+    waited MAX_DELAY, then the Q-values of the whole batch are computed at once.
+    Illegal cells are masked out before the argmax, and the move for each
+    (observation, legal cells) pair is kept in an LRU cache. A model trained
+    on another board size is refused (ValueError) when the service starts.
+    """
+
+    def __init__(self, model_path="battleship_dqn", max_batch=MAX_BATCH, max_delay=MAX_DELAY,
+                 cache_size=CACHE_SIZE, board_size=DEFAULT_BOARD_SIZE):
+        self.model = load_model(model_path)
+        check_model(self.model, board_size)
+        self.shape = self.model.observation_space.shape
+        self.dtype = self.model.observation_space.dtype
+        self.actions = self.model.action_space.n
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # Request key -> action, least recently used first
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.cache_hits = 0
+        self.batches = 0
+        self.batched = 0  # Observations evaluated by the network
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def submit(self, observation, legal=None):
+        """Queue one observation; returns a Future for its action.
+
+        legal is a boolean array with one entry per action (None allows every
+        action); the chosen action is always a legal one when any is.
+        """
+        observation = np.asarray(observation, dtype=self.dtype).reshape(self.shape)
+        if legal is None:
+            legal = np.ones(self.actions, dtype=bool)
+        else:
+            legal = np.asarray(legal, dtype=bool).reshape(self.actions)
+        key = observation.tobytes() + np.packbits(legal).tobytes()
+        future = Future()
+        with self.lock:
+            action = self.cache.get(key)
+            if action is not None:
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+        if action is not None:
+            future.set_result(action)
+        else:
+            self.requests.put((key, observation, legal, future))
+        return future
+
+    def predict(self, observation, legal=None):
+        """Action for one observation (blocks until its batch has run)."""
+        return self.submit(observation, legal).result()
+
+    def run(self):
+        """Gather requests into batches until close() is called."""
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            batch = [request]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    request = self.requests.get(timeout=max(0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.requests.put(None)  # Stop after this batch
+                    break
+                batch.append(request)
+            self.run_batch(batch)
+
+    def run_batch(self, batch):
+        observations = np.stack([request[1] for request in batch])
+        legal = np.stack([request[2] for request in batch])
+        try:
+            actions = masked_q_actions(self.model, observations, legal).tolist()
+        except Exception as e:
+            for request in batch:
+                request[3].set_exception(e)
+            return
+
+        with self.lock:
+            self.batches += 1
+            self.batched += len(batch)
+            for request, action in zip(batch, actions):
+                self.cache[request[0]] = action
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        for request, action in zip(batch, actions):
+            request[3].set_result(action)
+
+    def close(self):
+        self.requests.put(None)
+        self.worker.join()
+
+
+def handle_connection(service, connection):
+    """Answer one remote client's requests; each client waits for its reply, so batches mix clients."""
+    with connection:
+        try:
+            while True:
+                observation, legal = connection.recv()
+                connection.send(service.predict(observation, legal))
+        except (EOFError, ConnectionError):
+            pass
+
+
+def serve(service, address=ADDRESS, authkey=AUTHKEY):
+    """Share a service with other processes until interrupted."""
+    with Listener(address, authkey=authkey) as listener:
+        while True:
+            connection = listener.accept()
+            threading.Thread(target=handle_connection, args=(service, connection), daemon=True).start()
+
+
+class InferenceClient:
+    """predict() of an InferenceService running in another process (one client per thread)."""
+
+    def __init__(self, address=ADDRESS, authkey=AUTHKEY):
+        self.connection = Client(address, authkey=authkey)
+
+    def predict(self, observation, legal=None):
+        self.connection.send((np.asarray(observation), legal))
+        return self.connection.recv()
+
+    def close(self):
+        self.connection.close()
+
+
+@lru_cache(maxsize=None)
+def connect(address=ADDRESS):
+    """Client shared by every game of this process."""
+    return InferenceClient(address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batched DQN inference service for AI opponents")
+    parser.add_argument("--model", default="battleship_dqn")
+    parser.add_argument("--host", default=ADDRESS[0])
+    parser.add_argument("--port", type=int, default=ADDRESS[1])
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-delay", type=float, default=MAX_DELAY, help="Seconds")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    config = config_from_args(args, parser)
+
+    try:
+        service = InferenceService(args.model, args.max_batch, args.max_delay, args.cache_size, config.board_size)
+    except KeyboardInterrupt:
+        return  # Interrupted while loading the model
+    except ValueError as e:
+        print(f"{args.model}: {e}")
+        raise SystemExit(1)
+    print(f"Inference service listening on {args.host}:{args.port}")
+    try:
+        serve(service, (args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        if service.batches:
+            print(f"{service.batched} observations in {service.batches} batches "
+                  f"({service.batched / service.batches:.1f} per batch), {service.cache_hits} cache hits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import glob
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+from battleship_engine import Board, HORIZONTAL, VERTICAL, ship_origin
+
+JOURNAL_DIR = "journals"
+FLUSH_INTERVAL = 1.0  # Seconds between two fsyncs of the records written meanwhile
+MAX_PENDING = 4096  # Records buffered before a flush is started early
+
+# Journal file: header, then fixed-size records in the order they happened.
+# Records of concurrent games (server rooms) interleave; each carries its game id.
+MAGIC = b"BSJOURNL"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sB7x")  # magic, format version (16 bytes)
+RECORD = struct.Struct("<IIBBBBBB2x")  # game, unix time, kind, player, row, col, a, b (16 bytes)
+
+# Record kinds, with the meaning of a and b
+START = 1  # a: board size, b: ship count
+PLACE = 2  # A ship of player's fleet at row, col; a: length, b: orientation (0 = horizontal, 1 = vertical)
+SHOT = 3  # player fired at row, col of the other player's board; a: battleship_engine result
+END = 4  # player: winner (NO_PLAYER if none); a: reason
+RESTORED = 5  # The server restarted: the records before were rebuilt from its room store (room_store.py).
+# The game's first part stays unfinished in the journal of the server that stopped.
+
+# END reasons
+FINISHED = 0  # A fleet was sunk
+ABANDONED = 1  # A player left before the end
+
+NO_PLAYER = 255
+ORIENTATIONS = (HORIZONTAL, VERTICAL)
+
+Record = namedtuple("Record", "game time kind player row col a b")
+
+
+class JournalWriter:
+    """Appends game records to a new journal file in a directory, one file per writer
+    (named after the time and process unless a name is given).
+
+    Records are buffered and written with one fsync per batch, from a background
+    thread every FLUSH_INTERVAL seconds or as soon as MAX_PENDING records are
+    waiting, so logging a shot never waits for the disk.
+    """
+
+    def __init__(self, directory=JOURNAL_DIR, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING, name=None):
+        os.makedirs(directory, exist_ok=True)
+        name = name or f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{id(self):x}.journal"
+        self.path = os.path.join(directory, name)
+        self.file = open(self.path, "ab")
+        if self.file.tell() == 0:
+            # On disk at once: a process killed before its first record still leaves a readable file
+            self.file.write(HEADER.pack(MAGIC, FORMAT_VERSION))
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.pending = bytearray()
+        self.lock = threading.Lock()  # Guards pending and next_game
+        self.flush_lock = threading.Lock()  # Keeps batches in order on disk
+        self.wakeup = threading.Event()
+        self.next_game = 0
+        self.closed = False
+        self.flusher = threading.Thread(target=self._run, daemon=True)
+        self.flusher.start()
+
+    def start_game(self, board_size, ship_count):
+        """Open a new game and return its id."""
+        with self.lock:
+            game = self.next_game
+            self.next_game += 1
+        self._append(game, START, NO_PLAYER, 0, 0, board_size, ship_count)
+        return game
+
+    def place_fleet(self, game, player, board):
+        """Record every ship of a player's board."""
+        for mask in board.ship_masks:
+            self.place(game, player, *ship_origin(mask, board.size))
+
+    def place(self, game, player, row, col, length, orientation):
+        self._append(game, PLACE, player, row, col, length, ORIENTATIONS.index(orientation))
+
+    def shot(self, game, player, row, col, result):
+        self._append(game, SHOT, player, row, col, result, 0)
+
+    def end_game(self, game, winner=None, reason=FINISHED):
+        self._append(game, END, NO_PLAYER if winner is None else winner, 0, 0, reason, 0)
+
+    def restored(self, game):
+        self._append(game, RESTORED, NO_PLAYER, 0, 0, 0, 0)
+
+    def _append(self, game, kind, player, row, col, a, b):
+        record = RECORD.pack(game, int(time.time()), kind, player, row, col, a, b)
+        with self.lock:
+            self.pending += record
+            full = len(self.pending) >= self.max_pending * RECORD.size
+        if full:
+            self.wakeup.set()
+
+    def flush(self):
+        """Write and fsync the buffered records."""
+        with self.flush_lock:
+            with self.lock:
+                data, self.pending = self.pending, bytearray()
+            if data:
+                self.file.write(data)
+                self.file.flush()
+                os.fsync(self.file.fileno())
+
+    def _run(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def close(self):
+        """Flush what is left and close the file."""
+        if self.closed:
+            return
+        self.closed = True
+        self.wakeup.set()
+        self.flusher.join()
+        self.flush()
+        self.file.close()
+
+
+class JournalFile:
+    """Memory-mapped reader of a journal file: records are decoded on access, never loaded whole.
+
+    A record cut short by a crash at the end of the file is ignored.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self.map)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} journal")
+        self.path = path
+        self.count = (len(self.map) - HEADER.size) // RECORD.size
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return Record._make(RECORD.unpack_from(self.map, HEADER.size + i * RECORD.size))
+
+    def __iter__(self):
+        end = HEADER.size + self.count * RECORD.size
+        for fields in RECORD.iter_unpack(memoryview(self.map)[HEADER.size:end]):
+            yield Record._make(fields)
+
+    def games(self):
+        """Yield (game id, records) per game, once its END is read (unfinished games come last)."""
+        open_games = {}
+        for record in self:
+            records = open_games.setdefault(record.game, [])
+            records.append(record)
+            if record.kind == END:
+                yield record.game, open_games.pop(record.game)
+        yield from open_games.items()
+
+    def array(self):
+        """All records as a NumPy structured array viewing the map, for batch analysis."""
+        import numpy as np
+        dtype = np.dtype({"names": list(Record._fields),
+                          "formats": ["<u4", "<u4", "u1", "u1", "u1", "u1", "u1", "u1"],
+                          "offsets": [0, 4, 8, 9, 10, 11, 12, 13], "itemsize": RECORD.size})
+        return np.frombuffer(self.map, dtype=dtype, count=self.count, offset=HEADER.size)
+
+    def close(self):
+        self.map.close()
+
+
+def journal_files(path):
+    """A journal file, or every journal file of a directory in name (creation) order."""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, "*.journal")))
+    return [path]
+
+
+def replay(records):
+    """Play a game's records through the rules; returns (boards, winner).
+
+    boards[i] is player i's fleet with the shots fired at it. Raises ValueError
+    if a placement is illegal or a shot's recorded result differs from the
+    result the rules give.
+    """
+    boards = None
+    winner = None
+    for record in records:
+        if record.kind == START:
+            boards = [Board(record.a), Board(record.a)]
+        elif boards is None:
+            raise ValueError(f"Game {record.game}: record before START")
+        elif record.kind == PLACE:
+            if not boards[record.player].place_ship(record.a, record.row, record.col, ORIENTATIONS[record.b]):
+                raise ValueError(f"Game {record.game}: illegal placement {record}")
+        elif record.kind == SHOT:
+            result, _ = boards[1 - record.player].fire(record.row, record.col)
+            if result != record.a:
+                raise ValueError(f"Game {record.game}: shot {record} replays as result {result}")
+        elif record.kind == END:
+            winner = None if record.player == NO_PLAYER else record.player
+            if record.a == FINISHED and (winner is None or not boards[1 - winner].all_sunk()):
+                raise ValueError(f"Game {record.game}: player {record.player} won without sinking the fleet")
+    return boards, winner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read game journals and check them against the rules")
+    parser.add_argument("path", nargs="?", default=JOURNAL_DIR, help="Journal file or directory")
+    parser.add_argument("--verify", action="store_true", help="Replay every game through the rules")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records = games = finished = restored = errors = 0
+    for path in journal_files(args.path):
+        journal = JournalFile(path)
+        records += len(journal)
+        for game, game_records in journal.games():
+            games += 1
+            finished += game_records[-1].kind == END
+            restored += any(record.kind == RESTORED for record in game_records)
+            if args.verify:
+                try:
+                    replay(game_records)
+                except ValueError as e:
+                    errors += 1
+                    print(f"{path}: {e}")
+        journal.close()
+    elapsed = time.perf_counter() - start
+    print(f"{records} records, {games} games ({finished} finished) in {elapsed:.2f}s "
+          f"({records / max(elapsed, 1e-9):,.0f} records/sec)")
+    if restored:
+        print(f"{restored} games continued after a server restart (RESTORED records)")
+    if args.verify:
+        print(f"Replay mismatches: {errors}")
+        if errors:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
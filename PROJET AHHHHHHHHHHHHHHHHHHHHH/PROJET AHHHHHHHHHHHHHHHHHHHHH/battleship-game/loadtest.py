@@ -0,0 +1,277 @@
+import argparse
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import Pool
+import protocol
+from protocol import MOVE, RESULT, TURN, GAME_OVER, FLEET, CONFIG, RESUME, WATCH, BOARD, SHOT, OPPONENT_LEFT
+from battleship_engine import Board, REPEAT, SUNK, ship_origin
+from battleship_config import add_config_arguments, config_from_args
+from placement import place_random_fleet
+from battleship_ai import make_targeter
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+GAME_TIMEOUT = 30  # Seconds
+
+
+class BotStats:
+    def __init__(self):
+        self.moves = 0
+        self.games = 0  # Games won by a player, counted once (by the bot that moved first)
+        self.errors = 0  # Failed connections, handshakes and dropped sockets
+        self.abandoned = 0  # Games ended by the opponent disconnecting
+        self.timeouts = 0  # Games that did not finish in time (e.g. a bot left without an opponent)
+        self.latencies = []  # Seconds from sending a MOVE to receiving its RESULT
+        self.watched = 0  # Games spectators followed to their end
+        self.shots_seen = 0  # SHOT messages received by spectators
+        self.snapshots = 0  # BOARD messages received by spectators (one per join, plus resyncs)
+
+
+async def play_game(host, port, rng, stats):
+    """Connect one bot, play a full game through the server and disconnect."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(protocol.hello())
+        reply = await reader.readexactly(2)
+        if reply != protocol.hello():
+            raise ConnectionError(f"Unexpected handshake reply {reply!r}")
+        opcode, (board_size, ship_lengths) = await protocol.read_frame(reader)
+        if opcode != CONFIG:
+            raise ConnectionError(f"Expected the game configuration, got opcode {opcode}")
+        writer.write(protocol.encode(RESUME, b""))  # A new game
+
+        # Same messages as battleship.BattleshipGame: place the fleet, then play
+        board = Board(board_size)
+        place_random_fleet(board, ship_lengths, rng)
+        ships = []
+        for mask in board.ship_masks:
+            row, col, length, orientation = ship_origin(mask, board_size)
+            ships.append((row, col, length, protocol.ORIENTATIONS.index(orientation)))
+        writer.write(protocol.encode(FLEET, ships))
+        targeter = make_targeter("medium", board_size, ship_lengths, rng)
+        sent_at = None
+        first = None  # Whether this bot is Player 1, from the TURN that starts the game
+
+        def fire():
+            nonlocal sent_at
+            row, col = targeter.next_target()
+            sent_at = time.perf_counter()
+            writer.write(protocol.encode(MOVE, row, col))
+
+        while True:
+            opcode, args = await protocol.read_frame(reader)
+            if opcode == TURN:
+                if first is None:
+                    first = bool(args[0])
+                if args[0]:
+                    fire()
+            elif opcode == MOVE:  # Opponent's shot hands us the turn
+                fire()
+            elif opcode == RESULT:
+                stats.latencies.append(time.perf_counter() - sent_at)
+                stats.moves += 1
+                row, col, result = args
+                if result == SUNK:
+                    last_shot = row, col  # Recorded once the SUNK message gives the ship
+                else:
+                    targeter.record(row, col, result)
+                if result == REPEAT:
+                    fire()
+            elif opcode == protocol.SUNK:
+                row, col, length, orientation = args
+                cells = [(row + i, col) if orientation else (row, col + i) for i in range(length)]
+                targeter.record(*last_shot, SUNK, cells)
+            elif opcode == GAME_OVER:
+                if args[0] == OPPONENT_LEFT:
+                    stats.abandoned += 1
+                elif first:
+                    stats.games += 1  # Both bots see the end; only Player 1 counts it
+                return
+    finally:
+        writer.close()
+
+
+async def watch_games(host, port, stats):
+    """Spectate the most watched game, then the next one, until cancelled."""
+    while True:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            writer.write(protocol.hello())
+            await reader.readexactly(2)
+            await protocol.read_frame(reader)  # CONFIG
+            writer.write(protocol.encode(WATCH, 0))
+            while True:
+                opcode, args = await protocol.read_frame(reader)
+                if opcode == SHOT:
+                    stats.shots_seen += 1
+                elif opcode == BOARD:
+                    stats.snapshots += 1
+                elif opcode == GAME_OVER:
+                    if args[0] == protocol.SESSION_EXPIRED:
+                        await asyncio.sleep(0.05)  # No game in progress yet
+                    else:
+                        stats.watched += 1
+                    break
+        except (OSError, asyncio.IncompleteReadError):
+            stats.errors += 1
+        finally:
+            writer.close()
+
+
+async def run_bots(host, port, bots, games, seed, timeout=GAME_TIMEOUT, spectators=0):
+    stats = BotStats()
+    rng = random.Random(seed)
+
+    async def bot():
+        for _ in range(games):
+            try:
+                await asyncio.wait_for(play_game(host, port, random.Random(rng.random()), stats), timeout)
+            except asyncio.TimeoutError:
+                stats.timeouts += 1
+            except (OSError, asyncio.IncompleteReadError):
+                stats.errors += 1
+
+    watchers = [asyncio.create_task(watch_games(host, port, stats)) for _ in range(spectators)]
+    await asyncio.gather(*(bot() for _ in range(bots)))
+    for watcher in watchers:
+        watcher.cancel()
+    await asyncio.gather(*watchers, return_exceptions=True)
+    return stats
+
+
+def run_worker(args):
+    """Run a share of the bots and spectators in their own event loop (worker process)."""
+    host, port, bots, games, seed, timeout, spectators = args
+    stats = asyncio.run(run_bots(host, port, bots, games, seed, timeout, spectators))
+    return (stats.moves, stats.games, stats.errors, stats.abandoned, stats.timeouts, stats.latencies,
+            stats.watched, stats.shots_seen, stats.snapshots)
+
+
+class ProcessMonitor(threading.Thread):
+    """Samples CPU and resident memory of a process (psutil, or /proc on Linux)."""
+
+    def __init__(self, pid, interval=0.5):
+        super(ProcessMonitor, self).__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.cpu_samples = []  # Percent of one core
+        self.rss_samples = []  # Bytes
+        self.stopped = threading.Event()
+
+    def cpu_seconds(self):
+        if psutil is not None:
+            times = psutil.Process(self.pid).cpu_times()
+            return times.user + times.system
+        with open(f"/proc/{self.pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def rss(self):
+        if psutil is not None:
+            return psutil.Process(self.pid).memory_info().rss
+        with open(f"/proc/{self.pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+        return 0
+
+    def run(self):
+        try:
+            last_cpu, last_time = self.cpu_seconds(), time.perf_counter()
+            while not self.stopped.wait(self.interval):
+                cpu, now = self.cpu_seconds(), time.perf_counter()
+                self.cpu_samples.append(100 * (cpu - last_cpu) / (now - last_time))
+                self.rss_samples.append(self.rss())
+                last_cpu, last_time = cpu, now
+        except (OSError, ValueError):
+            pass  # The process went away
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the Battleship server with headless bot clients")
+    parser.add_argument("--bots", type=int, default=100, help="Concurrent bot clients (pairs play each other)")
+    parser.add_argument("--games", type=int, default=5, help="Games played by each bot")
+    parser.add_argument("--workers", type=int, default=1, help="Processes sharing the bots")
+    parser.add_argument("--spectators", type=int, default=0, help="Clients watching the most watched game")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--server-pid", type=int, help="Monitor an already running server instead of starting one")
+    parser.add_argument("--timeout", type=float, default=GAME_TIMEOUT, help="Seconds before a game is given up")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--journal", help="Directory where the started server records its games (default: off)")
+    parser.add_argument("--state", help="Directory where the started server keeps its games in progress (default: off)")
+    add_config_arguments(parser)  # For the server started here; bots follow whatever the server plays
+    args = parser.parse_args()
+    if args.bots % 2:
+        parser.error("--bots must be even so every bot gets an opponent")
+    config = config_from_args(args, parser)
+
+    server = None
+    pid = args.server_pid
+    if pid is None:
+        server = subprocess.Popen(
+            [sys.executable, "server.py", "--host", args.host, "--port", str(args.port),
+             "--board-size", str(config.board_size), "--ships", *map(str, config.ship_lengths),
+             *(["--journal", args.journal] if args.journal else ["--no-journal"]),
+             *(["--state", args.state] if args.state else ["--no-state"])],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        pid = server.pid
+        time.sleep(1)  # Let the server bind
+
+    monitor = ProcessMonitor(pid)
+    monitor.start()
+    shares = [args.bots // args.workers + (i < args.bots % args.workers) for i in range(args.workers)]
+    watchers = [args.spectators // args.workers + (i < args.spectators % args.workers) for i in range(args.workers)]
+    jobs = [(args.host, args.port, bots, args.games, args.seed + i, args.timeout, watchers[i])
+            for i, bots in enumerate(shares) if bots]
+    start = time.perf_counter()
+    try:
+        if args.workers == 1:
+            results = [run_worker(jobs[0])]
+        else:
+            with Pool(args.workers) as pool:
+                results = pool.map(run_worker, jobs)
+    finally:
+        elapsed = time.perf_counter() - start
+        monitor.stopped.set()
+        monitor.join()
+        if server is not None:
+            server.send_signal(signal.SIGINT)  # Lets the server flush its journal
+            server.wait()
+
+    moves = sum(r[0] for r in results)
+    latencies = [latency for r in results for latency in r[5]]
+    print(f"{args.bots} bots, {sum(r[1] for r in results)} games finished in {elapsed:.2f}s")
+    print(f"Moves: {moves} ({moves / elapsed:,.0f} moves/sec)")
+    print(f"Move round-trip: p50 {1000 * percentile(latencies, 0.5):.2f} ms, "
+          f"p99 {1000 * percentile(latencies, 0.99):.2f} ms")
+    print(f"Connection errors: {sum(r[2] for r in results)}, abandoned games: {sum(r[3] for r in results)}, "
+          f"timed out: {sum(r[4] for r in results)}")
+    if args.spectators:
+        print(f"Spectators: {args.spectators} followed {sum(r[6] for r in results)} games to the end, "
+              f"{sum(r[7] for r in results)} shots and {sum(r[8] for r in results)} snapshots received")
+    if monitor.cpu_samples:
+        print(f"Server CPU: mean {sum(monitor.cpu_samples) / len(monitor.cpu_samples):.0f}%, "
+              f"max {max(monitor.cpu_samples):.0f}% of one core; "
+              f"RSS max {max(monitor.rss_samples) / 2 ** 20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import numpy as np
+import torch
+from stable_baselines3 import DQN
+
+
+def random_legal_actions(masks):
+    """One uniformly random legal action per row of an (n, actions) boolean mask."""
+    return np.argmax(np.random.random(masks.shape) * masks, axis=1)
+
+
+def masked_q_actions(model, observation, masks):
+    """Greedy actions of a DQN restricted to the legal ones (one forward pass for the batch)."""
+    with torch.no_grad():
+        tensor, vectorized = model.policy.obs_to_tensor(observation)
+        q_values = model.q_net(tensor).cpu().numpy()
+    q_values[~masks.reshape(q_values.shape)] = -np.inf
+    actions = q_values.argmax(axis=1)
+    return actions if vectorized else actions[0]
+
+
+class MaskedDQN(DQN):
+    """DQN that never samples or returns an already-fired cell.
+
+    During training the legal actions come from the environment's
+    action_masks(): exploration picks among them at random and exploitation
+    takes the best legal Q-value. predict() accepts the same masks.
+    """
+
+    def _sample_action(self, learning_starts, action_noise=None, n_envs=1):
+        masks = self.env.action_masks()
+        if self.num_timesteps < learning_starts:
+            actions = random_legal_actions(masks)
+        else:
+            actions, _ = self.predict(self._last_obs, deterministic=False, action_masks=masks)
+        return actions, actions
+
+    def predict(self, observation, state=None, episode_start=None, deterministic=False, action_masks=None):
+        if action_masks is None:
+            return super(MaskedDQN, self).predict(observation, state, episode_start, deterministic)
+        masks = np.asarray(action_masks, dtype=bool).reshape(-1, self.action_space.n)
+        if not deterministic and np.random.rand() < self.exploration_rate:
+            actions = random_legal_actions(masks)
+            if masks.shape[0] == 1 and not self.policy.is_vectorized_observation(observation):
+                actions = actions[0]
+        else:
+            actions = masked_q_actions(self, observation, masks)
+        return actions, state
@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import logging.handlers
+import queue
+import time
+from bisect import bisect_left
+
+# Upper bounds of the latency histogram buckets, in seconds (a last +Inf bucket is implied)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+SNAPSHOT_INTERVAL = 60.0  # Seconds between two metric lines in the log
+LOG_SAMPLE = 100  # Sampled loggers keep one record in this many
+REQUEST_TIMEOUT = 5.0  # Seconds a metrics client gets to send its request
+METRICS_PORT = 12347  # Next to the game server (12345) and the inference service (12346)
+
+
+class Counter:
+    """A number that only goes up (messages, moves, errors...)."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Gauge:
+    """A number read when the metrics are collected, from a function (active rooms...)."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help_text, read):
+        self.name = name
+        self.help = help_text
+        self.read = read
+
+    @property
+    def value(self):
+        return self.read()
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Histogram:
+    """Count of observations per bucket, with their sum: latencies without keeping every value.
+
+    observe() is a bisect and two additions, cheap enough for every message.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of the observations (0 if none)."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def samples(self):
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            yield f'{self.name}_bucket{{le="{bound:g}"}}', seen
+        yield f'{self.name}_bucket{{le="+Inf"}}', self.count
+        yield f"{self.name}_sum", self.sum
+        yield f"{self.name}_count", self.count
+
+
+class Registry:
+    """The metrics of one process, in the order they were created."""
+
+    def __init__(self, prefix=""):
+        self.prefix = prefix  # Added to every name in render()
+        self.metrics = []
+        self.last_snapshot = (time.monotonic(), {})  # For the rates in snapshot()
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text):
+        return self._add(Counter(name, help_text))
+
+    def gauge(self, name, help_text, read):
+        return self._add(Gauge(name, help_text, read))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, buckets))
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            name = self.prefix + metric.name
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for sample, value in metric.samples():
+                lines.append(f"{self.prefix}{sample} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """One-line summary for the log: counters with their rate since the last snapshot, gauges,
+        and histogram percentiles."""
+        now = time.monotonic()
+        then, previous = self.last_snapshot
+        elapsed = max(now - then, 1e-9)
+        parts = []
+        counters = {}
+        for metric in self.metrics:
+            if metric.kind == "counter":
+                counters[metric.name] = metric.value
+                rate = (metric.value - previous.get(metric.name, 0)) / elapsed
+                parts.append(f"{metric.name}={metric.value} ({rate:+.1f}/s)")
+            elif metric.kind == "gauge":
+                parts.append(f"{metric.name}={metric.value:g}")
+            elif metric.count:
+                parts.append(f"{metric.name} n={metric.count} p50={1000 * metric.percentile(0.5):.3g}ms "
+                             f"p99={1000 * metric.percentile(0.99):.3g}ms max={1000 * metric.max:.3g}ms")
+        self.last_snapshot = (now, counters)
+        return " ".join(parts)
+
+
+async def _answer(registry, reader, writer):
+    """Answer one HTTP request: the metrics on / and /metrics, 404 elsewhere."""
+    try:
+        request = await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT)
+        while await asyncio.wait_for(reader.readline(), REQUEST_TIMEOUT) not in (b"\r\n", b"\n", b""):
+            pass  # Headers are not needed
+        parts = request.split()
+        if len(parts) > 1 and parts[1] in (b"/", b"/metrics"):
+            status, body = "200 OK", registry.render().encode()
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+        writer.write(f"HTTP/1.0 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(registry, host="127.0.0.1", port=METRICS_PORT):
+    """Serve the registry as plain text over HTTP; returns the asyncio server."""
+    return await asyncio.start_server(lambda reader, writer: _answer(registry, reader, writer), host, port)
+
+
+async def log_snapshots(registry, logger, interval=SNAPSHOT_INTERVAL):
+    """Log a snapshot of the registry every interval seconds, until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("metrics %s", registry.snapshot())
+
+
+class SampledLogger:
+    """Logs one call in every `every`, for messages too frequent to log one by one.
+
+    The skipped calls cost a counter increment: no record is created for them.
+    """
+
+    def __init__(self, logger, every=LOG_SAMPLE, level=logging.INFO):
+        self.logger = logger
+        self.every = every
+        self.level = level
+        self.calls = 0
+
+    def log(self, message, *args):
+        self.calls += 1
+        if self.every and self.calls % self.every == 0 and self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, message + " (1 of %d logged)", *args, self.every)
+
+
+def start_logging(path=None, level=logging.INFO):
+    """Send log records through a queue to a background thread that writes them to path (stderr if
+    None), so logging never blocks the event loop on I/O. Returns the listener to stop at exit."""
+    handler = logging.FileHandler(path) if path else logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+    listener = logging.handlers.QueueListener(records, handler)
+    listener.start()
+    return listener
@@ -0,0 +1,47 @@
+import numpy as np
+from battleship_engine import MISS as SHOT_MISS, SUNK as SHOT_SUNK, REPEAT
+
+# Observation the DQN is trained on (BattleshipEnv, BattleshipVecEnv) and plays with:
+# one channel per cell state, one-hot, as an int8 (CHANNELS, size, size) array
+UNKNOWN = 0
+MISS = 1
+HIT = 2  # Hit on a ship still afloat
+SUNK = 3
+CHANNELS = 4
+
+
+def observation_shape(board_size):
+    return CHANNELS, board_size, board_size
+
+
+def new_observation(board_size):
+    """Observation of a board nothing has been fired at yet."""
+    observation = np.zeros(observation_shape(board_size), dtype=np.int8)
+    observation[UNKNOWN] = 1
+    return observation
+
+
+def record_shot(observation, row, col, result, sunk_cells=()):
+    """Update an observation in place with the battleship_engine result of a shot.
+
+    When the shot sinks a ship, sunk_cells are its cells: they move from the hit channel to the sunk one.
+    """
+    if result == REPEAT:
+        return
+    observation[UNKNOWN, row, col] = 0
+    observation[MISS if result == SHOT_MISS else HIT, row, col] = 1
+    if result == SHOT_SUNK:
+        for r, c in sunk_cells:
+            observation[HIT, r, c] = 0
+            observation[SUNK, r, c] = 1
+
+
+def encode_cells(cells, board_size):
+    """One-hot observations of a (boards, size * size) array of cell states (UNKNOWN...SUNK)."""
+    one_hot = cells[:, None, :] == np.arange(CHANNELS, dtype=cells.dtype)[None, :, None]
+    return one_hot.astype(np.int8).reshape(len(cells), CHANNELS, board_size, board_size)
+
+
+def legal_actions(observation):
+    """Flat mask of the cells not fired at yet, for masked predictions."""
+    return observation[UNKNOWN].reshape(-1).astype(bool)
@@ -0,0 +1,211 @@
+import argparse
+import mmap
+import random
+import struct
+import time
+from functools import lru_cache
+from battleship_engine import HORIZONTAL, VERTICAL, ship_mask
+from battleship_config import add_config_arguments, config_from_args
+
+MAX_ATTEMPTS = 10000  # Whole-fleet draws before falling back to a backtracking search
+MAX_SEARCH_STEPS = 10000000  # Placements the backtracking search tries before giving up (about half a second)
+LAYOUT_POOL_SIZE = 10000  # Fleets precomputed by layout_pool
+
+# Layout file: header, the fleet's lengths, then one record per layout holding
+# the index of each ship's placement (in fleet order; uint16, or uint32 when a
+# ship has more placements than that, see PlacementIndex.record_code)
+MAGIC = b"BSLAYOUT"
+HEADER = struct.Struct("<8sBBQ")  # magic, board size, ship count, layout count
+CHUNK_SIZE = 65536  # Layouts generated and written at a time
+
+
+@lru_cache(maxsize=None)
+def ship_masks(size, length):
+    """Every legal placement of a ship on an empty board, as bitmasks (each once: a 1-cell ship is the
+    same both ways). The one enumeration of placements, shared by the fleet sampling and the AI."""
+    masks = {}  # Ordered set
+    for orientation in (HORIZONTAL, VERTICAL):
+        for row in range(size):
+            for col in range(size):
+                mask = ship_mask(size, length, row, col, orientation)
+                if mask:
+                    masks[mask] = None
+    return tuple(masks)
+
+
+class PlacementIndex:
+    """Every legal placement of each ship of a fleet, as bitmasks, for fast fleet sampling.
+
+    sample() draws every ship's placement at once and starts over as soon as
+    one overlaps the ships already drawn. Every accepted fleet is then equally
+    likely. Boards crowded enough to reject MAX_ATTEMPTS draws fall back to a
+    randomised backtracking search, which is not uniform and gives up after
+    MAX_SEARCH_STEPS placements.
+    """
+
+    def __init__(self, size, ship_lengths):
+        self.size = size
+        self.ship_lengths = tuple(ship_lengths)
+        self.placements = {length: ship_masks(size, length) for length in set(self.ship_lengths)}  # Length -> masks
+        # Longest ships first: they have the fewest placements and collide the most
+        self.order = sorted(range(len(self.ship_lengths)), key=lambda i: -self.ship_lengths[i])
+        self.choices = [self.placements[self.ship_lengths[i]] for i in self.order]
+        # Struct code of a placement index in layout files
+        self.record_code = "H" if max(map(len, self.placements.values()), default=0) <= 0xFFFF else "I"
+
+    def sample(self, rng=random):
+        """A random legal fleet as ship masks in ship_lengths order, or None if none exists."""
+        indices = self.sample_indices(rng)
+        if indices is None:
+            return None
+        return tuple(self.placements[length][index] for length, index in zip(self.ship_lengths, indices))
+
+    def sample_indices(self, rng=random):
+        """Like sample(), as the index of each ship's placement in placements[length]."""
+        for _ in range(MAX_ATTEMPTS):
+            occupied = 0
+            picked = []
+            for choices in self.choices:
+                index = rng.randrange(len(choices))
+                mask = choices[index]
+                if mask & occupied:
+                    break  # Early exit: the rest of this fleet cannot be accepted anyway
+                occupied |= mask
+                picked.append(index)
+            else:
+                return self._in_fleet_order(picked)
+        return self._search(rng)
+
+    def _search(self, rng):
+        """Depth-first search over shuffled placements (the fallback for crowded boards).
+
+        None if no fleet was found within MAX_SEARCH_STEPS placements.
+        """
+        if sum(self.ship_lengths) > self.size * self.size:
+            return None
+        orders = [rng.sample(range(len(choices)), len(choices)) for choices in self.choices]
+        picked = []
+        steps = 0
+
+        def place(ship, occupied):
+            nonlocal steps
+            if ship == len(self.choices):
+                return True
+            for index in orders[ship]:
+                steps += 1
+                if steps > MAX_SEARCH_STEPS:
+                    return False
+                mask = self.choices[ship][index]
+                if not mask & occupied:
+                    picked.append(index)
+                    if place(ship + 1, occupied | mask):
+                        return True
+                    picked.pop()
+            return False
+
+        return self._in_fleet_order(picked) if place(0, 0) else None
+
+    def _in_fleet_order(self, picked):
+        indices = [0] * len(picked)
+        for ship, index in zip(self.order, picked):
+            indices[ship] = index
+        return indices
+
+
+@lru_cache(maxsize=None)
+def placement_index(size, ship_lengths):
+    """The PlacementIndex of a board size and fleet (a tuple), built once per process."""
+    return PlacementIndex(size, ship_lengths)
+
+
+def place_random_fleet(board, ship_lengths, rng=random):
+    """Place a random legal fleet on an empty board; returns False if the fleet cannot fit."""
+    layout = placement_index(board.size, tuple(ship_lengths)).sample(rng)
+    if layout is None:
+        return False
+    board.place_layout(layout)
+    return True
+
+
+@lru_cache(maxsize=None)
+def layout_pool(size, ship_lengths, count=LAYOUT_POOL_SIZE, seed=0):
+    """count random legal fleets, each a tuple of ship masks in ship_lengths order.
+
+    Built once per board size and fleet, so a new game only has to pick one.
+    """
+    index = placement_index(size, ship_lengths)
+    rng = random.Random(seed)
+    return tuple(index.sample(rng) for _ in range(count))
+
+
+def write_layouts(path, size, ship_lengths, count, seed=0):
+    """Stream count random fleets to a layout file, CHUNK_SIZE at a time."""
+    ship_lengths = tuple(ship_lengths)
+    index = placement_index(size, ship_lengths)
+    record = struct.Struct(f"<{len(ship_lengths)}{index.record_code}")
+    rng = random.Random(seed)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, size, len(ship_lengths), count) + bytes(ship_lengths))
+        for start in range(0, count, CHUNK_SIZE):
+            chunk = bytearray()
+            for _ in range(min(CHUNK_SIZE, count - start)):
+                indices = index.sample_indices(rng)
+                if indices is None:
+                    raise ValueError(f"Fleet {ship_lengths} does not fit on a {size}x{size} board")
+                chunk += record.pack(*indices)
+            f.write(chunk)
+
+
+class LayoutFile:
+    """Memory-mapped reader of a layout file: layouts are decoded on access, never loaded whole."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.size, ships, self.count = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a layout file")
+        self.ship_lengths = tuple(self.map[HEADER.size:HEADER.size + ships])
+        self.offset = HEADER.size + ships
+        index = placement_index(self.size, self.ship_lengths)
+        self.record = struct.Struct(f"<{ships}{index.record_code}")
+        self.placements = index.placements
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        """Layout i as ship masks in ship_lengths order."""
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        indices = self.record.unpack_from(self.map, self.offset + i * self.record.size)
+        return tuple(self.placements[length][index] for length, index in zip(self.ship_lengths, indices))
+
+    def indices(self):
+        """All placement indices as a (count, ships) unsigned NumPy view, for batched training code."""
+        import numpy as np
+        dtype = "<u2" if self.record.format.endswith("H") else "<u4"
+        return np.frombuffer(self.map, dtype=dtype, count=self.count * len(self.ship_lengths),
+                             offset=self.offset).reshape(self.count, len(self.ship_lengths))
+
+    def close(self):
+        self.map.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write random legal fleet layouts to a compact file")
+    parser.add_argument("path")
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    config = config_from_args(args, parser)
+
+    start = time.perf_counter()
+    write_layouts(args.path, config.board_size, config.ship_lengths, args.count, args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"{args.count} layouts written to {args.path} in {elapsed:.1f}s ({args.count / elapsed:,.0f} layouts/sec)")
+
+
+if __name__ == "__main__":
+    main()
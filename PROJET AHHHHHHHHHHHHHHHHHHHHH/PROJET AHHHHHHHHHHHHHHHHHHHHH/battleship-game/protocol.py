@@ -0,0 +1,151 @@
+import struct
+
+# Handshake: a framed client opens with HELLO followed by its version byte and the
+# server answers the same way with the version it accepted. HELLO cannot start a
+# message of the original text protocol, so clients that never send it are
+# served with plain strings (LEGACY_VERSION).
+HELLO = 0xB5
+LEGACY_VERSION = 1
+RELAY_VERSION = 2  # Clients grade shots on their own board and report RESULT / SUNK / GAME_OVER
+FLEET_VERSION = 3  # Clients send their FLEET and the server resolves every shot
+CONFIG_VERSION = 4  # The server follows its hello with the game's CONFIG (board size and fleet)
+RESUME_VERSION = 5  # Clients answer CONFIG with RESUME and get a SESSION token to resume their game
+WATCH_VERSION = 6  # Clients may answer CONFIG with WATCH instead, to spectate a game
+VERSION = WATCH_VERSION
+
+# Frames are a 2-byte big-endian payload length followed by the payload;
+# the first payload byte is the opcode.
+HEADER = struct.Struct(">H")
+
+# Opcodes
+MOVE = 1  # row, col: a shot at the receiver's board
+RESULT = 2  # row, col, result: outcome of a shot (battleship_engine MISS / HIT / SUNK / REPEAT)
+TURN = 3  # 1 if it is the receiver's turn, else 0
+SUNK = 4  # row, col, length, orientation (0 = horizontal, 1 = vertical) of a sunk ship
+GAME_OVER = 5  # reason
+INFO = 6  # UTF-8 text for the player
+FLEET = 7  # Ship count, then row, col, length, orientation of each ship (the server sends it on resume)
+CONFIG = 8  # Board size, ship count, then the length of each ship in placement order
+RESUME = 9  # Session token of the game to rejoin, or nothing for a new game
+SESSION = 10  # Session token of the game that just started
+WATCH = 11  # Room id of the game to spectate, 0 for the most watched one
+BOARD = 12  # To spectators: room id, board size, turn, then per player its hits and misses (bitmasks) and sunk ships
+SHOT = 13  # To spectators: player, row, col, result, plus the ship if it sank
+
+# GAME_OVER reasons, from the receiver's point of view (Player 1's for spectators)
+WIN = 1
+LOSS = 2
+OPPONENT_LEFT = 3
+SESSION_EXPIRED = 4  # The game a RESUME or WATCH asked for is over or unknown
+
+# Orientation byte of SUNK and FLEET ships, indexed into battleship_engine orientations
+ORIENTATIONS = ("H", "V")
+SHIP = struct.Struct("BBBB")
+
+# Payload layout of each fixed-size opcode
+FIELDS = {
+    MOVE: struct.Struct("BB"),
+    RESULT: struct.Struct("BBB"),
+    TURN: struct.Struct("B"),
+    SUNK: SHIP,
+    GAME_OVER: struct.Struct("B"),
+    WATCH: struct.Struct("<I"),
+}
+SHOT_FIELDS = struct.Struct("BBBB")
+BOARD_FIELDS = struct.Struct("<IBB")
+
+
+def mask_size(board_size):
+    """Bytes of a bitmask with one bit per cell."""
+    return (board_size * board_size + 7) // 8
+
+
+def hello(version=VERSION):
+    """Bytes opening a framed connection."""
+    return bytes((HELLO, version))
+
+
+def encode(opcode, *args):
+    """Build one frame."""
+    if opcode == INFO:
+        payload = bytes((INFO,)) + args[0].encode()
+    elif opcode in (RESUME, SESSION):
+        payload = bytes((opcode,)) + args[0]
+    elif opcode == FLEET:
+        ships = args[0]
+        payload = bytes((FLEET, len(ships))) + b"".join(SHIP.pack(*ship) for ship in ships)
+    elif opcode == CONFIG:
+        board_size, ship_lengths = args
+        payload = bytes((CONFIG, board_size, len(ship_lengths))) + bytes(ship_lengths)
+    elif opcode == SHOT:
+        player, row, col, result, ship = args
+        payload = bytes((SHOT,)) + SHOT_FIELDS.pack(player, row, col, result) + (SHIP.pack(*ship) if ship else b"")
+    elif opcode == BOARD:
+        room_id, board_size, turn, boards = args
+        parts = [bytes((BOARD,)), BOARD_FIELDS.pack(room_id, board_size, turn)]
+        for hits, misses, sunk in boards:
+            parts.append(hits.to_bytes(mask_size(board_size), "little"))
+            parts.append(misses.to_bytes(mask_size(board_size), "little"))
+            parts.append(bytes((len(sunk),)) + b"".join(SHIP.pack(*ship) for ship in sunk))
+        payload = b"".join(parts)
+    else:
+        payload = bytes((opcode,)) + FIELDS[opcode].pack(*args)
+    return HEADER.pack(len(payload)) + payload
+
+
+def decode(payload):
+    """Split a frame payload into (opcode, args)."""
+    opcode = payload[0]
+    if opcode == INFO:
+        return opcode, (payload[1:].decode(),)
+    if opcode in (RESUME, SESSION):
+        return opcode, (bytes(payload[1:]),)
+    if opcode == FLEET:
+        return opcode, ([SHIP.unpack_from(payload, 2 + i * SHIP.size) for i in range(payload[1])],)
+    if opcode == CONFIG:
+        return opcode, (payload[1], tuple(payload[3:3 + payload[2]]))
+    if opcode == SHOT:
+        ship = SHIP.unpack_from(payload, 1 + SHOT_FIELDS.size) if len(payload) > 1 + SHOT_FIELDS.size else None
+        return opcode, SHOT_FIELDS.unpack_from(payload, 1) + (ship,)
+    if opcode == BOARD:
+        room_id, board_size, turn = BOARD_FIELDS.unpack_from(payload, 1)
+        size = mask_size(board_size)
+        offset = 1 + BOARD_FIELDS.size
+        boards = []
+        for _ in range(2):
+            hits = int.from_bytes(payload[offset:offset + size], "little")
+            misses = int.from_bytes(payload[offset + size:offset + 2 * size], "little")
+            offset += 2 * size
+            sunk = [SHIP.unpack_from(payload, offset + 1 + i * SHIP.size) for i in range(payload[offset])]
+            offset += 1 + len(sunk) * SHIP.size
+            boards.append((hits, misses, sunk))
+        return opcode, (room_id, board_size, turn, boards)
+    return opcode, FIELDS[opcode].unpack_from(payload, 1)
+
+
+class FrameReader:
+    """Reassembles frames from arbitrarily split or coalesced socket reads."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """Add received bytes and return every complete (opcode, args) message."""
+        self.buffer += data
+        messages = []
+        start = 0
+        while len(self.buffer) - start >= HEADER.size:
+            (length,) = HEADER.unpack_from(self.buffer, start)
+            end = start + HEADER.size + length
+            if end > len(self.buffer):
+                break
+            messages.append(decode(bytes(self.buffer[start + HEADER.size:end])))
+            start = end
+        del self.buffer[:start]
+        return messages
+
+
+async def read_frame(reader):
+    """Read one message from an asyncio StreamReader (raises IncompleteReadError at EOF)."""
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return decode(await reader.readexactly(length))
@@ -0,0 +1,246 @@
+import glob
+import hashlib
+import hmac
+import os
+import struct
+import sys
+from array import array
+from collections import namedtuple
+from itertools import zip_longest
+from battleship_engine import Board, REPEAT, ship_mask, ship_origin, iter_cells
+from journal import JournalWriter, JournalFile, START, PLACE, SHOT, END, NO_PLAYER, ORIENTATIONS, HEADER
+
+STATE_DIR = "state"
+COMPACT_INTERVAL = 60.0  # Seconds between two snapshots of the live rooms
+WAL_FLUSH_INTERVAL = 0.2  # Seconds of moves a crash can lose
+
+# Directory layout: one snapshot of the live rooms, the write-ahead logs (journal.py
+# format, game = room id) of what happened since, and the key signing session tokens.
+# Each compaction starts a new log generation, then replaces the snapshot; logs older
+# than the snapshot are deleted.
+SNAPSHOT_FILE = "rooms.snapshot"
+KEY_FILE = "session.key"
+WAL_NAME = "rooms-{:08d}.wal"
+
+SNAPSHOT_MAGIC = b"BSROOMS2"
+SNAPSHOT_MAGIC_V1 = b"BSROOMS1"  # Still read: cells fired at each board as a bitmask, in no order
+SNAPSHOT_HEADER = struct.Struct("<8sIII")  # magic, log generation, next room id, room count
+# Each room: header, then each player's ships (row, col, length, orientation), then
+# the cells fired in the game in order, as little-endian uint16 cell indices
+ROOM = struct.Struct("<IHBBBH")  # room id, session nonce, board size, ship count, turn, shot count
+ROOM_V1 = struct.Struct("<IHBBB")  # room id, session nonce, board size, ship count, turn
+SHIP = struct.Struct("BBBB")
+TOKEN = struct.Struct("<IB11s")  # room id, player, truncated HMAC (16 bytes)
+
+# shots: array("H") of the cells fired at, in order. A turn passes with every shot
+# that is not a REPEAT (never logged here), so shot k is player k % 2's.
+RecoveredRoom = namedtuple("RecoveredRoom", "room_id nonce boards turn shots")
+Compaction = namedtuple("Compaction", "generation next_room_id old_log rooms")  # See RoomStore.start_compaction
+
+
+def _mask_bytes(size):
+    return (size * size + 7) // 8
+
+
+class RoomLog(JournalWriter):
+    """Write-ahead log of the rooms: a journal whose game ids are the server's room ids."""
+
+    def start_room(self, room_id, nonce, board_size, ship_count):
+        # START's unused row and col carry the room's 16-bit session nonce
+        self._append(room_id, START, NO_PLAYER, nonce >> 8, nonce & 0xFF, board_size, ship_count)
+
+
+class RoomStore:
+    """Durable state of the rooms in progress, so a restarted server can resume them.
+
+    Every game start, fleet and shot is appended to a write-ahead log flushed
+    every WAL_FLUSH_INTERVAL; compact() rewrites the live rooms as a compact
+    snapshot so the log never grows past one COMPACT_INTERVAL of moves. Opening
+    the store replays the snapshot and the logs into `recovered`.
+    """
+
+    def __init__(self, directory=STATE_DIR, flush_interval=WAL_FLUSH_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.key = self._load_key()
+        self.generation = 0
+        self.next_room_id = 1
+        self.recovered = self._recover()
+        self.wal = None
+        # Start from a clean generation: recovered rooms in a fresh snapshot, an empty log
+        self.compact((room.room_id, room.nonce, room.boards, room.turn, room.shots) for room in self.recovered)
+
+    def _load_key(self):
+        path = os.path.join(self.directory, KEY_FILE)
+        if not os.path.exists(path):
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "wb") as f:
+                f.write(os.urandom(32))
+        with open(path, "rb") as f:
+            return f.read()
+
+    def token(self, room_id, player, nonce):
+        """Session token a player presents to resume its room."""
+        mac = hmac.new(self.key, struct.pack("<IBH", room_id, player, nonce), hashlib.sha256).digest()
+        return TOKEN.pack(room_id, player, mac[:11])
+
+    def check(self, token, nonce):
+        """True if the token was issued for the room and player it claims, whose game has this nonce."""
+        claim = self.parse_token(token)
+        return claim is not None and hmac.compare_digest(token, self.token(*claim, nonce))
+
+    @staticmethod
+    def parse_token(token):
+        """(room id, player) a token claims, or None if malformed; check it with token()."""
+        if len(token) != TOKEN.size:
+            return None
+        room_id, player, _ = TOKEN.unpack(token)
+        return (room_id, player) if player in (0, 1) else None
+
+    def start_room(self, room_id, nonce, boards):
+        """Log a game start with both fleets."""
+        self.wal.start_room(room_id, nonce, boards[0].size, len(boards[0].ship_masks))
+        for player, board in enumerate(boards):
+            self.wal.place_fleet(room_id, player, board)
+        self.next_room_id = max(self.next_room_id, room_id + 1)
+
+    def shot(self, room_id, player, row, col, result):
+        self.wal.shot(room_id, player, row, col, result)
+
+    def end_room(self, room_id):
+        self.wal.end_game(room_id)
+
+    def compact(self, rooms):
+        """Snapshot the live rooms, given as (room id, nonce, boards, turn, shots), and drop the older logs.
+
+        The new log generation starts first, so a crash at any point leaves a
+        snapshot and logs that together hold every room. Returns the number of rooms.
+        """
+        compaction = self.start_compaction(rooms)
+        self.finish_compaction(compaction)
+        return len(compaction.rooms)
+
+    def start_compaction(self, rooms):
+        """First half of compact(): start the new log and copy the state of the rooms.
+
+        Runs where the rooms change (the server's event loop) and only reads them;
+        finish_compaction() encodes and writes the snapshot, and may run in another
+        thread while the rooms go on.
+        """
+        old = self.wal
+        self.generation += 1
+        self.wal = RoomLog(self.directory, self.flush_interval, name=WAL_NAME.format(self.generation))
+        # One flat tuple per room (a few ms for 20,000 rooms): a fleet's ship masks never
+        # change once placed, and the shots are copied to bytes
+        state = [(room_id, nonce, turn, boards[0].size, boards[0].ship_masks, boards[1].ship_masks, shots.tobytes())
+                 for room_id, nonce, boards, turn, shots in rooms]
+        return Compaction(self.generation, self.next_room_id, old, state)
+
+    def finish_compaction(self, compaction):
+        """Second half of compact(): write the snapshot, then drop the logs it replaces."""
+        chunks = []
+        for room_id, nonce, turn, size, ships, opponent_ships, shots in compaction.rooms:
+            if sys.byteorder != "little":
+                cells = array("H", shots)
+                cells.byteswap()
+                shots = cells.tobytes()
+            chunks.append(ROOM.pack(room_id, nonce, size, len(ships), turn, len(shots) // 2))
+            for mask in ships + opponent_ships:
+                row, col, length, orientation = ship_origin(mask, size)
+                chunks.append(SHIP.pack(row, col, length, ORIENTATIONS.index(orientation)))
+            chunks.append(shots)
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, compaction.generation, compaction.next_room_id,
+                                      len(compaction.rooms))
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        with open(path + ".tmp", "wb") as f:
+            f.write(header + b"".join(chunks))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)  # Atomic: the old snapshot or the new one, never half of it
+        if compaction.old_log is not None:
+            compaction.old_log.close()
+        for generation, wal_path in self._wal_files():
+            if generation < compaction.generation:
+                os.remove(wal_path)
+
+    def _wal_files(self):
+        """(generation, path) of every log in the directory, oldest first."""
+        files = []
+        for path in glob.glob(os.path.join(self.directory, WAL_NAME.replace("{:08d}", "*"))):
+            files.append((int(os.path.basename(path)[6:14]), path))
+        return sorted(files)
+
+    def _recover(self):
+        """Rebuild the live rooms from the snapshot, then replay the logs written since."""
+        rooms = {}
+        path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            magic, self.generation, self.next_room_id, count = SNAPSHOT_HEADER.unpack_from(data)
+            if magic not in (SNAPSHOT_MAGIC, SNAPSHOT_MAGIC_V1):
+                raise ValueError(f"{path} is not a room snapshot")
+            room_header = ROOM if magic == SNAPSHOT_MAGIC else ROOM_V1
+            offset = SNAPSHOT_HEADER.size
+            for _ in range(count):
+                room_id, nonce, size, ships, turn, *shot_count = room_header.unpack_from(data, offset)
+                offset += room_header.size
+                boards = []
+                fired = []  # Version 1: cells fired at each board
+                for _ in range(2):
+                    board = Board(size)
+                    masks = []
+                    for _ in range(ships):
+                        row, col, length, orientation = SHIP.unpack_from(data, offset)
+                        masks.append(ship_mask(size, length, row, col, ORIENTATIONS[orientation]))
+                        offset += SHIP.size
+                    board.place_layout(masks)
+                    boards.append(board)
+                    if magic == SNAPSHOT_MAGIC_V1:
+                        mask = int.from_bytes(data[offset:offset + _mask_bytes(size)], "little")
+                        offset += _mask_bytes(size)
+                        fired.append([row * size + col for row, col in iter_cells(mask, size)])
+                if magic == SNAPSHOT_MAGIC:
+                    shots = array("H", data[offset:offset + 2 * shot_count[0]])
+                    if sys.byteorder != "little":
+                        shots.byteswap()
+                    offset += 2 * len(shots)
+                else:
+                    # The order was not kept: each board's cells in row-major order, taken in turns
+                    shots = array("H", [cell for pair in zip_longest(fired[1], fired[0]) for cell in pair
+                                        if cell is not None])
+                for shot, cell in enumerate(shots):
+                    boards[1 - shot % 2].fire(*divmod(cell, size))
+                rooms[room_id] = [nonce, boards, turn, shots]
+
+        for generation, wal_path in self._wal_files():
+            if generation < self.generation:
+                continue  # Already in the snapshot
+            self.generation = max(self.generation, generation)
+            if os.path.getsize(wal_path) < HEADER.size:
+                continue  # Killed before its header reached the disk: no record either
+            journal = JournalFile(wal_path)
+            for record in journal:
+                room = rooms.get(record.game)
+                if record.kind == START:
+                    rooms[record.game] = [record.row << 8 | record.col, [Board(record.a), Board(record.a)], 0, array("H")]
+                    self.next_room_id = max(self.next_room_id, record.game + 1)
+                elif room is None:
+                    continue  # Ended in the snapshot's time, or START lost in a crash
+                elif record.kind == PLACE:
+                    room[1][record.player].place_ship(record.a, record.row, record.col, ORIENTATIONS[record.b])
+                elif record.kind == SHOT:
+                    board = room[1][1 - record.player]
+                    result, _ = board.fire(record.row, record.col)
+                    if result != REPEAT:
+                        room[2] = 1 - record.player
+                        room[3].append(record.row * board.size + record.col)
+                elif record.kind == END:
+                    del rooms[record.game]
+            journal.close()
+        return [RecoveredRoom(room_id, *room) for room_id, room in rooms.items()]
+
+    def close(self):
+        if self.wal is not None:
+            self.wal.close()
@@ -1,95 +1,787 @@
-import socket
-import threading
+import argparse
+import asyncio
+import logging
+import secrets
+import time
+from array import array
+from collections import deque
+import protocol
+from protocol import (MOVE, RESULT, SUNK, GAME_OVER, FLEET, CONFIG, RESUME, SESSION, WATCH, BOARD, SHOT, WIN, LOSS,
+                      OPPONENT_LEFT, SESSION_EXPIRED)
+from battleship_engine import Board, HIT, MISS, SUNK as SHIP_SUNK, REPEAT, ship_origin, iter_cells, count_cells
+from battleship_config import DEFAULT_CONFIG, add_config_arguments, config_from_args
+from journal import JournalWriter, JOURNAL_DIR, ABANDONED
+from metrics import (Registry, SampledLogger, start_metrics_server, log_snapshots, start_logging,
+                     LOG_SAMPLE, SNAPSHOT_INTERVAL, METRICS_PORT)
+from room_store import RoomStore, STATE_DIR, COMPACT_INTERVAL
 
-class BattleshipServer:
-    def __init__(self, host="127.0.0.1", port=12345):
-        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server.bind((host, port))
-        self.server.listen(2)
-        print("Server started. Waiting for players...")
-        self.clients = []
-        self.boards = [None, None]  # Player boards
-        self.turn = 0  # Player 1 starts
+HELLO_TIMEOUT = 0.5  # Seconds to wait for a framed client's hello before falling back to text
+RESUME_TIMEOUT = 60.0  # Seconds a disconnected player's seat is kept for a RESUME
+SPECTATOR_QUEUE = 64  # Messages queued for a spectator before it is resynced with a snapshot
+SPECTATOR_BUFFER = 16 * 1024  # Bytes in a spectator's socket buffer before its feed waits
+SPECTATOR_TIMEOUT = 10.0  # Seconds a spectator's feed may wait on a full socket before it is dropped
 
-    def handle_client(self, client, player_id):
-        """Handle communication with a single client."""
+# Entries of a spectator's queue besides encoded messages
+RESYNC = None  # Send a fresh BOARD snapshot
+END = b""  # Send the final message and stop
+
+log = logging.getLogger("battleship.server")
+
+
+class ServerMetrics:
+    """Counters and latency histograms of the server, in one Registry for the metrics endpoint."""
+
+    def __init__(self):
+        self.registry = Registry("battleship_")
+        add = self.registry
+        self.connections = add.counter("connections_total", "Clients accepted")
+        self.disconnect_errors = add.counter("disconnect_errors_total", "Clients lost to a connection error")
+        self.messages = add.counter("messages_total", "Messages received from players")
+        self.rejected = add.counter("rejected_total", "Moves and fleets refused (out of turn, invalid, repeated)")
+        self.moves = add.counter("moves_total", "Moves played")
+        self.games_started = add.counter("games_started_total", "Games started")
+        self.games_finished = add.counter("games_finished_total", "Games won by a player")
+        self.games_abandoned = add.counter("games_abandoned_total", "Games a player left before the end")
+        self.accept = add.histogram("accept_seconds", "Connection to protocol negotiated")
+        self.relay = add.histogram("relay_seconds", "Message received to answers written")
+        self.turn = add.histogram("turn_seconds", "Turn given to a player to their move")
+        self.resumed = add.counter("resumed_total", "Players back in their game with a session token")
+        self.compaction = add.histogram("compaction_seconds", "Snapshot of the live rooms written")
+        self.watchers = add.counter("spectators_total", "Spectators that started watching a game")
+        self.fanout = add.counter("spectator_messages_total", "Messages queued for spectators")
+        self.resyncs = add.counter("spectator_resyncs_total", "Spectators too far behind, sent a snapshot instead")
+        self.dropped = add.counter("spectators_dropped_total", "Spectators disconnected for not reading")
+
+
+def build_fleet(ships, config=DEFAULT_CONFIG):
+    """Board holding the (row, col, length, orientation) ships of a FLEET message, or None if illegal."""
+    if sorted(ship[2] for ship in ships) != sorted(config.ship_lengths):
+        return None
+    board = Board(config.board_size)
+    for row, col, length, orientation in ships:
+        if orientation >= len(protocol.ORIENTATIONS):
+            return None
+        if not board.place_ship(length, row, col, protocol.ORIENTATIONS[orientation]):
+            return None
+    return board
+
+
+class Player:
+    """A connected client speaking the framed binary protocol."""
+
+    def __init__(self, reader, writer, version=protocol.VERSION):
+        self.reader = reader
+        self.writer = writer
+        self.version = version
+        self.room = None
+        self.player_id = None  # 0 or 1 within the room
+        self.board = None  # Fleet received with FLEET, resolved by the server
+
+    async def read_message(self):
+        """Next (opcode, args) from the client, or None once it disconnects."""
+        try:
+            return await protocol.read_frame(self.reader)
+        except asyncio.IncompleteReadError:
+            return None
+
+    def send(self, opcode, *args):
+        if self.writer is not None:  # None for the seat of a player who may resume
+            self.writer.write(protocol.encode(opcode, *args))
+
+    def info(self, text):
+        self.send(protocol.INFO, text)
+
+    def turn(self, your_turn, text=None):
+        self.send(protocol.TURN, int(your_turn))
+
+    def move(self, row, col):
+        self.send(MOVE, row, col)
+
+    def game_over(self, reason):
+        self.send(GAME_OVER, reason)
+
+
+def empty_seat(board, version=protocol.RESUME_VERSION):
+    """Stand-in for a player without a connection, holding its board until it resumes."""
+    seat = Player(None, None, version)
+    seat.board = board
+    return seat
+
+
+class Spectator:
+    """A client watching a room, fed by its own task from a bounded queue.
+
+    The room encodes each message once and push()es the same bytes to every
+    spectator without waiting. A spectator whose queue is full has fallen
+    behind: its queue is replaced by one RESYNC, answered with the room's
+    current BOARD. The SHOTs queued behind a RESYNC are already in that BOARD
+    and are skipped. One whose socket stays full for SPECTATOR_TIMEOUT is dropped.
+    """
+
+    def __init__(self, writer, room, metrics, queue_size=SPECTATOR_QUEUE, timeout=SPECTATOR_TIMEOUT):
+        self.writer = writer
+        self.room = room
+        self.metrics = metrics
+        self.queue = asyncio.Queue(max(2, queue_size))  # Room for a RESYNC and the END
+        self.timeout = timeout
+        self.final = None  # Last message, sent after END
+        writer.transport.set_write_buffer_limits(SPECTATOR_BUFFER)
+
+    def push(self, message):
+        """Queue a message (or RESYNC, or END) without ever waiting."""
+        if self.queue.full():
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            self.metrics.resyncs.inc()
+            if message != END:
+                return
+        self.queue.put_nowait(message)
+
+    def finish(self, message):
+        """End the feed with a last message, after what is already queued."""
+        self.final = message
+        self.push(END)
+
+    def skip_queued(self):
+        """Forget the queued SHOTs (the BOARD being sent already shows them), but not END."""
+        ended = False
+        while not self.queue.empty():
+            ended = self.queue.get_nowait() == END or ended
+        if ended:
+            self.queue.put_nowait(END)
+
+    async def run(self):
+        """Write the queued messages until END; False if the spectator was dropped or left."""
         try:
-            client.send(f"Welcome Player {player_id + 1}!".encode())
-            client.send("Waiting for the other player...".encode())
+            while True:
+                message = await self.queue.get()
+                if message is RESYNC:
+                    message = self.room.board_frame()
+                    self.skip_queued()
+                elif message == END:
+                    self.writer.write(self.final)
+                    await asyncio.wait_for(self.writer.drain(), self.timeout)
+                    return True
+                self.writer.write(message)
+                await asyncio.wait_for(self.writer.drain(), self.timeout)
+        except asyncio.TimeoutError:
+            self.metrics.dropped.inc()
+            return False
+        except ConnectionError:
+            return False
+
+
+class LegacyPlayer(Player):
+    """A client speaking the original text protocol ("row,col", "Your turn!", ...)."""
 
-            # Wait until both players are connected
-            while len(self.clients) < 2:
+    def __init__(self, reader, writer, pending=b""):
+        super(LegacyPlayer, self).__init__(reader, writer, protocol.LEGACY_VERSION)
+        self.pending = pending  # Text read while waiting for a hello
+
+    async def read_message(self):
+        data, self.pending = self.pending or await self.reader.read(1024), b""
+        if not data:
+            return None
+        message = data.decode()
+        if message == "Game Over":
+            return GAME_OVER, (LOSS,)
+        if "," in message:
+            try:
+                row, col = map(int, message.split(","))
+                return MOVE, (row, col)
+            except ValueError:
                 pass
+        return protocol.INFO, (message,)
+
+    def send(self, opcode, *args):
+        pass  # RESULT and SUNK have no text equivalent
+
+    def send_text(self, message):
+        self.writer.write(message.encode())
+
+    def info(self, text):
+        self.send_text(text)
+
+    def turn(self, your_turn, text=None):
+        self.send_text(text or ("Your turn!" if your_turn else "Waiting for the other player..."))
+
+    def move(self, row, col):
+        self.send_text(f"{row},{col}")
+
+    def game_over(self, reason):
+        if reason == OPPONENT_LEFT:
+            self.send_text("The other player has disconnected. Game over.")
+        else:
+            self.send_text("Game Over")
+
+
+class GameRoom:
+    """One match between two players, with its own turn order.
+
+    Moves are relayed and each client grades shots on its own board; used for
+    clients older than protocol.FLEET_VERSION.
+    """
+
+    def __init__(self, room_id, players, config=DEFAULT_CONFIG, journal=None, metrics=None, store=None):
+        self.room_id = room_id
+        self.players = players
+        self.config = config
+        self.journal = journal  # Records the games of rooms that hold both fleets
+        self.metrics = metrics if metrics is not None else ServerMetrics()
+        self.store = store  # RoomStore keeping rooms that hold both fleets across restarts
+        self.game = None  # Journal id of the game
+        self.shots = array("H")  # Cells fired at in order, shot k being player k % 2's (for the room store)
+        self.nonce = None  # Set once a resumable game starts; part of its session tokens
+        self.turn = 0  # Player 1 starts
+        self.turn_started = None  # perf_counter() when the current turn was given
+        self.over = False
+        self.started = False  # Both fleets are in: the game can be watched
+        self.spectators = set()
+        self.board_cache = None  # BOARD message of the current position, shared by spectators
+        self.told_to_wait = set()  # Players told their fleet is waiting for the other one
+        for player_id, player in enumerate(players):
+            player.room = self
+            player.player_id = player_id
+
+    def start(self):
+        """Tell both players the game is starting."""
+        self.players[0].turn(True)
+        self.players[1].turn(False, "Waiting for Player 1 to move...")
+        self.turn_started = time.perf_counter()
+        self.metrics.games_started.inc()
+
+    def next_turn(self):
+        """Hand the turn to the other player, timing the turn that ends."""
+        now = time.perf_counter()
+        self.metrics.turn.observe(now - self.turn_started)
+        self.metrics.moves.inc()
+        self.turn_started = now
+        self.turn = 1 - self.turn
+
+    def broadcast(self, message):
+        """Queue an encoded message for every spectator; never waits on them."""
+        for spectator in self.spectators:
+            spectator.push(message)
+        self.metrics.fanout.inc(len(self.spectators))
+
+    def finish_spectators(self, reason):
+        """End the spectators' feeds with GAME_OVER (reason from Player 1's point of view)."""
+        message = protocol.encode(GAME_OVER, reason)
+        for spectator in self.spectators:
+            spectator.finish(message)
 
-            if player_id == 0:
-                client.send("Your turn!".encode())
+    def handle_message(self, player_id, opcode, args):
+        """Apply one message from a player; returns False once the room is finished."""
+        if self.over:
+            return False
+        player = self.players[player_id]
+        opponent = self.players[1 - player_id]
+        if opcode == GAME_OVER:
+            # The sender has lost: notify the other player that they have won
+            opponent.game_over(WIN)
+            log.info("Room %d: Player %d has won the game!", self.room_id, 1 - player_id + 1)
+            self.metrics.games_finished.inc()
+            self.over = True
+            return False
+
+        if opcode in (RESULT, SUNK):
+            # The defender grading the shot it just received
+            opponent.send(opcode, *args)
+        elif opcode == MOVE:
+            # Relay the move to the other player
+            if self.turn == player_id:
+                self.next_turn()  # Switch turns
+                opponent.move(*args)  # Send move to the other player
+                opponent.turn(True)  # Notify the other player
+                player.turn(False)  # Notify current player
             else:
-                client.send("Waiting for Player 1 to move...".encode())
+                self.metrics.rejected.inc()
+                player.info("Not your turn!")
+        return True
+
+    def leave(self, player_id):
+        """A player disconnected: end the match for the other one."""
+        if not self.over:
+            self.over = True
+            self.metrics.games_abandoned.inc()
+            self.players[1 - player_id].game_over(OPPONENT_LEFT)
+            self.finish_spectators(OPPONENT_LEFT)
+            if self.game is not None:
+                self.journal.end_game(self.game, 1 - player_id, ABANDONED)
+            if self.nonce is not None:
+                self.store.end_room(self.room_id)
+
+    def detach(self, player_id):
+        """A player disconnected: keep its seat for a RESUME if the game allows it (True), else
+        the caller ends the game with leave()."""
+        return False
+
+
+class AuthoritativeRoom(GameRoom):
+    """A match where the server holds both fleets and resolves every shot.
+
+    A turn is one MOVE from the attacker answered by RESULT (plus SUNK), while
+    the defender gets the same MOVE, which also hands it the turn.
+    """
+
+    def start(self):
+        if all(player.board is not None for player in self.players):
+            if self.journal is not None and self.game is None:
+                self.game = self.journal.start_game(self.config.board_size, len(self.config.ship_lengths))
+                for player in self.players:
+                    self.journal.place_fleet(self.game, player.player_id, player.board)
+            if self.store is not None and self.nonce is None:
+                self.nonce = secrets.randbits(16)
+                self.store.start_room(self.room_id, self.nonce, [player.board for player in self.players])
+                for player in self.players:
+                    if player.version >= protocol.RESUME_VERSION:
+                        player.send(SESSION, self.store.token(self.room_id, player.player_id, self.nonce))
+            self.players[0].turn(True)
+            self.players[1].turn(False)
+            self.turn_started = time.perf_counter()
+            self.started = True
+            self.metrics.games_started.inc()
+        else:
+            self.tell_waiting()
+
+    def tell_waiting(self):
+        """Tell each player whose fleet is in, once, that the game waits for the other fleet."""
+        for player in self.players:
+            if player.board is not None and player.player_id not in self.told_to_wait:
+                self.told_to_wait.add(player.player_id)
+                player.info("Waiting for both fleets...")
+
+    def fleet_ready(self, player_id):
+        """A player's fleet arrived: start once both are in."""
+        self.start()
+
+    def journal_restored(self):
+        """Open a journal game for a room rebuilt after a restart, so the rest of the game is recorded.
+
+        It holds both fleets and the shots fired before the restart, in the order they
+        were fired, then a RESTORED record marking where the server restarted.
+        """
+        size = self.config.board_size
+        self.game = self.journal.start_game(size, len(self.config.ship_lengths))
+        boards = []
+        for player in self.players:
+            self.journal.place_fleet(self.game, player.player_id, player.board)
+            board = Board(size)
+            board.place_layout(player.board.ship_masks)
+            boards.append(board)
+        for shot, cell in enumerate(self.shots):
+            row, col = divmod(cell, size)
+            result, _ = boards[1 - shot % 2].fire(row, col)
+            self.journal.shot(self.game, shot % 2, row, col, result)
+        self.journal.restored(self.game)
+
+    def handle_message(self, player_id, opcode, args):
+        if self.over:
+            return False
+        player = self.players[player_id]
+        opponent = self.players[1 - player_id]
+        if opcode != MOVE:
+            return True
+        if player.board is None or opponent.board is None:
+            self.metrics.rejected.inc()
+            self.tell_waiting()  # Already told, unless its fleet is not in either
+            return True
+        if self.turn != player_id:
+            self.metrics.rejected.inc()
+            player.info("Not your turn!")
+            return True
+        row, col = args
+        size = self.config.board_size
+        if row >= size or col >= size:
+            self.metrics.rejected.inc()
+            player.info("Invalid move!")
+            return True
+
+        result, ship = opponent.board.fire(row, col)
+        if self.game is not None:
+            self.journal.shot(self.game, player_id, row, col, result)
+        if self.nonce is not None:
+            self.store.shot(self.room_id, player_id, row, col, result)
+        player.send(RESULT, row, col, result)
+        if result == REPEAT:
+            self.metrics.rejected.inc()
+            return True  # Same player shoots again
+        self.shots.append(row * size + col)
+        sunk = self._ship(opponent.board.ship_masks[ship]) if result == SHIP_SUNK else None
+        if sunk:
+            player.send(SUNK, *sunk)
+        opponent.move(row, col)
+        self.next_turn()
+        if self.spectators:
+            self.broadcast(protocol.encode(SHOT, player_id, row, col, result, sunk))
+        self.board_cache = None
+
+        if opponent.board.all_sunk():
+            if self.game is not None:
+                self.journal.end_game(self.game, player_id)
+            if self.nonce is not None:
+                self.store.end_room(self.room_id)
+            player.game_over(WIN)
+            opponent.game_over(LOSS)
+            self.finish_spectators(WIN if player_id == 0 else LOSS)
+            log.info("Room %d: Player %d has won the game!", self.room_id, player_id + 1)
+            self.metrics.games_finished.inc()
+            self.over = True
+            return False
+        return True
+
+    def detach(self, player_id):
+        player = self.players[player_id]
+        if self.over or self.nonce is None or player.version < protocol.RESUME_VERSION:
+            return False
+        seat = empty_seat(player.board, player.version)
+        seat.room, seat.player_id = self, player_id
+        self.players[player_id] = seat
+        self.players[1 - player_id].info(f"Player {player_id + 1} disconnected, waiting for them to come back...")
+        return True
+
+    def resume(self, player_id, player):
+        """Seat a reconnected player and send it the whole game: its fleet, both players' shots, the turn."""
+        old = self.players[player_id]
+        old.room = None  # A connection still open for the seat no longer speaks for it
+        if old.writer is not None:
+            old.writer.close()
+        player.board, player.room, player.player_id = old.board, self, player_id
+        self.players[player_id] = player
+        opponent = self.players[1 - player_id]
+        size = self.config.board_size
+
+        player.send(SESSION, self.store.token(self.room_id, player_id, self.nonce))
+        player.send(FLEET, [self._ship(mask) for mask in player.board.ship_masks])
+        for row, col in iter_cells(opponent.board.fired, size):
+            player.send(RESULT, row, col, HIT if opponent.board.is_hit(row, col) else MISS)
+        for mask, hp in zip(opponent.board.ship_masks, opponent.board.ship_hp):
+            if not hp:
+                player.send(SUNK, *self._ship(mask))
+        for row, col in iter_cells(player.board.fired, size):
+            player.move(row, col)
+        player.turn(self.turn == player_id)
+        opponent.info(f"Player {player_id + 1} is back.")
+
+    def _ship(self, mask):
+        row, col, length, orientation = ship_origin(mask, self.config.board_size)
+        return row, col, length, protocol.ORIENTATIONS.index(orientation)
+
+    def board_frame(self):
+        """BOARD message of the game so far: the shots and sunk ships, never a ship still afloat."""
+        if self.board_cache is None:
+            boards = []
+            for player in self.players:
+                board = player.board
+                sunk = [self._ship(mask) for mask, hp in zip(board.ship_masks, board.ship_hp) if not hp]
+                boards.append((board.hits, board.misses, sunk))
+            self.board_cache = protocol.encode(BOARD, self.room_id, self.config.board_size, self.turn, boards)
+        return self.board_cache
+
+    def state(self):
+        """(room id, nonce, boards, turn, shots) for RoomStore.compact()."""
+        return self.room_id, self.nonce, [player.board for player in self.players], self.turn, self.shots
+
+
+class BattleshipServer:
+    def __init__(self, host="127.0.0.1", port=12345, config=DEFAULT_CONFIG, journal=None,
+                 metrics_port=METRICS_PORT, snapshot_interval=SNAPSHOT_INTERVAL, log_sample=LOG_SAMPLE,
+                 store=None, resume_timeout=RESUME_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.config = config  # Board size and fleet of every room
+        self.journal = journal  # JournalWriter shared by every room, or None
+        self.metrics_port = metrics_port  # Local port of the plain-text metrics, None to disable
+        self.snapshot_interval = snapshot_interval  # Seconds between metric log lines, 0 to disable
+        self.waiting = {}  # Matchmaking queue of players without a room, per room type
+        self.rooms = {}
+        self.next_room_id = 1
+        self.clients = 0
+        self.metrics = ServerMetrics()
+        gauge = self.metrics.registry.gauge
+        gauge("clients", "Connected clients", lambda: self.clients)
+        gauge("rooms", "Active rooms", lambda: len(self.rooms))
+        gauge("waiting", "Players waiting for an opponent", lambda: sum(map(len, self.waiting.values())))
+        gauge("spectators", "Spectators watching a game",
+              lambda: sum(len(room.spectators) for room in self.rooms.values()))
+        self.message_log = SampledLogger(log, log_sample)  # Per-message lines are sampled
+        self.store = store  # RoomStore of the games in progress, or None
+        self.resume_timeout = resume_timeout
+        if store is not None:
+            self.restore_rooms()
+
+    def restore_rooms(self):
+        """Rebuild the rooms the store recovered; their players have resume_timeout to come back."""
+        for recovered in self.store.recovered:
+            boards = recovered.boards
+            fleet = sorted(map(count_cells, boards[0].ship_masks))
+            if boards[0].size != self.config.board_size or fleet != sorted(self.config.ship_lengths):
+                log.warning("Room %d: dropped, it was played with another board or fleet", recovered.room_id)
+                self.store.end_room(recovered.room_id)
+                continue
+            room = AuthoritativeRoom(recovered.room_id, [empty_seat(board) for board in boards], self.config,
+                                     self.journal, self.metrics, self.store)
+            room.nonce = recovered.nonce
+            room.turn = recovered.turn
+            room.shots = recovered.shots
+            room.turn_started = time.perf_counter()
+            room.started = True
+            if self.journal is not None:
+                room.journal_restored()
+            self.rooms[room.room_id] = room
+        self.next_room_id = max(self.next_room_id, self.store.next_room_id)
 
+    async def negotiate(self, reader, writer):
+        """Pick the protocol: framed clients open with a hello, old clients never do."""
+        try:
+            data = await asyncio.wait_for(reader.read(1024), HELLO_TIMEOUT)
+        except asyncio.TimeoutError:
+            return LegacyPlayer(reader, writer)
+        if data and data[0] == protocol.HELLO:
+            # Framed clients send nothing else until the server has answered
+            if len(data) < 2:
+                data += await reader.readexactly(1)
+            version = min(data[1], protocol.VERSION)
+            writer.write(protocol.hello(version))
+            if version >= protocol.CONFIG_VERSION:
+                writer.write(protocol.encode(CONFIG, self.config.board_size, self.config.ship_lengths))
+            return Player(reader, writer, version)
+        return LegacyPlayer(reader, writer, data)
+
+    def matchmake(self, player):
+        """Pair the player with the longest-waiting one of the same room type, or queue them."""
+        room_type = AuthoritativeRoom if player.version >= protocol.FLEET_VERSION else GameRoom
+        waiting = self.waiting.setdefault(room_type, deque())
+        if not waiting:
+            waiting.append(player)
+            player.info("You are Player 1.")
+            player.info("Waiting for the other player...")
+            return
+
+        opponent = waiting.popleft()
+        player.info("You are Player 2.")
+        room = room_type(self.next_room_id, [opponent, player], self.config, self.journal, self.metrics, self.store)
+        self.rooms[room.room_id] = room
+        self.next_room_id += 1
+        log.info("Room %d: both players connected. Starting the game!", room.room_id)
+        room.start()
+
+    def receive_fleet(self, player, ships):
+        """Validate and keep a player's fleet; it may arrive before an opponent is found."""
+        if player.board is not None:
+            self.metrics.rejected.inc()
+            player.info("Fleet already placed!")
+            return
+        player.board = build_fleet(ships, self.config)
+        if player.board is None:
+            self.metrics.rejected.inc()
+            player.info("Invalid fleet!")
+        elif player.room is not None:
+            player.room.fleet_ready(player.player_id)
+
+    def resume(self, player, token):
+        """Put a reconnecting player back in its game; False if the token matches no game in progress."""
+        claim = RoomStore.parse_token(token) if self.store is not None else None
+        room = self.rooms.get(claim[0]) if claim else None
+        if room is None or room.over or room.nonce is None or not self.store.check(token, room.nonce):
+            self.metrics.rejected.inc()
+            return False
+        room.resume(claim[1], player)
+        self.metrics.resumed.inc()
+        log.info("Room %d: Player %d resumed the game.", room.room_id, claim[1] + 1)
+        return True
+
+    def room_to_watch(self, room_id):
+        """The game in progress with this id, or the most watched one (newest on a tie) for 0."""
+        if room_id:
+            room = self.rooms.get(room_id)
+        else:
+            rooms = [room for room in self.rooms.values() if isinstance(room, AuthoritativeRoom)]
+            room = max(rooms, key=lambda room: (len(room.spectators), room.room_id), default=None)
+        if room is None or room.over or not room.started:
+            return None
+        return room
+
+    async def watch(self, player, room_id):
+        """Stream a game to a spectator, starting with a snapshot, until it ends or the spectator leaves."""
+        room = self.room_to_watch(room_id)
+        if room is None:
+            player.game_over(SESSION_EXPIRED)
+            return
+        spectator = Spectator(player.writer, room, self.metrics)
+        spectator.push(RESYNC)
+        room.spectators.add(spectator)
+        self.metrics.watchers.inc()
+        log.info("Room %d: a spectator joined (%d watching).", room.room_id, len(room.spectators))
+        feed = asyncio.create_task(spectator.run())
+        closed = asyncio.create_task(player.read_message())  # Spectators send nothing but their EOF
+        try:
+            await asyncio.wait((feed, closed), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            room.spectators.discard(spectator)
+            for task in (feed, closed):
+                if not task.cancel() and not task.cancelled():
+                    task.exception()  # Retrieved, so a lost connection is not reported as unhandled
+
+    def hold_seat(self, room, player_id):
+        """Give a disconnected player resume_timeout to come back before the game is abandoned."""
+        seat = room.players[player_id]
+        asyncio.get_running_loop().call_later(self.resume_timeout, self.release_seat, room, player_id, seat)
+
+    def release_seat(self, room, player_id, seat):
+        if room.players[player_id] is seat and not room.over:
+            log.info("Room %d: Player %d did not come back.", room.room_id, player_id + 1)
+            room.leave(player_id)
+            self.rooms.pop(room.room_id, None)
+
+    async def compact_rooms(self, interval=COMPACT_INTERVAL):
+        """Snapshot the games in progress every interval seconds, which also trims the write-ahead log."""
+        while True:
+            await asyncio.sleep(interval)
+            start = time.perf_counter()
+            # The rooms are copied on the loop; encoding, writing and fsyncing the snapshot run in a thread
+            compaction = self.store.start_compaction(room.state() for room in self.rooms.values()
+                                                     if room.nonce is not None and not room.over)
+            encoded = time.perf_counter() - start
+            await asyncio.get_running_loop().run_in_executor(None, self.store.finish_compaction, compaction)
+            self.metrics.compaction.observe(time.perf_counter() - start)
+            log.info("Snapshot of %d rooms written in %.3fs (%.3fs on the event loop)", len(compaction.rooms),
+                     time.perf_counter() - start, encoded)
+
+    async def handle_client(self, reader, writer):
+        """Handle communication with a single client."""
+        addr = writer.get_extra_info("peername")
+        player = None
+        self.clients += 1
+        try:
+            accepted = time.perf_counter()
+            player = await self.negotiate(reader, writer)
+            self.metrics.accept.observe(time.perf_counter() - accepted)
+            self.metrics.connections.inc()
+            log.info("Player connected from %s (protocol v%d).", addr, player.version)
+            pending = None
+            if player.version >= protocol.RESUME_VERSION:
+                # The first message says whether the player joins a new game, resumes one or watches one
+                pending = await player.read_message()
+                if pending is None:
+                    return
+                if pending[0] == WATCH and player.version >= protocol.WATCH_VERSION:
+                    await self.watch(player, pending[1][0])
+                    return
+                if pending[0] == RESUME and pending[1][0]:
+                    if not self.resume(player, pending[1][0]):
+                        player.game_over(SESSION_EXPIRED)
+                        return
+                else:
+                    self.matchmake(player)
+                if pending[0] == RESUME:
+                    pending = None
+            else:
+                self.matchmake(player)
             while True:
-                try:
-                    message = client.recv(1024).decode()
-                    if message:
-                        print(f"Player {player_id + 1}: {message}")
-
-                        # Relay the move to the other player
-                        if self.turn == player_id:
-                            self.turn = 1 - player_id  # Switch turns
-                            self.clients[1 - player_id].send(message.encode())  # Send move to the other player
-                            self.clients[1 - player_id].send("Your turn!".encode())  # Notify the other player
-                            client.send("Waiting for the other player...".encode())  # Notify current player
-                        else:
-                            client.send("Not your turn!".encode())
-                except Exception as e:
-                    print(f"Error handling Player {player_id + 1}: {e}")
+                message, pending = pending or await player.read_message(), None
+                if message is None:
+                    break
+                received = time.perf_counter()
+                self.metrics.messages.inc()
+                opcode, args = message
+                room = player.room
+                if opcode == FLEET and player.version >= protocol.FLEET_VERSION:
+                    self.receive_fleet(player, args[0])
+                    continue
+                if room is None:
+                    # No opponent yet
+                    player.info("Waiting for the other player...")
+                    continue
+                self.message_log.log("Room %d Player %d: %s %s", room.room_id, player.player_id + 1, opcode, args)
+                playing = room.handle_message(player.player_id, opcode, args)
+                self.metrics.relay.observe(time.perf_counter() - received)
+                if not playing:
                     break
-        except Exception as e:
-            print(f"Player {player_id + 1} disconnected: {e}")
-            if client in self.clients:
-                self.clients.remove(client)
-            # Notify the other player
-            if len(self.clients) == 1:
-                self.clients[0].send("The other player has disconnected. Game over.".encode())
-            client.close()
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            self.metrics.disconnect_errors.inc()
+            log.info("Player from %s disconnected: %s", addr, e)
+        finally:
+            self.clients -= 1
+            for waiting in self.waiting.values():
+                if player in waiting:
+                    waiting.remove(player)
+            room = player.room if player is not None else None
+            if room is not None:
+                if room.detach(player.player_id):
+                    self.hold_seat(room, player.player_id)
+                else:
+                    room.leave(player.player_id)
+                    self.rooms.pop(room.room_id, None)
+            writer.close()
+
+    async def serve(self):
+        """Accept connections until cancelled."""
+        server = await asyncio.start_server(self.handle_client, self.host, self.port)
+        log.info("Server started. Waiting for players...")
+        if self.metrics_port is not None:
+            try:
+                self.metrics_server = await start_metrics_server(self.metrics.registry, "127.0.0.1", self.metrics_port)
+                log.info("Metrics on http://127.0.0.1:%d/metrics", self.metrics_port)
+            except OSError as e:
+                log.warning("Metrics endpoint not started: %s", e)
+        if self.snapshot_interval:
+            self.snapshot_task = asyncio.create_task(log_snapshots(self.metrics.registry, log, self.snapshot_interval))
+        if self.store is not None:
+            self.compact_task = asyncio.create_task(self.compact_rooms())
+            for room in self.rooms.values():  # Restored: nobody is connected yet
+                for player_id in range(2):
+                    self.hold_seat(room, player_id)
+        async with server:
+            await server.serve_forever()
 
     def start(self):
         """Start the server and accept connections."""
-        while len(self.clients) < 2:
-            client, addr = self.server.accept()
-            print(f"Player {len(self.clients) + 1} connected from {addr}.")
-            self.clients.append(client)
-            client.send(f"You are Player {len(self.clients)}.".encode())
-            threading.Thread(target=self.handle_client, args=(client, len(self.clients) - 1)).start()
-
-        print("Both players connected. Starting the game!")
-        # Notify both players that the game is starting
-        self.clients[0].send("Your turn!".encode())
-        self.clients[1].send("Waiting for Player 1 to move...".encode())
-
-    def listen_to_server(self):
-        """Listen for messages from the server."""
-        while True:
-            try:
-                message = self.client.recv(1024).decode()
-                if message.startswith("Your turn!"):
-                    self.player_turn = True
-                    self.status_label.config(text="Your turn! Attack the enemy waters.")
-                elif message.startswith("Waiting"):
-                    self.player_turn = False
-                    self.status_label.config(text="Waiting for the other player...")
-                elif "," in message:  # Opponent's move
-                    row, col = map(int, message.split(","))
-                    self.handle_opponent_move(row, col)
-                elif message.startswith("The other player has disconnected"):
-                    messagebox.showinfo("Game Over", "The other player has disconnected. Game over.")
-                    self.root.quit()
-                elif message.startswith("Game Over"):
-                    messagebox.showinfo("Game Over", "You have won the game!")
-                    self.ask_restart()
-            except Exception as e:
-                print(f"Error in listen_to_server: {e}")
-                break
+        asyncio.run(self.serve())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Battleship matchmaking server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--journal", default=JOURNAL_DIR, help="Directory of the game journals")
+    parser.add_argument("--no-journal", action="store_true", help="Do not record the games")
+    parser.add_argument("--state", default=STATE_DIR, help="Directory keeping the games in progress across restarts")
+    parser.add_argument("--no-state", action="store_true", help="Do not keep games across restarts (no resume)")
+    parser.add_argument("--resume-timeout", type=float, default=RESUME_TIMEOUT,
+                        help="Seconds a disconnected player has to resume the game")
+    parser.add_argument("--metrics-port", type=int, default=METRICS_PORT,
+                        help="Local port of the plain-text metrics (0 to disable)")
+    parser.add_argument("--snapshot-interval", type=float, default=SNAPSHOT_INTERVAL,
+                        help="Seconds between metric lines in the log (0 to disable)")
+    parser.add_argument("--log-sample", type=int, default=LOG_SAMPLE,
+                        help="Log one player message in this many (0 to log none)")
+    parser.add_argument("--log-file", help="Write the log to this file instead of stderr")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    config = config_from_args(args, parser)
+    listener = start_logging(args.log_file)
+    journal = None if args.no_journal else JournalWriter(args.journal)
+    store = None
+    if not args.no_state:
+        start = time.perf_counter()
+        store = RoomStore(args.state)
+        log.info("Recovered %d rooms from %s in %.2fs", len(store.recovered), args.state, time.perf_counter() - start)
+    server = BattleshipServer(args.host, args.port, config, journal, args.metrics_port or None,
+                              args.snapshot_interval, args.log_sample, store, args.resume_timeout)
+    try:
+        server.start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if journal is not None:
+            journal.close()
+        if store is not None:
+            store.close()
+        log.info("Final metrics: %s", server.metrics.registry.snapshot())
+        listener.stop()
+
 
 if __name__ == "__main__":
-    server = BattleshipServer()
-    server.start()
\ No newline at end of file
+    main()
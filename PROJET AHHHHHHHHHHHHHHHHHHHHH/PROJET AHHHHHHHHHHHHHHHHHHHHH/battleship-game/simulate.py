@@ -0,0 +1,116 @@
+import argparse
+import random
+import time
+from collections import Counter
+from multiprocessing import Pool
+from battleship_engine import Board, SUNK, iter_cells
+from battleship_config import DEFAULT_CONFIG, add_config_arguments, config_from_args
+from placement import place_random_fleet
+from battleship_ai import make_targeter
+
+CHUNK_SIZE = 1000  # Games per worker task
+
+
+def play_game(strategies, config, rng, first=0):
+    """Play one AI-vs-AI game and return (winner index, shots fired by the winner)."""
+    board_size, ship_lengths = config.board_size, config.ship_lengths
+    # boards[i] is player i's fleet, shot at by the other player
+    boards = [Board(board_size), Board(board_size)]
+    for board in boards:
+        place_random_fleet(board, ship_lengths, rng)
+    targeters = [make_targeter(strategy, board_size, ship_lengths, rng) for strategy in strategies]
+    shots = [0, 0]
+
+    player = first
+    while True:
+        target_board = boards[1 - player]
+        row, col = targeters[player].next_target()
+        result, ship = target_board.fire(row, col)
+        shots[player] += 1
+        sunk_cells = list(iter_cells(target_board.ship_masks[ship], board_size)) if result == SUNK else []
+        targeters[player].record(row, col, result, sunk_cells)
+        if target_board.all_sunk():
+            return player, shots[player]
+        player = 1 - player
+
+
+def run_chunk(args):
+    """Play a chunk of games with its own seeded RNG (runs in a worker process)."""
+    strategies, config, seed, first_game, count = args
+    rng = random.Random(f"{seed}:{first_game}")
+    wins = [0, 0]
+    shots_to_win = [Counter(), Counter()]
+    for game in range(first_game, first_game + count):
+        # Alternate who shoots first so neither side gets the extra move
+        winner, shots = play_game(strategies, config, rng, first=game % 2)
+        wins[winner] += 1
+        shots_to_win[winner][shots] += 1
+    return wins, shots_to_win
+
+
+def simulate(strategies, games, config=DEFAULT_CONFIG, workers=None, seed=0):
+    """Play games between two strategies over a process pool.
+
+    Each chunk of games is seeded from `seed` and its first game number, so a
+    run is reproducible whatever the number of workers.
+    """
+    chunks = [(tuple(strategies), config, seed, first_game, min(CHUNK_SIZE, games - first_game))
+              for first_game in range(0, games, CHUNK_SIZE)]
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = list(map(run_chunk, chunks))
+    else:
+        with Pool(workers) as pool:
+            results = pool.map(run_chunk, chunks)
+    elapsed = time.perf_counter() - start
+
+    wins = [0, 0]
+    shots_to_win = [Counter(), Counter()]
+    for chunk_wins, chunk_shots in results:
+        for player in (0, 1):
+            wins[player] += chunk_wins[player]
+            shots_to_win[player].update(chunk_shots[player])
+    return wins, shots_to_win, elapsed
+
+
+def percentile(counts, fraction):
+    """Value below which the given fraction of a Counter histogram falls."""
+    total = sum(counts.values())
+    seen = 0
+    for value in sorted(counts):
+        seen += counts[value]
+        if seen >= fraction * total:
+            return value
+    return None
+
+
+def report(strategies, games, wins, shots_to_win, elapsed):
+    print(f"{games} games in {elapsed:.2f}s ({games / elapsed:,.0f} games/sec)")
+    for player, strategy in enumerate(strategies):
+        counts = shots_to_win[player]
+        line = f"Player {player + 1} ({strategy}): {wins[player]} wins ({100 * wins[player] / games:.1f}%)"
+        if counts:
+            mean = sum(shots * n for shots, n in counts.items()) / sum(counts.values())
+            line += (f", shots to win: mean {mean:.1f}, min {min(counts)}, p50 {percentile(counts, 0.5)}, "
+                     f"p90 {percentile(counts, 0.9)}, max {max(counts)}")
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless AI-vs-AI Battleship simulator")
+    parser.add_argument("strategies", nargs=2, metavar="STRATEGY",
+                        help='easy, medium, hard, dqn or a "module:factory" path')
+    parser.add_argument("--games", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    wins, shots_to_win, elapsed = simulate(args.strategies, args.games, config_from_args(args, parser),
+                                           workers=args.workers, seed=args.seed)
+    report(args.strategies, args.games, wins, shots_to_win, elapsed)
+
+
+if __name__ == "__main__":
+    main()
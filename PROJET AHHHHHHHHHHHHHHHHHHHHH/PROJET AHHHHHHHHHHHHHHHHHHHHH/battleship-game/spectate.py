@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import protocol
+from protocol import CONFIG, WATCH, BOARD, SHOT, GAME_OVER, WIN, LOSS, OPPONENT_LEFT, SESSION_EXPIRED
+from battleship_engine import MISS, HIT, SUNK, ship_mask, cell_bit
+from battleship_config import column_label
+
+RESULT_NAMES = {MISS: "miss", HIT: "hit", SUNK: "sunk"}
+ENDINGS = {WIN: "Player 1 has won the game!", LOSS: "Player 2 has won the game!",
+           OPPONENT_LEFT: "A player left the game.", SESSION_EXPIRED: "No such game in progress."}
+
+
+class WatchedGame:
+    """What a spectator knows of a game: the shots fired at each player's board and its sunk ships.
+
+    Built from the server's BOARD snapshot, then kept up to date with the SHOT deltas.
+    """
+
+    def __init__(self, room_id, board_size, turn, boards):
+        self.room_id = room_id
+        self.size = board_size
+        self.letters = [column_label(col) for col in range(board_size)]
+        self.turn = turn
+        self.hits = [hits for hits, _, _ in boards]  # Per player, shots received
+        self.misses = [misses for _, misses, _ in boards]
+        self.sunk = [0, 0]
+        for player, (_, _, ships) in enumerate(boards):
+            for ship in ships:
+                self.sink(player, ship)
+
+    def sink(self, player, ship):
+        row, col, length, orientation = ship
+        self.sunk[player] |= ship_mask(self.size, length, row, col, protocol.ORIENTATIONS[orientation])
+
+    def shot(self, player, row, col, result, ship):
+        """Apply a SHOT from player at the other player's board; returns the line describing it."""
+        target = 1 - player
+        bit = cell_bit(self.size, row, col)
+        if result == MISS:
+            self.misses[target] |= bit
+        else:
+            self.hits[target] |= bit
+        if ship:
+            self.sink(target, ship)
+        self.turn = target
+        return f"Player {player + 1} fires at {self.letters[col]}{row + 1}: {RESULT_NAMES.get(result, result)}"
+
+    def render(self):
+        """Both boards side by side: X hit, # sunk ship, o miss."""
+        letters = " ".join(self.letters)
+        lines = [f"Room {self.room_id}, Player {self.turn + 1} to move",
+                 f"   {'Player 1':<{2 * self.size}}    Player 2", f"   {letters}    {letters}"]
+        for row in range(self.size):
+            cells = []
+            for player in range(2):
+                marks = []
+                for col in range(self.size):
+                    bit = cell_bit(self.size, row, col)
+                    if self.sunk[player] & bit:
+                        marks.append("#")
+                    elif self.hits[player] & bit:
+                        marks.append("X")
+                    elif self.misses[player] & bit:
+                        marks.append("o")
+                    else:
+                        marks.append(".")
+                cells.append(" ".join(marks))
+            lines.append(f"{row + 1:>2} {cells[0]}    {cells[1]}")
+        return "\n".join(lines)
+
+
+async def watch(host, port, room_id, show=print):
+    """Follow one game until it ends; returns the GAME_OVER reason, None if the connection drops."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(protocol.hello())
+        reply = await reader.readexactly(2)
+        if reply != protocol.hello():
+            raise ConnectionError(f"Server does not support spectators (handshake {reply!r})")
+        opcode, _ = await protocol.read_frame(reader)
+        if opcode != CONFIG:
+            raise ConnectionError(f"Expected the game configuration, got opcode {opcode}")
+        writer.write(protocol.encode(WATCH, room_id))
+        game = None
+        while True:
+            try:
+                opcode, args = await protocol.read_frame(reader)
+            except asyncio.IncompleteReadError:
+                return None
+            if opcode == BOARD:
+                game = WatchedGame(*args)  # First message, or a resync after falling behind
+                show(game.render())
+            elif opcode == SHOT and game is not None:
+                show(game.shot(*args))
+            elif opcode == GAME_OVER:
+                if game is not None:
+                    show(game.render())
+                show(ENDINGS.get(args[0], f"Game over ({args[0]})"))
+                return args[0]
+    finally:
+        writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch a game in progress on a Battleship server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=12345)
+    parser.add_argument("--room", type=int, default=0, help="Room to watch (default: the most watched game)")
+    args = parser.parse_args()
+    try:
+        asyncio.run(watch(args.host, args.port, args.room))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
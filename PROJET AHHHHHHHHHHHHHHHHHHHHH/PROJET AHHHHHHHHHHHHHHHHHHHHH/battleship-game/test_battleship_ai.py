@@ -0,0 +1,75 @@
+import random
+from statistics import mean
+from battleship_engine import Board, SUNK, iter_cells, count_cells
+from placement import place_random_fleet, ship_masks
+from battleship_ai import ProbabilityTargeter, HIT_WEIGHT, FIRED, make_targeter
+
+
+def recount(board, targeter):
+    """Scores ProbabilityTargeter should hold, counted from scratch from the board's shots."""
+    size = board.size
+    sunk = board.sunk
+    blocked = board.misses | sunk
+    open_hits = board.hits & ~sunk
+    score = [0] * (size * size)
+    for length, count in targeter.remaining.items():
+        for mask in ship_masks(size, length):
+            if mask & blocked:
+                continue
+            weight = count * (1 + HIT_WEIGHT * count_cells(mask & open_hits))
+            for row, col in iter_cells(mask, size):
+                score[row * size + col] += weight
+    for row, col in iter_cells(board.fired, size):
+        score[row * size + col] -= FIRED
+    return score
+
+
+def play(targeter, board, check=None):
+    """Let a targeter sink a board's fleet; returns the shots it took."""
+    shots = 0
+    while not board.all_sunk():
+        row, col = targeter.next_target()
+        result, ship = board.fire(row, col)
+        shots += 1
+        targeter.record(row, col, result, list(iter_cells(board.ship_masks[ship], board.size)) if result == SUNK else [])
+        if check is not None:
+            check()
+    return shots
+
+
+def test_incremental_counts_match_a_full_recount():
+    rng = random.Random(0)
+    for size, fleet in ((8, (5, 4, 3, 3, 2)), (10, (5, 4, 3, 3, 2, 1))):
+        for _ in range(5):
+            board = Board(size)
+            place_random_fleet(board, fleet, rng)
+            targeter = ProbabilityTargeter(size, fleet)
+
+            def check():
+                assert targeter.score == recount(board, targeter)
+
+            play(targeter, board, check)
+
+
+def test_targeters_never_fire_twice_at_a_cell():
+    rng = random.Random(0)
+    for strategy in ("easy", "medium", "hard"):
+        for _ in range(20):
+            board = Board(8)
+            place_random_fleet(board, (5, 4, 3, 3, 2), rng)
+            shots = play(make_targeter(strategy, 8, (5, 4, 3, 3, 2), rng), board)
+            assert shots == count_cells(board.fired)
+
+
+def test_checkerboard_hunting_beats_random_hunting():
+    for size in (8, 10):
+        shots = {}
+        for strategy in ("easy", "medium"):
+            rng = random.Random(0)
+            games = []
+            for _ in range(500):
+                board = Board(size)
+                place_random_fleet(board, (5, 4, 3, 3, 2), rng)
+                games.append(play(make_targeter(strategy, size, (5, 4, 3, 3, 2), rng), board))
+            shots[strategy] = mean(games)
+        assert shots["medium"] < shots["easy"] - 2
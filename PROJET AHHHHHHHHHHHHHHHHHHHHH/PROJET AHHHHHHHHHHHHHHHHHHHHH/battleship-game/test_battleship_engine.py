@@ -0,0 +1,77 @@
+from battleship_engine import (Board, HORIZONTAL, VERTICAL, MISS, HIT, SUNK, REPEAT, ship_mask, neighbours,
+                               iter_cells, ship_origin, cell_bit)
+
+
+def test_ship_mask_stays_on_the_board():
+    assert ship_mask(8, 3, 0, 5, HORIZONTAL) == 0b111 << 5
+    assert ship_mask(8, 3, 0, 6, HORIZONTAL) == 0  # Would wrap onto the next row
+    assert ship_mask(8, 3, 6, 0, VERTICAL) == 0
+    assert ship_mask(8, 2, -1, 0, VERTICAL) == 0
+    assert list(iter_cells(ship_mask(8, 3, 2, 4, VERTICAL), 8)) == [(2, 4), (3, 4), (4, 4)]
+
+
+def test_ship_origin_inverts_ship_mask():
+    for length in (1, 2, 5):
+        for orientation in (HORIZONTAL, VERTICAL):
+            mask = ship_mask(10, length, 3, 4, orientation)
+            expected = HORIZONTAL if length == 1 else orientation
+            assert ship_origin(mask, 10) == (3, 4, length, expected)
+
+
+def test_neighbours_do_not_wrap_across_rows():
+    size = 8
+    corner = cell_bit(size, 0, 7)
+    assert set(iter_cells(neighbours(corner, size), size)) == {(0, 6), (1, 7)}
+    ship = ship_mask(size, 2, 3, 0, HORIZONTAL)
+    assert set(iter_cells(neighbours(ship, size), size)) == {(2, 0), (2, 1), (4, 0), (4, 1), (3, 2)}
+
+
+def test_ships_cannot_overlap_or_leave_the_board():
+    board = Board(8)
+    assert board.place_ship(5, 0, 0, HORIZONTAL)
+    assert not board.can_place(4, 0, 4, VERTICAL)
+    assert board.place_ship(4, 0, 4, VERTICAL) == 0
+    assert board.place_ship(4, 5, 0, VERTICAL) == 0
+    assert board.place_ship(4, 1, 0, HORIZONTAL)
+    assert len(board.ship_masks) == 2
+
+
+def test_fire_results():
+    board = Board(8)
+    board.place_ship(2, 0, 0, HORIZONTAL)
+    board.place_ship(1, 5, 5, HORIZONTAL)
+    assert board.fire(7, 7) == (MISS, None)
+    assert board.fire(7, 7) == (REPEAT, None)
+    assert board.fire(0, 0) == (HIT, 0)
+    assert board.fire(0, 0) == (REPEAT, None)
+    assert not board.all_sunk()
+    assert board.fire(0, 1) == (SUNK, 0)
+    assert board.sunk == board.ship_masks[0]
+    assert board.fire(5, 5) == (SUNK, 1)
+    assert board.all_sunk()
+    assert board.fired == board.hits | cell_bit(8, 7, 7)
+
+
+def test_touching_ships_sink_separately():
+    # Two ships side by side: hitting one never counts towards the other
+    board = Board(8)
+    board.place_ship(3, 2, 2, HORIZONTAL)
+    board.place_ship(3, 3, 2, HORIZONTAL)
+    assert board.ship_at(2, 3) == 0 and board.ship_at(3, 3) == 1
+    assert [board.fire(3, col)[0] for col in (2, 3)] == [HIT, HIT]
+    assert board.fire(2, 2) == (HIT, 0)
+    assert board.fire(3, 4) == (SUNK, 1)
+    assert board.sunk == board.ship_masks[1]
+    assert board.fire(2, 3) == (HIT, 0)
+    assert board.fire(2, 4) == (SUNK, 0)
+    assert board.all_sunk()
+
+
+def test_reset_clears_ships_and_shots():
+    board = Board(8)
+    board.place_ship(3, 0, 0, HORIZONTAL)
+    board.fire(0, 0)
+    board.fire(4, 4)
+    board.reset()
+    assert (board.ships, board.fired, board.ship_masks) == (0, 0, [])
+    assert board.fire(0, 0) == (MISS, None)
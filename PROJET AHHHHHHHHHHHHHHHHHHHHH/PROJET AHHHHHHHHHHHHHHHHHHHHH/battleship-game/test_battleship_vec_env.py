@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from battleship_engine import Board, SUNK, iter_cells
+from battleship_config import GameConfig
+from observation import new_observation, record_shot
+
+pytest.importorskip("stable_baselines3")
+from battleship_vec_env import BattleshipVecEnv  # noqa: E402
+
+
+def mirror(env, i, config):
+    """A Board holding the fleet of the env's board i, and its observation before any shot."""
+    board = Board(config.board_size)
+    board.place_layout([sum(1 << int(cell) for cell in np.flatnonzero(env.ships[i] == ship + 1))
+                        for ship in range(len(config.ship_lengths))])
+    return board, new_observation(config.board_size)
+
+
+@pytest.mark.parametrize("config", [GameConfig(), GameConfig(10, (5, 4, 3, 3, 2, 1))])
+def test_vec_env_plays_like_the_engine(config):
+    size = config.board_size
+    env = BattleshipVecEnv(8, config, seed=3)
+    env.reset()
+    boards = [mirror(env, i, config) for i in range(env.num_envs)]
+    rng = np.random.default_rng(0)
+    finished = 0
+    for _ in range(1000):
+        actions = rng.integers(size * size, size=env.num_envs)
+        env.step_async(actions)
+        observations, _, dones, infos = env.step_wait()
+        for i, action in enumerate(actions):
+            board, observation = boards[i]
+            row, col = divmod(int(action), size)
+            result, ship = board.fire(row, col)
+            record_shot(observation, row, col, result, iter_cells(board.ship_masks[ship], size) if result == SUNK else ())
+            expected = infos[i]["terminal_observation"] if dones[i] else observations[i]
+            assert np.array_equal(observation, expected)
+            assert dones[i] == (board.all_sunk() or infos[i].get("TimeLimit.truncated", False))
+            if dones[i]:
+                finished += 1
+                boards[i] = mirror(env, i, config)
+            assert np.array_equal(infos[i]["action_mask"], boards[i][1][0].reshape(-1).astype(bool))
+    assert finished > 0
@@ -0,0 +1,81 @@
+import random
+import pytest
+from battleship_engine import Board
+from placement import place_random_fleet
+from journal import JournalWriter, JournalFile, replay, SHOT, END, ABANDONED, RECORD, HEADER
+
+FLEET = (5, 4, 3, 3, 2)
+
+
+def play(journal, rng):
+    """Play a random game between two boards, journaling it; returns (boards, winner)."""
+    boards = []
+    for _ in range(2):
+        board = Board(8)
+        place_random_fleet(board, FLEET, rng)
+        boards.append(board)
+    game = journal.start_game(8, len(FLEET))
+    for player, board in enumerate(boards):
+        journal.place_fleet(game, player, board)
+    cells = [[(row, col) for row in range(8) for col in range(8)] for _ in range(2)]
+    for targets in cells:
+        rng.shuffle(targets)
+    player = 0
+    while True:
+        row, col = cells[player].pop()
+        result, _ = boards[1 - player].fire(row, col)
+        journal.shot(game, player, row, col, result)
+        if boards[1 - player].all_sunk():
+            journal.end_game(game, player)
+            return boards, player
+        player = 1 - player
+
+
+def test_games_replay_as_played(tmp_path):
+    journal = JournalWriter(str(tmp_path), name="games.journal")
+    rng = random.Random(0)
+    played = [play(journal, rng) for _ in range(5)]
+    unfinished = journal.start_game(8, len(FLEET))
+    journal.close()
+
+    reader = JournalFile(str(tmp_path / "games.journal"))
+    games = list(reader.games())
+    assert [game for game, _ in games] == [0, 1, 2, 3, 4, unfinished]
+    for (_, records), (boards, winner) in zip(games, played):
+        replayed, replayed_winner = replay(records)
+        assert replayed_winner == winner
+        for board, original in zip(replayed, boards):
+            assert (board.ship_masks, board.hits, board.misses) == (original.ship_masks, original.hits, original.misses)
+    assert games[-1][1][-1].kind != END
+    assert len(reader.array()) == len(reader)
+
+
+def test_replay_rejects_a_forged_result(tmp_path):
+    journal = JournalWriter(str(tmp_path), name="games.journal")
+    play(journal, random.Random(1))
+    journal.close()
+    records = list(JournalFile(str(tmp_path / "games.journal")))
+    shot = next(i for i, record in enumerate(records) if record.kind == SHOT)
+    records[shot] = records[shot]._replace(a=(records[shot].a + 1) % 3)
+    with pytest.raises(ValueError):
+        replay(records)
+
+
+def test_abandoned_games_have_no_winner_check(tmp_path):
+    journal = JournalWriter(str(tmp_path), name="games.journal")
+    game = journal.start_game(8, len(FLEET))
+    journal.end_game(game, 1, ABANDONED)
+    journal.close()
+    _, winner = replay(JournalFile(str(tmp_path / "games.journal")))
+    assert winner == 1
+
+
+def test_a_record_cut_by_a_crash_is_ignored(tmp_path):
+    journal = JournalWriter(str(tmp_path), name="games.journal")
+    journal.start_game(8, len(FLEET))
+    journal.close()
+    path = tmp_path / "games.journal"
+    with open(path, "ab") as f:
+        f.write(b"\0" * (RECORD.size // 2))
+    assert len(JournalFile(str(path))) == 1
+    assert path.stat().st_size == HEADER.size + RECORD.size + RECORD.size // 2
@@ -0,0 +1,59 @@
+import random
+from collections import Counter
+from itertools import product
+from battleship_engine import Board, count_cells
+from placement import PlacementIndex, ship_masks, place_random_fleet, layout_pool
+
+
+def legal_fleets(size, ship_lengths):
+    """Every legal fleet, by brute force over the placements of each ship."""
+    fleets = []
+    for fleet in product(*(ship_masks(size, length) for length in ship_lengths)):
+        occupied = 0
+        for mask in fleet:
+            if mask & occupied:
+                break
+            occupied |= mask
+        else:
+            fleets.append(fleet)
+    return fleets
+
+
+def test_ship_masks_lists_each_placement_once():
+    assert len(ship_masks(8, 5)) == 2 * 8 * 4
+    assert len(ship_masks(8, 1)) == 64  # A 1-cell ship is the same both ways
+    assert all(count_cells(mask) == 3 for mask in ship_masks(8, 3))
+
+
+def test_sampling_is_uniform_over_legal_fleets():
+    fleets = legal_fleets(4, (3, 2))
+    assert len(fleets) == 264
+    index = PlacementIndex(4, (3, 2))
+    rng = random.Random(0)
+    draws = 300 * len(fleets)
+    counts = Counter(index.sample(rng) for _ in range(draws))
+    assert set(counts) == set(fleets)
+    expected = draws / len(fleets)
+    chi_square = sum((count - expected) ** 2 / expected for count in counts.values())
+    assert chi_square < 400  # 263 degrees of freedom: mean 263, standard deviation about 23
+
+
+def test_search_finds_fleets_that_fill_the_board():
+    index = PlacementIndex(3, (3, 3, 3))
+    indices = index._search(random.Random(1))
+    fleet = [index.placements[3][i] for i in indices]
+    assert sum(fleet) == (1 << 9) - 1  # Three rows or three columns, no overlap
+
+
+def test_impossible_fleets_are_refused():
+    board = Board(4)
+    assert not place_random_fleet(board, (4, 4, 4, 4, 1))
+    assert board.ships == 0
+
+
+def test_layout_pool_holds_legal_fleets():
+    for fleet in layout_pool(8, (5, 4, 3, 3, 2), count=200):
+        board = Board(8)
+        board.place_layout(fleet)
+        assert count_cells(board.ships) == 17
+        assert [count_cells(mask) for mask in fleet] == [5, 4, 3, 3, 2]
@@ -0,0 +1,59 @@
+import protocol
+from protocol import (MOVE, RESULT, TURN, SUNK, GAME_OVER, INFO, FLEET, CONFIG, RESUME, SESSION, WATCH, BOARD, SHOT,
+                      WIN, FrameReader)
+from battleship_engine import HIT, SUNK as SHIP_SUNK
+
+# (opcode, args given to encode, args decode returns)
+MESSAGES = [
+    (MOVE, (3, 7), (3, 7)),
+    (RESULT, (3, 7, HIT), (3, 7, HIT)),
+    (TURN, (1,), (1,)),
+    (SUNK, (0, 2, 4, 1), (0, 2, 4, 1)),
+    (GAME_OVER, (WIN,), (WIN,)),
+    (INFO, ("Not your turn!",), ("Not your turn!",)),
+    (INFO, ("Tir raté à É5",), ("Tir raté à É5",)),
+    (FLEET, ([(0, 0, 5, 0), (2, 3, 4, 1)],), ([(0, 0, 5, 0), (2, 3, 4, 1)],)),
+    (CONFIG, (10, (5, 4, 3, 3, 2, 1)), (10, (5, 4, 3, 3, 2, 1))),
+    (RESUME, (b"",), (b"",)),
+    (RESUME, (bytes(range(16)),), (bytes(range(16)),)),
+    (SESSION, (bytes(range(16)),), (bytes(range(16)),)),
+    (WATCH, (123456,), (123456,)),
+    (SHOT, (1, 4, 5, HIT, None), (1, 4, 5, HIT, None)),
+    (SHOT, (0, 4, 5, SHIP_SUNK, (4, 3, 3, 0)), (0, 4, 5, SHIP_SUNK, (4, 3, 3, 0))),
+    (BOARD, (7, 10, 1, [(1 << 99 | 5, 1 << 50, [(0, 0, 2, 1)]), (0, 3, [])]),
+     (7, 10, 1, [(1 << 99 | 5, 1 << 50, [(0, 0, 2, 1)]), (0, 3, [])])),
+]
+
+
+def test_every_opcode_round_trips():
+    for opcode, args, decoded in MESSAGES:
+        frame = protocol.encode(opcode, *args)
+        assert protocol.decode(frame[protocol.HEADER.size:]) == (opcode, decoded)
+
+
+def test_frame_reader_splits_coalesced_frames():
+    stream = b"".join(protocol.encode(opcode, *args) for opcode, args, _ in MESSAGES)
+    expected = [(opcode, decoded) for opcode, _, decoded in MESSAGES]
+    assert FrameReader().feed(stream) == expected
+
+
+def test_frame_reader_reassembles_split_frames():
+    stream = b"".join(protocol.encode(opcode, *args) for opcode, args, _ in MESSAGES)
+    reader = FrameReader()
+    received = []
+    for i in range(len(stream)):
+        received += reader.feed(stream[i:i + 1])
+    assert received == [(opcode, decoded) for opcode, _, decoded in MESSAGES]
+    assert not reader.buffer
+
+
+def test_frame_reader_keeps_a_partial_frame():
+    frame = protocol.encode(MOVE, 1, 2)
+    reader = FrameReader()
+    assert reader.feed(frame + frame[:3]) == [(MOVE, (1, 2))]
+    assert reader.feed(frame[3:]) == [(MOVE, (1, 2))]
+
+
+def test_hello_carries_the_version():
+    assert protocol.hello() == bytes((protocol.HELLO, protocol.VERSION))
+    assert protocol.hello(protocol.RELAY_VERSION)[1] == protocol.RELAY_VERSION
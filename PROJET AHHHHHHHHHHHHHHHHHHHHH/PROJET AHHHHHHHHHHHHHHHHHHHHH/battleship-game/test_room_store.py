@@ -0,0 +1,104 @@
+import os
+import random
+from battleship_engine import Board, REPEAT
+from placement import place_random_fleet
+from journal import HEADER, JournalWriter, JournalFile, SHOT, RESTORED, replay
+from room_store import RoomStore, WAL_NAME
+
+
+def random_boards(seed=0):
+    rng = random.Random(seed)
+    boards = []
+    for _ in range(2):
+        board = Board(8)
+        place_random_fleet(board, (5, 4, 3, 3, 2), rng)
+        boards.append(board)
+    return boards
+
+
+def test_log_header_is_on_disk_before_the_first_record(tmp_path):
+    store = RoomStore(str(tmp_path))
+    try:
+        assert os.path.getsize(store.wal.path) == HEADER.size
+    finally:
+        store.close()
+
+
+def test_recovery_skips_logs_cut_before_their_header(tmp_path):
+    # A server killed right after opening its logs, before the header was written
+    open(tmp_path / WAL_NAME.format(1), "wb").close()
+    with open(tmp_path / WAL_NAME.format(2), "wb") as f:
+        f.write(b"BSJ")
+    store = RoomStore(str(tmp_path))
+    try:
+        assert store.recovered == []
+        assert sorted(os.listdir(tmp_path)) == ["rooms-00000003.wal", "rooms.snapshot", "session.key"]
+    finally:
+        store.close()
+
+
+def test_rooms_survive_a_crash(tmp_path):
+    boards = random_boards()
+    store = RoomStore(str(tmp_path))
+    store.start_room(7, 1234, boards)
+    store.shot(7, 0, 2, 3, boards[1].fire(2, 3)[0])
+    store.wal.flush()  # What the flusher thread would have written; the store is never closed
+
+    recovered = RoomStore(str(tmp_path)).recovered
+    assert len(recovered) == 1
+    room = recovered[0]
+    assert (room.room_id, room.nonce, room.turn) == (7, 1234, 1)
+    assert [board.ship_masks for board in room.boards] == [board.ship_masks for board in boards]
+    assert room.boards[1].fired == boards[1].fired
+    store.close()
+
+
+def play_shots(store, boards, count, seed=1):
+    """Fire count shots in turns, as the server would; returns the cells fired, in order."""
+    rng = random.Random(seed)
+    size = boards[0].size
+    shots = []
+    while len(shots) < count:
+        player = len(shots) % 2
+        row, col = rng.randrange(size), rng.randrange(size)
+        result, _ = boards[1 - player].fire(row, col)
+        store.shot(7, player, row, col, result)
+        if result != REPEAT:
+            shots.append(row * size + col)
+    return shots
+
+
+def test_shot_order_survives_logs_and_snapshots(tmp_path):
+    boards = random_boards()
+    store = RoomStore(str(tmp_path))
+    store.start_room(7, 1234, boards)
+    shots = play_shots(store, boards, 20)
+    store.close()
+
+    store = RoomStore(str(tmp_path))  # From the log, then compacted into a snapshot
+    assert list(store.recovered[0].shots) == shots
+    store.close()
+    room = RoomStore(str(tmp_path)).recovered[0]  # From the snapshot alone
+    assert list(room.shots) == shots
+    assert [board.fired for board in room.boards] == [board.fired for board in boards]
+
+
+def test_restored_games_are_journaled_in_order(tmp_path):
+    from server import BattleshipServer
+    boards = random_boards()
+    store = RoomStore(str(tmp_path / "state"))
+    store.start_room(7, 1234, boards)
+    shots = play_shots(store, boards, 15)
+    store.close()
+
+    journal = JournalWriter(str(tmp_path / "journals"), name="restart.journal")
+    server = BattleshipServer(journal=journal, store=RoomStore(str(tmp_path / "state")), metrics_port=None)
+    assert list(server.rooms[7].shots) == shots
+    journal.close()
+    server.store.close()
+    records = list(JournalFile(str(tmp_path / "journals" / "restart.journal")))
+    fired = [(record.player, record.row * 8 + record.col) for record in records if record.kind == SHOT]
+    assert fired == [(shot % 2, cell) for shot, cell in enumerate(shots)]
+    assert records[-1].kind == RESTORED
+    replayed, _ = replay(records)
+    assert [board.hits for board in replayed] == [board.hits for board in boards]
@@ -0,0 +1,62 @@
+import asyncio
+from server import Spectator, ServerMetrics, RESYNC
+
+
+class FakeTransport:
+    def set_write_buffer_limits(self, high):
+        pass
+
+
+class FakeWriter:
+    def __init__(self):
+        self.transport = FakeTransport()
+        self.written = []
+
+    def write(self, data):
+        self.written.append(data)
+
+    async def drain(self):
+        pass
+
+
+class FakeRoom:
+    """Shots fired so far; its BOARD snapshot lists them all."""
+
+    def __init__(self):
+        self.shots = []
+
+    def board_frame(self):
+        return b"BOARD " + b",".join(self.shots)
+
+    def fire(self, spectator, shot):
+        self.shots.append(shot)
+        spectator.push(shot)
+
+
+def watch(queue_size, before, after):
+    """Frames a spectator receives when `before` shots are fired before its feed runs and `after` once it has."""
+    room, writer = FakeRoom(), FakeWriter()
+    spectator = Spectator(writer, room, ServerMetrics(), queue_size=queue_size)
+
+    async def play():
+        spectator.push(RESYNC)
+        for shot in before:
+            room.fire(spectator, shot)
+        feed = asyncio.create_task(spectator.run())
+        await asyncio.sleep(0)
+        for shot in after:
+            room.fire(spectator, shot)
+        spectator.finish(b"GAME_OVER")
+        assert await feed
+
+    asyncio.run(play())
+    return writer.written
+
+
+def test_shots_queued_behind_a_snapshot_are_not_sent_again():
+    assert watch(64, [b"A1", b"B2"], [b"C3"]) == [b"BOARD A1,B2", b"C3", b"GAME_OVER"]
+
+
+def test_spectator_falling_behind_gets_one_snapshot_then_the_end():
+    written = watch(2, [b"A1", b"B2", b"C3", b"D4"], [])
+    assert written == [b"BOARD A1,B2,C3,D4", b"GAME_OVER"]
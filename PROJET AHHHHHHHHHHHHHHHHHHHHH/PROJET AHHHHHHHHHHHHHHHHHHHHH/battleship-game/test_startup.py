@@ -0,0 +1,34 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+GAME_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Run in a fresh interpreter: other tests may already have imported the RL stack
+HEADLESS_STARTUP = """
+import importlib.util, json, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("battleship_vs_ai", "battleship-vs-ai.py")
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+module.BattleshipGame(window=False)
+print(json.dumps({"elapsed": time.perf_counter() - start, "budget": module.STARTUP_BUDGET,
+                  "heavy": [name for name in ("torch", "stable_baselines3") if name in sys.modules]}))
+"""
+
+
+def test_game_starts_without_the_rl_stack_within_budget():
+    pytest.importorskip("tkinter")
+    output = subprocess.run([sys.executable, "-c", HEADLESS_STARTUP], cwd=GAME_DIR,
+                            capture_output=True, text=True, check=True).stdout
+    startup = json.loads(output.splitlines()[-1])
+    assert startup["heavy"] == []
+    assert startup["elapsed"] < startup["budget"]
+
+
+@pytest.mark.skipif(not os.environ.get("DISPLAY"), reason="drawing the window needs a display")
+def test_window_is_drawn_within_budget():
+    subprocess.run([sys.executable, "battleship-vs-ai.py", "--check-startup", "--no-journal"], cwd=GAME_DIR,
+                   check=True)
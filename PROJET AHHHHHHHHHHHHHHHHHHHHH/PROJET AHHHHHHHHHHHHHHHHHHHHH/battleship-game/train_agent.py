@@ -1,24 +1,184 @@
-from stable_baselines3 import DQN
-from battleship_env import BattleshipEnv
-
-# Create the environment
-env = BattleshipEnv()
-
-# Initialize the DQN model
-model = DQN("MlpPolicy", env, verbose=1)
-
-# Train the model
-model.learn(total_timesteps=10000)
-
-# Save the model
-model.save("battleship_dqn")
-
-# Test the trained model
-obs = env.reset()
-for _ in range(100):
-    action, _states = model.predict(obs)
-    obs, rewards, done, info = env.step(action)
-    env.render()
-    if done:
-        print("Game Over!")
-        break
\ No newline at end of file
+import argparse
+import glob
+import os
+import random
+import re
+import time
+from stable_baselines3.common.callbacks import BaseCallback, CheckpointCallback
+from battleship_vec_env import BattleshipVecEnv, SubprocBattleshipVecEnv
+from observation import new_observation, record_shot, legal_actions
+from battleship_config import DEFAULT_CONFIG, add_config_arguments, config_from_args
+from simulate import play_game
+from masked_dqn import MaskedDQN
+
+EVAL_STRATEGIES = ("easy", "medium", "hard")
+
+
+class PolicyTargeter:
+    """Plays the model being trained, seeing the board the way BattleshipVecEnv shows it."""
+
+    def __init__(self, model, board_size):
+        self.model = model
+        self.size = board_size
+        self.observation = new_observation(board_size)
+
+    def next_target(self):
+        action, _states = self.model.predict(self.observation, deterministic=True,
+                                             action_masks=legal_actions(self.observation))
+        return divmod(int(action), self.size)
+
+    def record(self, row, col, result, sunk_cells=()):
+        record_shot(self.observation, row, col, result, sunk_cells)
+
+
+def evaluate(model, games=100, strategies=EVAL_STRATEGIES, seed=0, config=DEFAULT_CONFIG):
+    """Play the model against each scripted strategy; returns {strategy: (win rate, mean shots to win)}."""
+    rng = random.Random(seed)
+    policy = lambda size, lengths, rng: PolicyTargeter(model, size)
+    results = {}
+    for strategy in strategies:
+        wins, shots = 0, 0
+        for game in range(games):
+            winner, winner_shots = play_game([policy, strategy], config, rng, first=game % 2)
+            if winner == 0:
+                wins += 1
+                shots += winner_shots
+        results[strategy] = (wins / games, shots / wins if wins else None)
+    return results
+
+
+class EvalCallback(BaseCallback):
+    """Evaluates against the scripted strategies every eval_freq env-steps, without rendering."""
+
+    def __init__(self, eval_freq, games, config=DEFAULT_CONFIG, verbose=1):
+        super(EvalCallback, self).__init__(verbose)
+        self.eval_freq = eval_freq
+        self.games = games
+        self.config = config
+        self.eval_time = 0.0  # Seconds spent evaluating, left out of the throughput
+
+    def _on_training_start(self):
+        self.next_eval = self.num_timesteps + self.eval_freq  # Resumed runs start past zero
+
+    def _on_step(self):
+        if self.num_timesteps >= self.next_eval:
+            self.next_eval += self.eval_freq
+            start = time.perf_counter()
+            for strategy, (win_rate, shots) in evaluate(self.model, self.games, config=self.config).items():
+                self.logger.record(f"eval/win_rate_{strategy}", win_rate)
+                if self.verbose:
+                    print(f"[{self.num_timesteps} steps] vs {strategy}: {100 * win_rate:.0f}% wins"
+                          + (f", {shots:.1f} shots to win" if shots else ""))
+            self.eval_time += time.perf_counter() - start
+        return True
+
+
+class ThroughputCallback(BaseCallback):
+    """Reports env-steps/sec (all boards together) every report_freq env-steps and for the whole run."""
+
+    def __init__(self, report_freq, eval_callback=None, verbose=1):
+        super(ThroughputCallback, self).__init__(verbose)
+        self.report_freq = report_freq
+        self.eval_callback = eval_callback
+
+    def elapsed(self):
+        """Training time so far, without evaluations."""
+        eval_time = self.eval_callback.eval_time if self.eval_callback is not None else 0.0
+        return time.perf_counter() - self.start_time - eval_time
+
+    def _on_training_start(self):
+        self.start_time = time.perf_counter()
+        self.last_time = 0.0
+        self.start_steps = self.last_steps = self.num_timesteps
+
+    def _on_step(self):
+        if self.num_timesteps - self.last_steps >= self.report_freq:
+            now = self.elapsed()
+            rate = (self.num_timesteps - self.last_steps) / (now - self.last_time)
+            self.logger.record("time/env_steps_per_sec", rate)
+            if self.verbose:
+                print(f"[{self.num_timesteps} steps] {rate:,.0f} env-steps/sec")
+            self.last_time, self.last_steps = now, self.num_timesteps
+        return True
+
+    def _on_training_end(self):
+        steps = self.num_timesteps - self.start_steps
+        elapsed = self.elapsed()
+        print(f"{steps} env-steps in {elapsed:.1f}s ({steps / elapsed:,.0f} env-steps/sec)")
+
+
+def make_env(workers, envs_per_worker, seed=None, config=DEFAULT_CONFIG):
+    """One in-process batch of boards, or one batch per worker process."""
+    if workers <= 1:
+        return BattleshipVecEnv(num_envs=envs_per_worker, config=config, seed=seed)
+    return SubprocBattleshipVecEnv(workers, envs_per_worker, seed=seed, config=config)
+
+
+def latest_checkpoint(checkpoint_dir):
+    """Path of the checkpoint with the most steps, or None."""
+    checkpoints = glob.glob(os.path.join(checkpoint_dir, "battleship_dqn_*_steps.zip"))
+    if not checkpoints:
+        return None
+    return max(checkpoints, key=lambda path: int(re.search(r"_(\d+)_steps", path).group(1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the Battleship DQN")
+    parser.add_argument("--timesteps", type=int, default=10000, help="Env-steps, summed over all boards")
+    parser.add_argument("--workers", type=int, default=1, help="Processes collecting rollouts")
+    parser.add_argument("--envs-per-worker", type=int, default=8, help="Boards stepped together by each worker")
+    parser.add_argument("--checkpoint-dir", default="checkpoints")
+    parser.add_argument("--checkpoint-freq", type=int, default=50000, help="Env-steps between checkpoints")
+    parser.add_argument("--resume", nargs="?", const="latest",
+                        help="Checkpoint to continue from (default: the latest in --checkpoint-dir)")
+    parser.add_argument("--eval-freq", type=int, default=50000, help="Env-steps between evaluations")
+    parser.add_argument("--eval-games", type=int, default=100, help="Games against each scripted strategy")
+    parser.add_argument("--output", default="battleship_dqn")
+    parser.add_argument("--seed", type=int, default=None)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+    config = config_from_args(args, parser)
+
+    # Create the environment (several boards stepped together, optionally in several processes)
+    env = make_env(args.workers, args.envs_per_worker, args.seed, config)
+    try:
+        resume = latest_checkpoint(args.checkpoint_dir) if args.resume == "latest" else args.resume
+        if resume:
+            # Continue the run: weights, optimizer state, step count and replay buffer
+            model = MaskedDQN.load(resume, env=env)
+            replay_buffer = resume.replace("battleship_dqn_", "battleship_dqn_replay_buffer_").replace(".zip", ".pkl")
+            if os.path.exists(replay_buffer):
+                empty_buffer = model.replay_buffer
+                model.load_replay_buffer(replay_buffer)
+                if model.replay_buffer.n_envs != env.num_envs:
+                    # Transitions are stored per board, so another worker layout starts an empty buffer
+                    print("Replay buffer was collected with a different number of boards, starting a new one")
+                    model.replay_buffer = empty_buffer
+            print(f"Resuming from {resume} at {model.num_timesteps} steps")
+        else:
+            # Initialize the DQN model (exploration and predictions skip cells already fired at)
+            model = MaskedDQN("MlpPolicy", env, verbose=1, seed=args.seed)
+
+        eval_callback = EvalCallback(args.eval_freq, args.eval_games, config)
+        callbacks = [
+            # Checkpoint frequency counts env.step() calls, each stepping num_envs boards
+            CheckpointCallback(max(1, args.checkpoint_freq // env.num_envs), args.checkpoint_dir,
+                               name_prefix="battleship_dqn", save_replay_buffer=True),
+            eval_callback,
+            ThroughputCallback(max(env.num_envs, args.timesteps // 10), eval_callback),
+        ]
+        # Train the model
+        model.learn(total_timesteps=args.timesteps, callback=callbacks, reset_num_timesteps=not resume)
+
+        # Save the model
+        model.save(args.output)
+    finally:
+        env.close()
+
+    # Test the trained model
+    for strategy, (win_rate, shots) in evaluate(model, args.eval_games, config=config).items():
+        print(f"Final vs {strategy}: {100 * win_rate:.0f}% wins" + (f", {shots:.1f} shots to win" if shots else ""))
+
+
+if __name__ == "__main__":
+    main()